@@ -0,0 +1,100 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark of :py:class:`~.LogLineClassifier` against the previous
+per-line regex matching of ``errorscan``, over a corpus of Lambda log
+messages. Run from the repository root with::
+
+    python benchmarks/bench_log_classifier.py [-n NUMBER] [CORPUS]
+"""
+
+import re
+import sys
+import timeit
+import argparse
+
+from manheim_c7n_tools.log_classifier import LogLineClassifier
+from manheim_c7n_tools.tests.log_corpus import (
+    CORPUS, LEGACY_ALL_ERROR_LOG_RE, ALL_ERROR_LOG_RE, ALL_ERROR_LOG_TERMS,
+    load_corpus, failed_request_ids, legacy_classify
+)
+
+
+def run(number=20, path=CORPUS):
+    """
+    Time classifying every message of the corpus ``number`` times with both
+    implementations, for request IDs only and for request IDs plus
+    ``ERROR`` / ``WARNING`` lines, and print the results.
+
+    :return: dict of case name to (legacy seconds, classifier seconds)
+    :rtype: dict
+    """
+    messages = load_corpus(path)
+    req_ids = failed_request_ids(messages)
+    never_re = re.compile(r'.*Throttled, retrying')
+    cases = {
+        'request IDs': (req_ids, None, None, None, None),
+        'request IDs + errors': (
+            req_ids, LEGACY_ALL_ERROR_LOG_RE, ALL_ERROR_LOG_RE,
+            ALL_ERROR_LOG_TERMS, never_re
+        )
+    }
+    res = {}
+    for name, (ids, legacy_re, new_re, terms, never) in sorted(
+        cases.items()
+    ):
+        id_list = list(ids)
+        clf = LogLineClassifier(
+            set(ids), always_match_re=new_re, never_match_re=never,
+            always_match_terms=terms
+        )
+        legacy = [
+            legacy_classify(m, id_list, legacy_re, never) for m in messages
+        ]
+        assert [clf.classify(m) for m in messages] == legacy
+        t_legacy = timeit.timeit(
+            lambda: [
+                legacy_classify(m, id_list, legacy_re, never)
+                for m in messages
+            ], number=number
+        )
+        t_new = timeit.timeit(
+            lambda: [clf.classify(m) for m in messages], number=number
+        )
+        res[name] = (t_legacy, t_new)
+        total = len(messages) * number
+        print(
+            '%-22s legacy: %8.0f lines/s  classifier: %8.0f lines/s  '
+            '(%.1fx)' % (
+                name, total / t_legacy, total / t_new, t_legacy / t_new
+            )
+        )
+    return res
+
+
+def main(argv):
+    p = argparse.ArgumentParser(
+        description='Benchmark errorscan log line classification'
+    )
+    p.add_argument('-n', '--number', dest='number', type=int, default=20,
+                   help='number of passes over the corpus (default: 20)')
+    p.add_argument('CORPUS', nargs='?', default=CORPUS,
+                   help='corpus file of one JSON string per line')
+    args = p.parse_args(argv)
+    run(number=args.number, path=args.CORPUS)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
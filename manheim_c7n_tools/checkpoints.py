@@ -0,0 +1,171 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-log-group checkpoints of incremental ``errorscan`` runs.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.utils import aws_client
+
+logger = logging.getLogger(__name__)
+
+
+class LogCheckpoints(object):
+    """
+    Checkpoints of the log groups scanned by ``errorscan --incremental``,
+    stored as JSON either in a local file or, if the location starts with
+    ``s3://``, in S3. For each account, region and log group, a checkpoint
+    holds the end time of the last scan and the IDs and timestamps of the
+    log events it reported that are within :py:attr:`~.OVERLAP` of that end
+    time.
+    """
+
+    #: Version of the checkpoint file format
+    VERSION = 1
+
+    #: Milliseconds before the end of the last scan to start the next one
+    #: at, to allow for delayed ingestion of log events
+    OVERLAP = 300000
+
+    def __init__(self, location, region_name='us-east-1'):
+        """
+        :param location: local path, or ``s3://BUCKET/KEY`` URL
+        :type location: str
+        :param region_name: region to use for the S3 client, if stored in S3
+        :type region_name: str
+        """
+        self.location = location
+        self._region_name = region_name
+        self._lock = threading.Lock()
+        self._checkpoints = {}
+        self._load()
+
+    def _s3_location(self):
+        bucket, _, key = self.location[len('s3://'):].partition('/')
+        return bucket, key
+
+    def _read(self):
+        """Return the stored checkpoints as a string, or None if not present."""
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_location()
+            s3 = aws_client('s3', self._region_name)
+            try:
+                resp = s3.get_object(Bucket=bucket, Key=key)
+            except ClientError as ex:
+                if ex.response['Error']['Code'] in ['NoSuchKey', '404']:
+                    return None
+                raise
+            return resp['Body'].read().decode('utf-8')
+        if not os.path.exists(self.location):
+            return None
+        with open(self.location, 'r') as fh:
+            return fh.read()
+
+    def _load(self):
+        content = self._read()
+        if content is None:
+            logger.info(
+                'No errorscan checkpoints found at %s; scanning the full '
+                'interval', self.location
+            )
+            return
+        data = json.loads(content)
+        if data.get('version') != self.VERSION:
+            logger.warning(
+                'Ignoring errorscan checkpoints %s with unknown version %s',
+                self.location, data.get('version')
+            )
+            return
+        self._checkpoints = data['checkpoints']
+
+    def get(self, account_id, region_name, group_name):
+        """
+        Return the time to start the next scan of a log group at and the log
+        events already reported after that time, or None if the log group has
+        no checkpoint.
+
+        :param account_id: AWS account ID
+        :type account_id: str
+        :param region_name: region name
+        :type region_name: str
+        :param group_name: CloudWatch Logs group name
+        :type group_name: str
+        :return: (start time in epoch milliseconds, dict of event ID to
+          timestamp), or None
+        :rtype: tuple
+        """
+        with self._lock:
+            cp = self._checkpoints.get(str(account_id), {}).get(
+                region_name, {}
+            ).get(group_name)
+        if cp is None:
+            return None
+        return cp['end'] - self.OVERLAP, dict(cp['events'])
+
+    def record(self, account_id, region_name, group_name, end_time, events):
+        """
+        Record the checkpoint of a log group scanned up to ``end_time``.
+        Checkpoints are only stored by :py:meth:`~.save`.
+
+        :param account_id: AWS account ID
+        :type account_id: str
+        :param region_name: region name
+        :type region_name: str
+        :param group_name: CloudWatch Logs group name
+        :type group_name: str
+        :param end_time: end of the scan, in epoch milliseconds
+        :type end_time: int
+        :param events: dict of event ID to timestamp of the log events
+          reported, including those carried over from the previous checkpoint;
+          only those within :py:attr:`~.OVERLAP` of ``end_time`` are kept
+        :type events: dict
+        """
+        start = end_time - self.OVERLAP
+        with self._lock:
+            self._checkpoints.setdefault(str(account_id), {}).setdefault(
+                region_name, {}
+            )[group_name] = {
+                'end': end_time,
+                'events': {k: v for k, v in events.items() if v >= start}
+            }
+
+    def save(self):
+        """
+        Store all checkpoints. This may be called from several threads
+        sharing the checkpoints, such as one per region.
+        """
+        with self._lock:
+            content = json.dumps({
+                'version': self.VERSION,
+                'generated': datetime.utcnow().isoformat() + 'Z',
+                'checkpoints': self._checkpoints
+            }, sort_keys=True, indent=4)
+            logger.info('Writing errorscan checkpoints to: %s', self.location)
+            if self.location.startswith('s3://'):
+                bucket, key = self._s3_location()
+                aws_client('s3', self._region_name).put_object(
+                    Bucket=bucket, Key=key, Body=content.encode('utf-8'),
+                    ContentType='application/json'
+                )
+                return
+            with open(self.location, 'w') as fh:
+                fh.write(content)
@@ -58,6 +58,15 @@ MANHEIM_CONFIG_SCHEMA = {
         'policy_source_paths': {'type': 'array', 'items': {'type': 'string'}},
         # Name prefix for custodian Lambda functions
         'function_prefix': {'type': 'string'},
+        # Directory for the persistent per-account, per-region c7n resource
+        # cache files used by the custodian step
+        'custodian_cache_dir': {'type': 'string'},
+        # Time in minutes that cached resources are valid for; 0 disables
+        # the resource cache
+        'custodian_cache_ttl': {'type': 'integer', 'minimum': 0},
+        # Optional directory to keep the Sphinx doctree cache and docs build
+        # hash in between runs, for incremental docs builds
+        'docs_cache_dir': {'type': ['string', 'null']},
         # A list of region names that custodian should run in for this account
         'regions': {'type': 'array', 'items': {'type': 'string'}},
         # Name of the S3 bucket for storing Custodian output; should include
@@ -123,6 +132,12 @@ class ManheimConfig(object):
             self._config['function_prefix'] = 'custodian-'
         if 'cleanup_notify' not in self._config:
             self._config['cleanup_notify'] = []
+        if 'custodian_cache_dir' not in self._config:
+            self._config['custodian_cache_dir'] = '/tmp/.cache'
+        if 'custodian_cache_ttl' not in self._config:
+            self._config['custodian_cache_ttl'] = 0
+        if 'docs_cache_dir' not in self._config:
+            self._config['docs_cache_dir'] = None
 
     @staticmethod
     def from_file(path, account_name):
@@ -196,6 +211,9 @@ class ManheimConfig(object):
         return ManheimConfig(**yaml.load(config_str, Loader=yaml.SafeLoader))
 
     def __getattr__(self, k):
+        if k == '_config':
+            # not set yet, e.g. while unpickling
+            raise AttributeError(k)
         try:
             return self._config[k]
         except KeyError:
@@ -24,7 +24,6 @@ import glob
 import re
 import logging
 import json
-import boto3
 import argparse
 import itertools
 import os
@@ -33,10 +32,11 @@ import subprocess
 from jinja2 import Environment, FileSystemLoader
 from jinja2.exceptions import TemplateNotFound
 
-from c7n.resources import load_available
 from c7n.provider import get_resource_class
 
-from manheim_c7n_tools.utils import set_log_info, set_log_debug
+from manheim_c7n_tools.utils import (
+    set_log_info, set_log_debug, aws_resource, load_resource_types
+)
 from manheim_c7n_tools.config import ManheimConfig
 from manheim_c7n_tools.version import VERSION
 
@@ -95,6 +95,26 @@ class DryRunDiffer(object):
                 fh.write(diff_report)
             logger.info('PR report written to: pr_report.html')
 
+    def policies_to_dryrun(self, git_dir=None, diff_against='master'):
+        """
+        Return the names of the policies that a targeted dryrun needs to run
+        for :py:meth:`~.run` to report on them, i.e. the changed policies; or
+        None if every policy must be run because ``defaults.yml`` changed.
+
+        :return: list of policy names, or None
+        :rtype: list
+        """
+        changed_policies = self._find_changed_policies(git_dir, diff_against)
+        if 'defaults' in changed_policies:
+            logger.info(
+                'Git diff reported changes to defaults.yml; targeted dryrun '
+                'will run all policies.'
+            )
+            return None
+        logger.info('Changed policies for targeted dryrun: %s',
+                    changed_policies)
+        return changed_policies
+
     def _find_changed_policies(self, git_dir=None, diff_against='master'):
         """
         :return: list of policy names that differ from master
@@ -144,6 +164,11 @@ class DryRunDiffer(object):
         except TemplateNotFound:
             logger.info('unable to find a template - skipping diff report')
             return ''
+        # load only the resource types of the policies being reported on
+        load_resource_types(set(
+            x.get(self.RESOURCE_TYPE_KEY)
+            for x in list(dryrun.values()) + list(self._live_results.values())
+        ) - {self.UNKNOWN_RESOURCE_TYPE})
 
         for policy in all_policies:
             for region in self.config.regions:
@@ -211,7 +236,6 @@ class DryRunDiffer(object):
             self.RESOURCE_TYPE_KEY, self.UNKNOWN_RESOURCE_TYPE)
         if resource_type == self.UNKNOWN_RESOURCE_TYPE:
             return
-        load_available()
         _id = self.UNKNOWN_RESOURCE_ID
         try:
             _id = get_resource_class(resource_type) \
@@ -342,7 +366,7 @@ class DryRunDiffer(object):
         policies. Reads each file and maps resources to ``self._live_results``
         accordingly.
         """
-        s3 = boto3.resource('s3', region_name=region_name)
+        s3 = aws_resource('s3', region_name)
         bktname = self.config.config_for_region(
             region_name
         ).output_s3_bucket_name
@@ -21,18 +21,24 @@ any failed or errored.
 import sys
 import argparse
 import logging
-import boto3
-from botocore.config import Config
 import re
-from time import time, sleep
+import heapq
+import threading
+from time import time
 from datetime import datetime, timedelta, tzinfo
 from operator import itemgetter
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 from manheim_c7n_tools.utils import (
-    set_log_info, set_log_debug, red, green, assume_role
+    set_log_info, set_log_debug, red, green, bold, assume_role, aws_client,
+    aws_resource
 )
 from manheim_c7n_tools.version import VERSION, PROJECT_URL
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.logs_insights import LogsInsightsScanner
+from manheim_c7n_tools.checkpoints import LogCheckpoints
+from manheim_c7n_tools.log_classifier import LogLineClassifier
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
@@ -48,10 +54,6 @@ botocore_log = logging.getLogger("botocore")
 botocore_log.setLevel(logging.WARNING)
 botocore_log.propagate = True
 
-# Override max attempts for botocore retry configuration, to cope with
-# throttling. This  constant is used in two different places below...
-BOTOCORE_MAX_ATTEMPTS = 10
-
 
 class UTC(tzinfo):
     """UTC"""
@@ -70,15 +72,19 @@ class LambdaHealthChecker(object):
     """Class for checking Lambda func health via CloudWatch"""
 
     # If a log message meets this exact regex, skip over it
-    NO_OWNER_EMAIL_LOOKUP_WARNING = re.compile(
-        r'.*(ERROR|WARNING).*unable to lookup owner email.*'
-        'Please configure LDAP or org_domain')
-
-    req_id_re = re.compile(
-        r'^(START|END|REPORT|\S+\s\S+)\s'
-        r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}).*'
+    NO_OWNER_EMAIL_LOOKUP_WARNING = (
+        LogLineClassifier.NO_OWNER_EMAIL_LOOKUP_WARNING
     )
 
+    req_id_re = LogLineClassifier.REQ_ID_RE
+
+    #: Maximum length of a CloudWatch Logs filter pattern
+    MAX_FILTER_PATTERN_LENGTH = 1024
+
+    #: Maximum number of filter patterns of one log group to query
+    #: concurrently
+    PATTERN_WORKERS = 4
+
     def __init__(self, func_name, region_name, logs=None, cw=None):
         """
         Initialize LambdaHealthChecker
@@ -87,35 +93,46 @@ class LambdaHealthChecker(object):
         :type func_name: str
         :param region_name: name of the region to run against
         :type region_name: str
-        :param logs: boto3 "logs" service client, or None to create new
+        :param logs: boto3 "logs" service client, or None to use the shared
+          client for the region
         :type logs: boto3.client
-        :param cw: boto3 "cloudwatch" Service Resource, or None to create new
+        :param cw: boto3 "cloudwatch" Service Resource, or None to use the
+          shared resource for the region
         :type cw: boto3.resource
         """
         self._func_name = func_name
         if logs is None:
-            # override default max_attempts from 5 to 10, for throttling
-            retry_conf = Config(
-                retries={'max_attempts': BOTOCORE_MAX_ATTEMPTS})
-            self._logs = boto3.client(
-                'logs', config=retry_conf, region_name=region_name
-            )
+            self._logs = aws_client('logs', region_name)
         else:
             self._logs = logs
         if cw is None:
-            self._cw = boto3.resource('cloudwatch', region_name=region_name)
+            self._cw = aws_resource('cloudwatch', region_name)
         else:
             self._cw = cw
 
     def get_filtered_logs(
             self, request_ids, interval=86400, group_name=None,
-            always_match_re=None, never_match_re=None
+            always_match_re=None, never_match_re=None, always_match_terms=None,
+            since=None, seen_event_ids=None, end_time=None
     ):
         """
         Get CloudWatch logs for the last ``interval`` seconds and return only
         those entries with messages matching ``filter_re``.
 
-        :param request_ids: list of str request IDs to get logs for
+        Only log events containing one of ``request_ids`` (or, if given, one
+        of ``always_match_terms``) are requested from CloudWatch Logs, using
+        filter patterns; if ``always_match_re`` is given without
+        ``always_match_terms``, all log events are requested.
+
+        If ``since`` is given, only log events from that time on are searched
+        for ``always_match_re`` matches, and those in ``seen_event_ids`` are
+        not returned as such; log events of ``request_ids`` are still searched
+        for over the whole ``interval``.
+
+        :param request_ids: str request IDs to get logs for; a ``set`` or
+          :py:class:`~.RequestIdIndex` is used as-is, other collections are
+          converted to a ``set``. Filter patterns are built from its contents
+          when this is called.
         :type request_ids: list
         :param group_name: CloudWatch logs group name. If left at default of
           ``None``, defaults to ``/aws/lambda/{func_name}``.
@@ -127,52 +144,128 @@ class LambdaHealthChecker(object):
         :param never_match_re: Regex for logs to NEVER return, even if they
           match ``always_match_re``.
         :type never_match_re: ``re``
+        :param always_match_terms: CloudWatch Logs filter pattern terms that
+          every log event matching ``always_match_re`` contains
+        :type always_match_terms: list
+        :param since: epoch milliseconds to search for ``always_match_re``
+          matches from, e.g. from a :py:class:`~.LogCheckpoints` checkpoint
+        :type since: int
+        :param seen_event_ids: IDs of log events already reported as
+          ``always_match_re`` matches
+        :type seen_event_ids: ``set``
+        :param end_time: end of the time range to search, in epoch
+          milliseconds; defaults to now
+        :type end_time: int
         :return: dict of request_id to list of log entry dicts
         :rtype: dict
         """
-        logs = self.get_cloudwatch_logs(
-            interval=interval, group_name=group_name
-        )
+        # the IDs of a shared RequestIdIndex not yet tied to other functions
+        ids = list(request_ids)
+        if always_match_re is None or since is None:
+            if always_match_re is not None and always_match_terms is None:
+                patterns = None
+            else:
+                patterns = self.filter_patterns(
+                    ids + list(always_match_terms or [])
+                )
+                if not patterns:
+                    logger.debug(
+                        'No request IDs or terms to search logs of %s for',
+                        self._func_name
+                    )
+                    return {}
+            logs = self.get_cloudwatch_logs(
+                interval=interval, group_name=group_name,
+                filter_patterns=patterns, end_time=end_time
+            )
+        else:
+            results = []
+            id_patterns = self.filter_patterns(ids)
+            if id_patterns:
+                results.append(self.get_cloudwatch_logs(
+                    interval=interval, group_name=group_name,
+                    filter_patterns=id_patterns, end_time=end_time
+                ))
+            results.append(self.get_cloudwatch_logs(
+                interval=interval, group_name=group_name,
+                filter_patterns=(
+                    None if always_match_terms is None
+                    else self.filter_patterns(always_match_terms)
+                ), start_time=since, end_time=end_time
+            ))
+            logs = self._merge_events(results)
         if group_name is None:
             group_name = '/aws/lambda/%s' % self._func_name
+        result = self.filter_logs(
+            logs, request_ids, group_name, always_match_re=always_match_re,
+            never_match_re=never_match_re,
+            always_match_terms=always_match_terms
+        )
+        if since is not None and 'always_match' in result:
+            seen_event_ids = seen_event_ids or set()
+            result['always_match'] = [
+                e for e in result['always_match']
+                if e['timestamp'] >= since and
+                e['eventId'] not in seen_event_ids
+            ]
+            if not result['always_match']:
+                del result['always_match']
+        return result
+
+    def filter_logs(self, logs, request_ids, group_name, always_match_re=None,
+                    never_match_re=None, always_match_terms=None):
+        """
+        Return the entries of ``logs`` that belong to one of ``request_ids``
+        or (if given) match ``always_match_re``, as returned by
+        :py:meth:`~.get_filtered_logs`. Each entry is classified in one pass by
+        a :py:class:`~.LogLineClassifier`.
+
+        :param logs: list of log entry dicts, sorted by timestamp
+        :type logs: list
+        :param request_ids: str request IDs to get logs for; a ``set`` or
+          :py:class:`~.RequestIdIndex` is used as-is, other collections are
+          converted to a ``set``
+        :type request_ids: list
+        :param group_name: CloudWatch logs group name, set as the
+          ``logGroupName`` of entries that do not have one
+        :type group_name: str
+        :param always_match_re: Regex for logs to ALWAYS return
+        :type always_match_re: ``re``
+        :param never_match_re: Regex for logs to NEVER return, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :param always_match_terms: substrings of which every message matching
+          ``always_match_re`` contains at least one, used to skip the regex
+          for other messages
+        :type always_match_terms: list
+        :return: dict of request_id to list of log entry dicts
+        :rtype: dict
+        """
+        if not isinstance(request_ids, (set, frozenset, RequestIdIndex)):
+            request_ids = set(request_ids)
+        classify = LogLineClassifier(
+            request_ids, always_match_re=always_match_re,
+            never_match_re=never_match_re,
+            always_match_terms=always_match_terms
+        ).classify
         result = {}
         matchcount = 0
         for log in logs:
-            m = self.req_id_re.match(log['message'])
-            if always_match_re is None:
-                always_m = None
-            else:
-                # if the regex is found, then skip this log and continue
-                noelw = re.match(self.NO_OWNER_EMAIL_LOOKUP_WARNING,
-                                 log['message'])
-                if noelw:
-                    continue
-                always_m = always_match_re.match(log['message'])
-            if m is None and always_m is None:
+            req_id, always = classify(log['message'])
+            if req_id is None and not always:
                 logger.debug(
-                    'Event %s in group %s stream %s does not match '
-                    'RequestId regex: %s', log['eventId'], group_name,
-                    log['logStreamName'], log['message']
+                    'Event %s in group %s stream %s does not match a failed '
+                    'RequestId or always_match_re: %s', log['eventId'],
+                    group_name, log['logStreamName'], log['message']
                 )
                 continue
-            if m is not None:
-                req_id = m.group(2)
-                if req_id in request_ids:
-                    log['logGroupName'] = group_name
-                    if req_id not in result:
-                        result[req_id] = []
-                    result[req_id].append(log)
-                    matchcount += 1
-            if always_m is not None:
-                if (
-                    never_match_re is not None and
-                    never_match_re.match(log['message'])
-                ):
-                    logger.debug(
-                        'Message matched always_match_re but also '
-                        'never_match_re; suppressing: %s', log['message']
-                    )
-                    continue
+            if req_id is not None:
+                log.setdefault('logGroupName', group_name)
+                if req_id not in result:
+                    result[req_id] = []
+                result[req_id].append(log)
+                matchcount += 1
+            if always:
                 if 'always_match' not in result:
                     result['always_match'] = []
                 result['always_match'].append(log)
@@ -182,96 +275,170 @@ class LambdaHealthChecker(object):
         )
         return result
 
-    def get_cloudwatch_logs(self, interval=86400, group_name=None):
+    @classmethod
+    def filter_patterns(cls, terms):
         """
-        Get CloudWatch logs for the last ``interval`` seconds. The log group
-        name defaults to ``/aws/lambda/{func_name}`` if left at the default of
-        None.
+        Return CloudWatch Logs filter patterns that together match every log
+        event containing any of ``terms``. Terms are combined with the ``?``
+        (OR) operator into as few patterns as fit in
+        :py:attr:`~.MAX_FILTER_PATTERN_LENGTH`.
+
+        :param terms: terms, such as request IDs, to match
+        :type terms: list
+        :return: list of filter patterns; empty if ``terms`` is empty
+        :rtype: list
+        """
+        patterns = []
+        current = ''
+        for term in sorted(set(terms)):
+            part = '?"%s"' % term.replace('"', '\\"')
+            if current and (
+                len(current) + 1 + len(part) > cls.MAX_FILTER_PATTERN_LENGTH
+            ):
+                patterns.append(current)
+                current = ''
+            current = part if not current else current + ' ' + part
+        if current:
+            patterns.append(current)
+        return patterns
+
+    def get_cloudwatch_logs(self, interval=86400, group_name=None,
+                            filter_patterns=None, start_time=None,
+                            end_time=None):
+        """
+        Get CloudWatch logs for the last ``interval`` seconds, across all
+        streams of the log group. The log group name defaults to
+        ``/aws/lambda/{func_name}`` if left at the default of None.
+
+        When there is more than one filter pattern, the patterns are queried
+        concurrently (up to :py:attr:`~.PATTERN_WORKERS` at a time) and their
+        sorted results are merged.
 
         :param group_name: CloudWatch logs group name. If left at default of
           ``None``, defaults to ``/aws/lambda/{func_name}``.
         :type group_name: str
         :param interval: how far back in logs to look, in seconds
         :type interval: int
+        :param filter_patterns: CloudWatch Logs filter patterns; if given, only
+          log events matching any of them are returned (one query is made per
+          pattern). If None, all log events are returned.
+        :type filter_patterns: list
+        :param start_time: if later than ``interval`` seconds before
+          ``end_time``, epoch milliseconds to get logs from instead
+        :type start_time: int
+        :param end_time: epoch milliseconds to get logs until; defaults to now
+        :type end_time: int
         :return: list of log entry dicts, sorted by timestamp
         :rtype: list
         """
         interval = interval * 1000  # milliseconds
-        now = int(time()) * 1000
+        now = end_time if end_time is not None else int(time()) * 1000
         cutoff = now - interval
+        if start_time is not None:
+            cutoff = max(cutoff, start_time)
         if group_name is None:
             group_name = '/aws/lambda/%s' % self._func_name
-        logger.debug('Finding streams in CW Log Group: %s', group_name)
-        paginator = self._logs.get_paginator('describe_log_streams')
-        stream_iterator = paginator.paginate(
-            logGroupName=group_name,
-            orderBy='LastEventTime',
-            descending=True
-        )
-        streams = []
-        try:
-            for resp in stream_iterator:
-                for stream in resp['logStreams']:
-                    if stream.get('lastEventTimestamp', 0) < cutoff:
-                        continue
-                    streams.append(stream['logStreamName'])
-        except Exception as ex:
-            if hasattr(ex, 'response'):
-                emsg = ex.response.get('Error', {}).get('Code', 'unknown')
-                if emsg == 'ResourceNotFoundException':
-                    logger.warning('CloudWatch Log group does not exist: %s',
-                                   group_name)
-                    return []
-            raise
-        logger.debug('Found %d log streams with events in time span',
-                     len(streams))
-        logs = []
-        for sname in streams:
-            logs.extend(self._get_cw_log_stream(
-                group_name,
-                sname,
-                cutoff,
-                now
-            ))
-        return sorted(logs, key=itemgetter('timestamp'))
+        if filter_patterns is None:
+            filter_patterns = [None]
+        if len(filter_patterns) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(len(filter_patterns), self.PATTERN_WORKERS)
+            ) as ex:
+                results = list(ex.map(
+                    lambda p: self._filter_log_events(
+                        group_name, cutoff, now, p
+                    ), filter_patterns
+                ))
+        else:
+            results = [
+                self._filter_log_events(
+                    group_name, cutoff, now, filter_patterns[0]
+                )
+            ]
+        if None in results:
+            logger.warning(
+                'CloudWatch Log group does not exist: %s', group_name
+            )
+            return []
+        events = self._merge_events(results)
+        logger.debug('Found %d log events in group %s',
+                     len(events), group_name)
+        return events
 
-    def _get_cw_log_stream(self, group_name, stream_name, start_ts, end_ts):
+    @staticmethod
+    def _merge_events(results):
         """
-        Return all log messages from the specified stream at or after ``ts``.
+        Merge lists of log events sorted by timestamp into one sorted list,
+        without duplicate events.
 
-        :param group_name: CloudWatch log group name
+        :param results: lists of log entry dicts, each sorted by timestamp
+        :type results: list
+        :return: list of log entry dicts, sorted by timestamp
+        :rtype: list
+        """
+        events = []
+        seen = set()
+        for event in heapq.merge(*results, key=itemgetter('timestamp')):
+            # an event may be in more than one list
+            if event['eventId'] in seen:
+                continue
+            seen.add(event['eventId'])
+            events.append(event)
+        return events
+
+    def _filter_log_events(self, group_name, start_time, end_time,
+                           pattern=None):
+        """
+        Return the log events of ``group_name`` between ``start_time`` and
+        ``end_time`` (epoch milliseconds) matching ``pattern``, sorted by
+        timestamp, or None if the log group does not exist.
+
+        :param group_name: CloudWatch logs group name
         :type group_name: str
-        :param stream_name: CloudWatch log stream name
-        :type stream_name: str
-        :param start_ts: timestamp in milliseconds to return logs after
-        :type start_ts: int
-        :param end_ts: timestamp in milliseconds to return logs before
-        :type end_ts: int
-        :return:
+        :param start_time: start time, in epoch milliseconds
+        :type start_time: int
+        :param end_time: end time, in epoch milliseconds
+        :type end_time: int
+        :param pattern: CloudWatch Logs filter pattern, or None for all events
+        :type pattern: str
+        :return: list of log entry dicts, sorted by timestamp
         :rtype: list
         """
-        messages = []
-        logger.debug('Getting events from CloudWatch Logs Group %s stream %s',
-                     group_name, stream_name)
-        paginator = self._logs.get_paginator('filter_log_events')
-        resp_iter = paginator.paginate(
-            logGroupName=group_name,
-            logStreamNames=[stream_name],
-            startTime=start_ts,
-            endTime=end_ts
+        kwargs = {
+            'logGroupName': group_name,
+            'startTime': start_time,
+            'endTime': end_time
+        }
+        if pattern is not None:
+            kwargs['filterPattern'] = pattern
+        logger.debug(
+            'Getting events from CloudWatch Logs Group %s matching: %s',
+            group_name, pattern
         )
-        for resp in resp_iter:
-            messages.extend(resp['events'])
-        logger.debug('Found %d messages in stream %s',
-                     len(messages), stream_name)
-        return messages
+        events = []
+        try:
+            for resp in self._logs.get_paginator(
+                'filter_log_events'
+            ).paginate(**kwargs):
+                events.extend(resp['events'])
+        except Exception as ex:
+            if hasattr(ex, 'response'):
+                emsg = ex.response.get('Error', {}).get('Code', 'unknown')
+                if emsg == 'ResourceNotFoundException':
+                    return None
+            raise
+        # events from different streams are interleaved, but not strictly
+        # in timestamp order
+        events.sort(key=itemgetter('timestamp'))
+        return events
 
     def get_cloudwatch_metric_sums(self, interval=86400, period=86400):
         """
         Return a dict of CloudWatch Metrics for this Lambda function, summed
         over ``interval``. Keys are metric names ("Errors", "Throttles",
         "Invocations") and values are sums of each ``period``-period datapoint,
-        for the past ``interval`` seconds.
+        for the past ``interval`` seconds. To get the metrics of many
+        functions, use :py:class:`~.LambdaMetricsCollector` directly.
 
         For further information on these metrics, see:
         https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/
@@ -284,35 +451,12 @@ class LambdaHealthChecker(object):
         :return: dict of metric name to sum for the last ``interval`` seconds
         :rtype: dict
         """
-        res = {'Errors': 0.0, 'Throttles': 0.0, 'Invocations': 0.0}
-        now = datetime.utcnow().replace(tzinfo=UTC())
-        start = now - timedelta(seconds=interval)
         logger.debug('Checking CloudWatch Metrics for Lambda function: %s',
                      self._func_name)
-        for m in self._cw.metrics.filter(
-            Namespace='AWS/Lambda',
-            Dimensions=[
-                {
-                    'Name': 'FunctionName',
-                    'Value': self._func_name
-                }
-            ]
-        ):
-            dims = _name_value_dict(m.dimensions)
-            # Lambda metrics are published twice, once with just
-            # FunctionName, and a second time with both FunctionName and
-            # Resource. Skip the duplicates that also have Resource dimension.
-            if dims.keys() != ['FunctionName']:
-                continue
-            stats = m.get_statistics(
-                Dimensions=[{'Name': 'FunctionName', 'Value': self._func_name}],
-                StartTime=start,
-                EndTime=now,
-                Period=period,
-                Statistics=['Sum']
-            )
-            val = sum([x['Sum'] for x in stats['Datapoints']])
-            res[m.metric_name] = val
+        # use the resource's client; unlike the resource, it is thread-safe
+        res = LambdaMetricsCollector(self._cw.meta.client).get_metric_sums(
+            [self._func_name], interval=interval, period=period
+        )[self._func_name]
         logger.debug('Metrics for %s: %s', self._func_name, res)
         return res
 
@@ -327,13 +471,14 @@ class LambdaHealthChecker(object):
         :type filter: ``str`` ``re.RegexObject``
         :param region_name: region name to run against
         :type region_name: str
-        :param client: boto3 Lambda client, or None to create new
+        :param client: boto3 Lambda client, or None to use the shared client
+          for the region
         :type client: ``boto3.client``
         :return: list of matching Lambda function names
         :rtype: list
         """
         if client is None:
-            client = boto3.client('lambda', region_name=region_name)
+            client = aws_client('lambda', region_name)
         if isinstance(filter, type('')):
             filter = re.compile('^' + re.escape(filter) + '.*')
         logger.debug(
@@ -352,6 +497,120 @@ class LambdaHealthChecker(object):
         return sorted(matches)
 
 
+class LambdaMetricsCollector(object):
+    """
+    Collects the CloudWatch Metrics that :py:class:`~.CustodianErrorReporter`
+    checks for many Lambda functions at once, with batched ``GetMetricData``
+    calls.
+    """
+
+    #: Lambda metrics to collect
+    METRICS = ['Errors', 'Throttles', 'Invocations']
+
+    #: Maximum number of metric data queries in one ``GetMetricData`` request
+    MAX_QUERIES = 500
+
+    def __init__(self, client):
+        """
+        :param client: boto3 "cloudwatch" service client
+        :type client: boto3.client
+        """
+        self._client = client
+
+    def get_metric_sums(self, func_names, interval=86400, period=86400):
+        """
+        Return the sums of :py:attr:`~.METRICS` for each of ``func_names``,
+        over the past ``interval`` seconds. Only the metrics published with
+        just the ``FunctionName`` dimension are used (Lambda also publishes
+        them with ``FunctionName`` and ``Resource`` dimensions).
+
+        :param func_names: Lambda function names
+        :type func_names: list
+        :param interval: how many seconds of historical data to request
+        :type interval: int
+        :param period: the metric collection period to request from CloudWatch
+        :type period: int
+        :return: dict of function name to dict of metric name to sum
+        :rtype: dict
+        """
+        now = datetime.utcnow().replace(tzinfo=UTC())
+        start = now - timedelta(seconds=interval)
+        res = {}
+        queries = []
+        for fname in func_names:
+            res[fname] = {x: 0.0 for x in self.METRICS}
+            for mname in self.METRICS:
+                queries.append(((fname, mname), {
+                    'Id': 'm%d' % len(queries),
+                    'MetricStat': {
+                        'Metric': {
+                            'Namespace': 'AWS/Lambda',
+                            'MetricName': mname,
+                            'Dimensions': [
+                                {'Name': 'FunctionName', 'Value': fname}
+                            ]
+                        },
+                        'Period': period,
+                        'Stat': 'Sum'
+                    },
+                    'ReturnData': True
+                }))
+        ids = {q['Id']: key for key, q in queries}
+        paginator = self._client.get_paginator('get_metric_data')
+        for i in range(0, len(queries), self.MAX_QUERIES):
+            chunk = [q for _, q in queries[i:i + self.MAX_QUERIES]]
+            logger.debug(
+                'Getting %d Lambda metrics with GetMetricData', len(chunk)
+            )
+            for page in paginator.paginate(
+                MetricDataQueries=chunk, StartTime=start, EndTime=now
+            ):
+                for result in page['MetricDataResults']:
+                    fname, mname = ids[result['Id']]
+                    res[fname][mname] += sum(result['Values'])
+        return res
+
+
+class RequestIdIndex(object):
+    """
+    Thread-safe set of the failed Lambda request IDs not yet tied to a
+    function, shared by the threads of a :py:class:`~.CustodianErrorReporter`.
+    Each thread removes the IDs it finds in a function's logs as soon as it
+    has them, so functions checked later neither query nor match them.
+    Membership tests are O(1); iterating returns a sorted snapshot.
+    """
+
+    def __init__(self, request_ids=()):
+        """
+        :param request_ids: initial request IDs
+        :type request_ids: list
+        """
+        self._lock = threading.Lock()
+        self._ids = set(request_ids)
+
+    def __contains__(self, request_id):
+        with self._lock:
+            return request_id in self._ids
+
+    def __iter__(self):
+        with self._lock:
+            return iter(sorted(self._ids))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+    def discard(self, request_ids):
+        """
+        Remove request IDs, once they are tied to a function.
+
+        :param request_ids: request IDs
+        :type request_ids: list
+        """
+        with self._lock:
+            self._ids.difference_update(request_ids)
+
+
 class CustodianErrorReporter(object):
     """Scan and report on CW Metrics/Logs errors for c7n lambdas"""
 
@@ -364,37 +623,56 @@ class CustodianErrorReporter(object):
     #: What period to request CloudWatch metrics for
     METRIC_PERIOD = 86400
 
-    #: Amount of time (float seconds) to sleep between checking each function,
-    #: to try to avoid API rate limiting.
-    INTER_FUNC_SLEEP = 3.0
+    #: Default number of Lambda functions to check concurrently
+    WORKERS = 8
+
+    #: Maximum number of concurrent receivers draining the dead letter queue
+    DLQ_RECEIVERS = 4
+
+    #: Number of empty short polls in a row after which a dead letter queue
+    #: receiver stops, even if fewer messages than expected were received
+    DLQ_EMPTY_RECEIVES = 3
 
     ALL_ERROR_FUNCTIONS = re.compile(r'^cloud-custodian.*')
-    ALL_ERROR_LOG_RE = re.compile(r'.*(ERROR|WARNING).*')
+    ALL_ERROR_LOG_RE = re.compile(r'.*?(ERROR|WARNING)')
 
-    def __init__(self, config, region_name):
+    #: CloudWatch Logs filter pattern terms for :py:attr:`~.ALL_ERROR_LOG_RE`
+    ALL_ERROR_LOG_TERMS = ['ERROR', 'WARNING']
+
+    def __init__(self, config, region_name, checkpoints=None, output=None):
         """
         :param config: a non-region-specific config for this account
         :type config: CaisConfig
         :param region_name: the name of the region to run against
         :type region_name: str
+        :param checkpoints: checkpoints to scan incrementally from and
+          update, or None to scan the full interval
+        :type checkpoints: LogCheckpoints
+        :param output: file-like object to print the report to, or None for
+          STDOUT
         """
+        self._output = output
         self._config = config.config_for_region(region_name)
         self._region_name = region_name
-        # override default max_attempts from 5 to 10, for throttling
-        retry_conf = Config(retries={'max_attempts': BOTOCORE_MAX_ATTEMPTS})
-        self._logs = boto3.client(
-            'logs', config=retry_conf, region_name=region_name
-        )
-        self._cw = boto3.resource('cloudwatch', region_name=region_name)
-        self._lambda = boto3.client('lambda', region_name=region_name)
-        self._sqs = boto3.client('sqs', region_name=region_name)
+        self._logs = aws_client('logs', region_name)
+        self._cw = aws_resource('cloudwatch', region_name)
+        self._lambda = aws_client('lambda', region_name)
+        self._sqs = aws_client('sqs', region_name)
         self._dlq_url = self._sqs_arn_to_url(
             self._config.dead_letter_queue_arn
         )
         self._now = datetime.now()
+        self._end_time = int(time()) * 1000
+        self._checkpoints = checkpoints
         self._start = self._now - timedelta(seconds=self.INTERVAL)
         self._failed_request_ids = {}  # set by _get_sqs_dlq()
-        self._sqs_rcpts = []  # set by _get_sqs_dlq()
+        self._unattributed = RequestIdIndex()  # set by _get_sqs_dlq()
+        self._sqs_rcpts = {}  # set by _get_sqs_dlq()
+        self._metrics = {}  # set by run()
+
+    def _print(self, msg):
+        """Print one line of the report to the output."""
+        print(msg, file=self._output)
 
     def _sqs_arn_to_url(self, arn):
         """
@@ -423,13 +701,33 @@ class CustodianErrorReporter(object):
             logger.info('SQS Queue %s does not exist', arn)
             return None
 
-    def run(self, never_match_re=None):
-        """ collect and report on all cloud-custodian Lambda errors """
-        print(
+    def run(self, never_match_re=None, jobs=None, insights=False):
+        """
+        Collect and report on all cloud-custodian Lambda errors. Functions are
+        checked concurrently on ``jobs`` threads, sharing one client per API
+        whose adaptive retry mode (see :py:const:`~.utils.BOTOCORE_CONFIG`)
+        rate-limits the calls of all threads; results are printed in function
+        name order.
+
+        If ``insights`` is True, the logs of all functions and of the
+        ``custodian_log_group`` are instead searched at once with CloudWatch
+        Logs Insights queries (see :py:meth:`~._get_insights_results`).
+
+        :param never_match_re: Regex for logs to NEVER return, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :param jobs: number of functions to check concurrently; defaults to
+          :py:attr:`~.WORKERS`
+        :type jobs: int
+        :param insights: whether to search logs with Logs Insights
+        :type insights: bool
+        """
+        self._print(
             'Searching cloud-custodian Lambda functions for failed invocations'
         )
         lambda_names = LambdaHealthChecker.find_matching_func_names(
-            re.compile(r'^(custodian-|cloud-custodian-).*'), self._region_name
+            re.compile(r'^(custodian-|cloud-custodian-).*'), self._region_name,
+            client=self._lambda
         )
         logger.debug('Custodian Lambda functions: %s', lambda_names)
         errors = False
@@ -438,75 +736,263 @@ class CustodianErrorReporter(object):
             '%d failed Lambda invocations: %s',
             len(self._failed_request_ids), self._failed_request_ids.keys()
         )
-        for fname in lambda_names:
-            if not self._check_function(fname, never_match_re=never_match_re):
-                logger.info(
-                    '_check_function returned False (NOT HEALTHY) for: %s',
-                    fname
+        req_ids = self._unattributed
+        self._metrics = LambdaMetricsCollector(
+            self._cw.meta.client
+        ).get_metric_sums(
+            lambda_names, interval=self.INTERVAL, period=self.METRIC_PERIOD
+        )
+        if insights:
+            errors = self._report_results(self._get_insights_results(
+                lambda_names, req_ids, never_match_re=never_match_re
+            ))
+        else:
+            with ThreadPoolExecutor(max_workers=jobs or self.WORKERS) as ex:
+                futures = [
+                    ex.submit(
+                        self._get_function_data, fname, req_ids,
+                        never_match_re=never_match_re
+                    ) for fname in lambda_names
+                ]
+                # report in function name order, as each result is available
+                errors = self._report_results(
+                    (fname, ) + future.result()
+                    for fname, future in zip(lambda_names, futures)
                 )
-                errors = True
-            logger.debug(
-                'Sleeping %s seconds before checking next function',
-                self.INTER_FUNC_SLEEP
-            )
-            sleep(self.INTER_FUNC_SLEEP)
         self._ack_sqs()
-        req_ids = [
-            i for i in self._failed_request_ids
-            if self._failed_request_ids[i] is None
-        ]
+        if self._checkpoints is not None:
+            self._checkpoints.save()
+        req_ids = list(self._unattributed)
         if len(req_ids) > 0:
-            print(
+            self._print(
                 "\n\n" +
                 red('ERROR: %d failed Lambda RequestIDs could not be tied '
                     'to their function names: %s' % (len(req_ids), req_ids)) +
                 "\n\n"
             )
         if errors:
-            print('Some lambda functions had errors in the last '
-                  '%s' % self.INVL_DESC)
+            self._print('Some lambda functions had errors in the last '
+                        '%s' % self.INVL_DESC)
             raise SystemExit(1)
-        print('No Lambda functions had errors in the last ' + self.INVL_DESC)
+        self._print(
+            'No Lambda functions had errors in the last ' + self.INVL_DESC
+        )
+
+    def _report_results(self, results):
+        """
+        Report on the health of Lambda functions with
+        :py:meth:`~._report_function`, in order.
+
+        :param results: iterable of (func_name, logs, metrics) tuples
+        :return: whether any function had errors/failures
+        :rtype: bool
+        """
+        errors = False
+        for fname, logs, metrics in results:
+            if not self._report_function(fname, logs, metrics):
+                logger.info(
+                    '_check_function returned False (NOT HEALTHY) for: %s',
+                    fname
+                )
+                errors = True
+        return errors
+
+    def _get_insights_results(self, lambda_names, req_ids,
+                              never_match_re=None):
+        """
+        Search the log groups of all ``lambda_names`` and the configured
+        ``custodian_log_group`` with CloudWatch Logs Insights, for the failed
+        request IDs and for ``ERROR`` and ``WARNING`` lines, and map the log
+        events found back to functions. Events in the ``custodian_log_group``
+        are mapped to the function of the policy named by their log stream;
+        those that cannot be are reported under the log group's name.
+
+        Events are filtered the same way as by :py:meth:`~._get_function_data`,
+        and the request IDs found are removed from ``req_ids`` likewise;
+        ``ERROR`` and ``WARNING`` lines are only reported for
+        ``cloud-custodian-*`` functions and the ``custodian_log_group``.
+
+        :param lambda_names: names of the Lambda functions to report on
+        :type lambda_names: list
+        :param req_ids: failed Lambda request IDs not yet tied to a function
+        :type req_ids: RequestIdIndex
+        :param never_match_re: Regex for logs to NEVER return, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :return: list of (func_name, logs, metrics) tuples, for every function
+          in ``lambda_names`` order and then the ``custodian_log_group`` if it
+          had matching events
+        :rtype: list
+        """
+        log_group = self._config.custodian_log_group
+        func_groups = {'/aws/lambda/%s' % f: f for f in lambda_names}
+        scanner = LogsInsightsScanner(self._logs)
+        groups = [
+            g for g in scanner.find_log_groups(
+                sorted(set(
+                    ['/aws/lambda/custodian-', '/aws/lambda/cloud-custodian-',
+                     log_group]
+                ))
+            ) if g in func_groups or g == log_group
+        ]
+        end = int(time())
+        events = scanner.search(
+            groups, list(req_ids) + self.ALL_ERROR_LOG_TERMS,
+            end - self.INTERVAL, end
+        )
+        func_events = {}
+        for group, group_events in sorted(events.items()):
+            if group != log_group:
+                func_events.setdefault(func_groups[group], []).extend(
+                    group_events
+                )
+                continue
+            for e in group_events:
+                # c7n names streams after the policy, optionally prefixed with
+                # the region and/or account ID
+                fname = self._config.function_prefix + (
+                    e['logStreamName'] or ''
+                ).split('/')[-1]
+                if fname not in lambda_names:
+                    fname = log_group
+                func_events.setdefault(fname, []).append(e)
+        results = []
+        no_metrics = {x: 0.0 for x in LambdaMetricsCollector.METRICS}
+        for fname in lambda_names + (
+            [log_group] if log_group in func_events else []
+        ):
+            c = LambdaHealthChecker(
+                fname, self._region_name, logs=self._logs, cw=self._cw
+            )
+            logs = {}
+            for group in sorted(set(
+                e['logGroupName'] for e in func_events.get(fname, [])
+            )):
+                kwargs = {}
+                if group == log_group or self.ALL_ERROR_FUNCTIONS.match(fname):
+                    kwargs = {
+                        'always_match_re': self.ALL_ERROR_LOG_RE,
+                        'never_match_re': never_match_re,
+                        'always_match_terms': self.ALL_ERROR_LOG_TERMS
+                    }
+                found = c.filter_logs(
+                    [
+                        e for e in func_events[fname]
+                        if e['logGroupName'] == group
+                    ], req_ids, group, **kwargs
+                )
+                for k, v in found.items():
+                    logs.setdefault(k, []).extend(v)
+            req_ids.discard(k for k in logs if k != 'always_match')
+            results.append((fname, logs, self._metrics.get(fname, no_metrics)))
+        return results
 
     def _get_sqs_dlq(self):
         """
         Pull all messages from the SQS Dead Letter Queue. Add the failed Lambda
-        RequestIDs to `self._failed_request_ids` and the SQS Reciept Handles
-        to `self._sqs_rcpts`.
+        RequestIDs to `self._failed_request_ids` and the SQS Receipt Handles of
+        the messages processed to `self._sqs_rcpts`.
+
+        The queue is drained by up to :py:attr:`~.DLQ_RECEIVERS` concurrent
+        receivers (fewer if the queue's ``ApproximateNumberOfMessages`` is
+        low), which short-poll it and stop once it appears empty.
         """
         if self._dlq_url is None:
             logger.warning('Dead-letter SQS queue could not be found; skipping')
             return
-        count = 0
-        msgs = [None]
-        logger.info('Polling SQS queue: %s', self._dlq_url)
-        while len(msgs) > 0:
-            response = self._sqs.receive_message(
+        hint = int(self._sqs.get_queue_attributes(
+            QueueUrl=self._dlq_url,
+            AttributeNames=['ApproximateNumberOfMessages']
+        )['Attributes']['ApproximateNumberOfMessages'])
+        receivers = max(1, min(self.DLQ_RECEIVERS, (hint + 9) // 10))
+        logger.info(
+            'Polling SQS queue with %d receivers (approximately %d '
+            'messages): %s', receivers, hint, self._dlq_url
+        )
+        lock = threading.Lock()
+        seen = set()
+        with ThreadPoolExecutor(max_workers=receivers) as ex:
+            futures = [
+                ex.submit(self._receive_sqs_dlq, hint, lock, seen)
+                for _ in range(receivers)
+            ]
+            for f in futures:
+                f.result()
+        self._unattributed = RequestIdIndex(
+            i for i in self._failed_request_ids
+            if self._failed_request_ids[i] is None
+        )
+        logger.info('Received %d SQS messages in total', len(self._sqs_rcpts))
+        logger.debug('SQS Message Receipt Handles: %s', self._sqs_rcpts)
+
+    def _receive_sqs_dlq(self, hint, lock, seen):
+        """
+        Receive messages from the SQS Dead Letter Queue until a short poll
+        returns none, and either at least ``hint`` messages were received in
+        total or :py:attr:`~.DLQ_EMPTY_RECEIVES` polls in a row returned none.
+        Runs in a worker thread of :py:meth:`~._get_sqs_dlq`.
+
+        :param hint: approximate number of messages in the queue
+        :type hint: int
+        :param lock: lock guarding ``seen``, ``self._failed_request_ids`` and
+          ``self._sqs_rcpts``
+        :type lock: ``threading.Lock``
+        :param seen: IDs of the messages received by all receivers
+        :type seen: set
+        """
+        empty = 0
+        while True:
+            msgs = self._sqs.receive_message(
                 QueueUrl=self._dlq_url,
-                WaitTimeSeconds=20,
+                WaitTimeSeconds=0,
                 MaxNumberOfMessages=10,
                 MessageAttributeNames=['RequestID', 'ErrorMessage'],
                 AttributeNames=['SentTimestamp']
-            )
-            msgs = response.get('Messages', [])
+            ).get('Messages', [])
             logger.debug('%d SQS Messages received from one poll', len(msgs))
-            for m in msgs:
-                count += 1
-                self._failed_request_ids[
-                    m['MessageAttributes']['RequestID']['StringValue']] = None
-                self._sqs_rcpts.append(m['ReceiptHandle'])
-        logger.info('Received %d SQS messages in total', count)
-        logger.debug('SQS Message Receipt Handles: %s', self._sqs_rcpts)
+            with lock:
+                for m in msgs:
+                    seen.add(m['MessageId'])
+                    try:
+                        req_id = m['MessageAttributes']['RequestID'][
+                            'StringValue']
+                    except KeyError:
+                        logger.warning(
+                            'SQS message %s has no RequestID attribute; '
+                            'leaving it in the queue', m['MessageId']
+                        )
+                        continue
+                    self._failed_request_ids.setdefault(req_id, None)
+                    # a message may be received again (with a new receipt
+                    # handle) once its visibility timeout expires
+                    self._sqs_rcpts[m['MessageId']] = m['ReceiptHandle']
+                count = len(seen)
+            if msgs:
+                empty = 0
+                continue
+            empty += 1
+            if count >= hint or empty >= self.DLQ_EMPTY_RECEIVES:
+                return
 
     def _ack_sqs(self):
         """
-        Delete (ack) all SQS messages in `self._sqs_rcpts`.
+        Delete (ack) all SQS messages in `self._sqs_rcpts`, in batches of 10.
         """
-        for rh in self._sqs_rcpts:
-            self._sqs.delete_message(
+        handles = sorted(self._sqs_rcpts.items())
+        for i in range(0, len(handles), 10):
+            resp = self._sqs.delete_message_batch(
                 QueueUrl=self._dlq_url,
-                ReceiptHandle=rh
+                Entries=[
+                    {'Id': str(idx), 'ReceiptHandle': rh}
+                    for idx, (_, rh) in enumerate(handles[i:i + 10])
+                ]
             )
+            for f in resp.get('Failed', []):
+                logger.warning(
+                    'Failed to delete SQS message %s: %s %s',
+                    handles[i + int(f['Id'])][0], f.get('Code'),
+                    f.get('Message')
+                )
 
     def _check_function(self, func_name, never_match_re=None):
         """
@@ -521,21 +1007,113 @@ class CustodianErrorReporter(object):
         :return: whether the function had errors/failures
         :rtype: bool
         """
+        logs, metrics = self._get_function_data(
+            func_name, self._unattributed, never_match_re=never_match_re
+        )
+        return self._report_function(func_name, logs, metrics)
+
+    def _get_function_data(self, func_name, req_ids, never_match_re=None):
+        """
+        Get the filtered logs and the metric sums of one Lambda function, and
+        remove the request IDs found in its logs from ``req_ids``. This only
+        makes (thread-safe) API calls, and may run in a worker thread.
+
+        :param func_name: Lambda function name to check
+        :type func_name: str
+        :param req_ids: failed Lambda request IDs not yet tied to a function
+        :type req_ids: RequestIdIndex
+        :param never_match_re: Regex for logs to NEVER return, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :return: (logs, metrics); see
+          :py:meth:`~.LambdaHealthChecker.get_filtered_logs` and
+          :py:meth:`~.LambdaHealthChecker.get_cloudwatch_metric_sums`. Metrics
+          come from those collected for all functions by :py:meth:`~.run`
+          where available.
+        :rtype: tuple
+        """
         c = LambdaHealthChecker(
             func_name, self._region_name, logs=self._logs, cw=self._cw
         )
-        req_ids = [
-            i for i in self._failed_request_ids
-            if self._failed_request_ids[i] is None
-        ]
-        if self.ALL_ERROR_FUNCTIONS.match(func_name):
+        if (
+            self.ALL_ERROR_FUNCTIONS.match(func_name) and
+            self._checkpoints is not None
+        ):
+            logs = self._get_incremental_logs(c, func_name, req_ids,
+                                              never_match_re=never_match_re)
+        elif self.ALL_ERROR_FUNCTIONS.match(func_name):
             logs = c.get_filtered_logs(
                 req_ids, always_match_re=self.ALL_ERROR_LOG_RE,
-                never_match_re=never_match_re
+                never_match_re=never_match_re,
+                always_match_terms=self.ALL_ERROR_LOG_TERMS
             )
         else:
             logs = c.get_filtered_logs(req_ids)
-        metrics = c.get_cloudwatch_metric_sums()
+        req_ids.discard(k for k in logs if k != 'always_match')
+        if func_name in self._metrics:
+            return logs, self._metrics[func_name]
+        return logs, c.get_cloudwatch_metric_sums()
+
+    def _get_incremental_logs(self, checker, func_name, req_ids,
+                              never_match_re=None):
+        """
+        Get the filtered logs of a ``cloud-custodian-*`` function, searching
+        for :py:attr:`~.ALL_ERROR_LOG_RE` matches only since the checkpoint of
+        its log group, and record a new checkpoint. Log events of the failed
+        request IDs are still searched for over the whole interval, since
+        dead letter queue messages may arrive after the logs of their
+        invocations were scanned.
+
+        :param checker: health checker for the function
+        :type checker: LambdaHealthChecker
+        :param func_name: Lambda function name
+        :type func_name: str
+        :param req_ids: failed Lambda request IDs not yet tied to a function
+        :type req_ids: RequestIdIndex
+        :param never_match_re: Regex for logs to NEVER return, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :return: filtered logs; see
+          :py:meth:`~.LambdaHealthChecker.get_filtered_logs`
+        :rtype: dict
+        """
+        acct_id = self._config.account_id
+        group_name = '/aws/lambda/%s' % func_name
+        cp = self._checkpoints.get(acct_id, self._region_name, group_name)
+        since, seen = cp if cp is not None else (None, {})
+        logger.debug(
+            'Scanning %s for new errors since %s', group_name, since
+        )
+        logs = checker.get_filtered_logs(
+            req_ids, interval=self.INTERVAL, group_name=group_name,
+            always_match_re=self.ALL_ERROR_LOG_RE,
+            never_match_re=never_match_re,
+            always_match_terms=self.ALL_ERROR_LOG_TERMS, since=since,
+            seen_event_ids=set(seen.keys()), end_time=self._end_time
+        )
+        for e in logs.get('always_match', []):
+            seen[e['eventId']] = e['timestamp']
+        self._checkpoints.record(
+            acct_id, self._region_name, group_name, self._end_time, seen
+        )
+        return logs
+
+    def _report_function(self, func_name, logs, metrics):
+        """
+        Print information on the health of one Lambda function to STDOUT, and
+        record the failed request IDs found in its logs as tied to it (they are
+        already removed from :py:class:`~.RequestIdIndex` by the thread that
+        found them). Return True for healthy, False if errors/failures.
+
+        :param func_name: Lambda function name
+        :type func_name: str
+        :param logs: filtered logs of the function
+        :type logs: dict
+        :param metrics: metric sums of the function
+        :type metrics: dict
+        :return: whether the function had errors/failures
+        :rtype: bool
+        """
         msg = []
         if metrics['Invocations'] > 0:
             throttle_pct = (metrics['Throttles'] / metrics['Invocations']) * 100
@@ -558,52 +1136,91 @@ class CustodianErrorReporter(object):
                 )
             )
         if len(logs) < 1 and len(msg) == 0:
-            print(green('%s: OK\n' % func_name))
+            self._print(green('%s: OK\n' % func_name))
             return True
-        print(red('%s: ERRORS' % func_name))
+        self._print(red('%s: ERRORS' % func_name))
         for m in msg:
-            print("\t%s" % red(m))
+            self._print("\t%s" % red(m))
         if len(logs) < 1:
             return True
-        print("\n\tLogs For Failed Invocations:\n")
+        self._print("\n\tLogs For Failed Invocations:\n")
         for req_id in logs.keys():
             if req_id == 'always_match':
                 continue
             events = logs[req_id]
             self._failed_request_ids[req_id] = func_name
-            print("\t" + red('RequestID=%s logGroupName=%s logStreamName=%s' % (
-                req_id, events[0]['logGroupName'], events[0]['logStreamName']
-            )))
+            self._print("\t" + red(
+                'RequestID=%s logGroupName=%s logStreamName=%s' % (
+                    req_id, events[0]['logGroupName'],
+                    events[0]['logStreamName']
+                )
+            ))
             for e in events:
-                print("\n".join([
+                self._print("\n".join([
                     "\t\t%s" % line.replace("\t", ' ')
                     for line in e['message'].split("\n")
                     if line.strip() != ''
                 ]))
         if 'always_match' in logs:
-            print("\t" + red(
+            self._print("\t" + red(
                 'Always-Match Logs (RequestID not in DLQ, but log matches '
                 'regex that we want to always alarm on)'
             ))
             for e in logs['always_match']:
-                print("\n".join([
+                self._print("\n".join([
                     "\t\t%s" % line.replace("\t", ' ')
                     for line in e['message'].split("\n")
                     if line.strip() != ''
                 ]))
-        print('')
+        self._print('')
         return False
 
 
-def _name_value_dict(lst):
+def scan_regions(config, region_names, checkpoints=None, **kwargs):
     """
-    Given a list (``lst``) containing dicts with ``Name`` and ``Value`` keys,
-    return a single dict of Name -> Value.
+    Run a :py:class:`~.CustodianErrorReporter` for each of ``region_names``
+    concurrently. Each region's report is buffered and printed to STDOUT under
+    a heading, in ``region_names`` order, once that region is done.
+
+    :param config: a non-region-specific config for this account
+    :type config: ManheimConfig
+    :param region_names: names of the regions to scan
+    :type region_names: list
+    :param checkpoints: checkpoints to scan incrementally from and update,
+      shared by all regions, or None to scan the full interval
+    :type checkpoints: LogCheckpoints
+    :param kwargs: keyword arguments for :py:meth:`~.CustodianErrorReporter.run`
+    :return: list of the names of the regions that had errors or failed
+    :rtype: list
     """
-    res = {}
-    for item in lst:
-        res[item['Name']] = item['Value']
-    return res
+
+    def scan(region_name, output):
+        try:
+            CustodianErrorReporter(
+                config, region_name, checkpoints=checkpoints, output=output
+            ).run(**kwargs)
+        except SystemExit as ex:
+            return ex.code in [0, None]
+        except Exception:
+            logger.exception('errorscan failed in region %s', region_name)
+            output.write(red('errorscan failed in %s' % region_name) + '\n')
+            return False
+        return True
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(region_names)) as ex:
+        outputs = [StringIO() for _ in region_names]
+        futures = [
+            ex.submit(scan, rname, out)
+            for rname, out in zip(region_names, outputs)
+        ]
+        for rname, out, future in zip(region_names, outputs, futures):
+            ok = future.result()
+            print(bold('===== %s =====' % rname))
+            print(out.getvalue())
+            if not ok:
+                failed.append(rname)
+    return failed
 
 
 def parse_args(argv):
@@ -627,11 +1244,34 @@ def parse_args(argv):
                    action='store', default=None,
                    help='Regex for Lambda function logs to suppress/never '
                         'match')
+    p.add_argument('-j', '--jobs', dest='jobs', type=int, action='store',
+                   default=CustodianErrorReporter.WORKERS,
+                   help='Number of Lambda functions to check concurrently '
+                        '(default: %d)' % CustodianErrorReporter.WORKERS)
+    p.add_argument('-I', '--insights', dest='insights', action='store_true',
+                   default=False,
+                   help='Search the logs of all functions at once with '
+                        'CloudWatch Logs Insights queries, including the '
+                        'custodian_log_group')
+    p.add_argument('--incremental', dest='incremental', action='store_true',
+                   default=False,
+                   help='Only report ERROR and WARNING log lines of '
+                        'cloud-custodian-* functions that are newer than the '
+                        'checkpoint of their log group, and update the '
+                        'checkpoints')
+    p.add_argument('--checkpoints', dest='checkpoints', action='store',
+                   default='errorscan-checkpoints.json',
+                   help='Local path or s3://BUCKET/KEY URL of the checkpoints '
+                        'file for --incremental (default: '
+                        './errorscan-checkpoints.json)')
     p.add_argument('ACCOUNT_NAME', action='store', type=str,
                    help='Account name to run errorscan against')
-    p.add_argument('REGION_NAME', action='store', type=str,
-                   help='AWS Region name to run errorscan against')
+    p.add_argument('REGION_NAME', action='store', type=str, nargs='+',
+                   help='AWS Region name(s) to run errorscan against, or '
+                        '"all" for all regions in the configuration file')
     args = p.parse_args(argv)
+    if args.incremental and args.insights:
+        p.error('--incremental cannot be used with --insights')
     return args
 
 
@@ -649,9 +1289,34 @@ def main():
         assume_role(conf)
     if args.never_match_re is not None:
         args.never_match_re = re.compile(args.never_match_re)
-    CustodianErrorReporter(conf, args.REGION_NAME).run(
-        never_match_re=args.never_match_re
+    if args.REGION_NAME == ['all']:
+        region_names = conf.regions
+    else:
+        region_names = args.REGION_NAME
+    checkpoints = None
+    if args.incremental:
+        checkpoints = LogCheckpoints(args.checkpoints, region_names[0])
+    kwargs = {
+        'never_match_re': args.never_match_re,
+        'jobs': args.jobs,
+        'insights': args.insights
+    }
+    if len(region_names) == 1:
+        CustodianErrorReporter(
+            conf, region_names[0], checkpoints=checkpoints
+        ).run(**kwargs)
+        return
+    failed = scan_regions(
+        conf, region_names, checkpoints=checkpoints, **kwargs
     )
+    if failed:
+        print(red(
+            'errorscan found errors in %d of %d regions: %s' % (
+                len(failed), len(region_names), ', '.join(failed)
+            )
+        ))
+        raise SystemExit(1)
+    print(green('errorscan found no errors in %d regions' % len(region_names)))
 
 
 if __name__ == "__main__":
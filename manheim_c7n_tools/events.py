@@ -0,0 +1,153 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Machine-readable progress events for :py:class:`~.runner.CustodianRunner`
+runs, written as `JSON Lines <http://jsonlines.org/>`_.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class EventSink(object):
+    """
+    Writes one JSON object per line to a stream for each progress event. Every
+    event has ``event`` (the event type) and ``timestamp`` (seconds since the
+    epoch) keys, plus everything in :py:attr:`~.context` and the fields passed
+    to :py:meth:`~.emit`. A sink with no stream silently discards events.
+
+    Writes are serialized with a lock, so one sink may be shared between
+    threads.
+    """
+
+    def __init__(self, stream=None, close_stream=False):
+        """
+        :param stream: file-like object to write events to, or None to discard
+          them
+        :type stream: object
+        :param close_stream: whether :py:meth:`~.close` should close ``stream``
+        :type close_stream: bool
+        """
+        self._stream = stream
+        self._close_stream = close_stream
+        self._lock = threading.Lock()
+        #: fields included in every event
+        self.context = {}
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Return an EventSink writing to (and truncating) the file at ``path``.
+
+        :param path: path to write events to
+        :type path: str
+        :rtype: EventSink
+        """
+        logger.info('Writing progress events to: %s', path)
+        return cls(open(path, 'w'), close_stream=True)
+
+    @classmethod
+    def from_fd(cls, fd):
+        """
+        Return an EventSink writing to the already-open file descriptor
+        ``fd``, such as a pipe set up by a CI system. The descriptor itself is
+        not closed by :py:meth:`~.close`.
+
+        :param fd: file descriptor number to write events to
+        :type fd: int
+        :rtype: EventSink
+        """
+        logger.info('Writing progress events to file descriptor %d', fd)
+        return cls(os.fdopen(fd, 'w', closefd=False), close_stream=True)
+
+    @property
+    def enabled(self):
+        return self._stream is not None
+
+    def emit(self, event, **fields):
+        """
+        Write one event.
+
+        :param event: event type, e.g. "step_start"
+        :type event: str
+        :param fields: additional fields to include in the event
+        """
+        if self._stream is None:
+            return
+        data = dict(self.context)
+        data.update(fields)
+        data['event'] = event
+        data['timestamp'] = round(time.time(), 6)
+        line = json.dumps(data, sort_keys=True, default=str) + "\n"
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
+
+    @contextmanager
+    def span(self, kind, emit_error=False, **fields):
+        """
+        Context manager that emits ``<kind>_start`` on entry and
+        ``<kind>_end`` on exit. The end event includes ``duration`` (in
+        seconds) and ``success``, and ``error`` if an exception was raised;
+        the exception is re-raised.
+
+        :param kind: kind of span, e.g. "step" or "region"
+        :type kind: str
+        :param emit_error: if True, also emit an ``error`` event (before the
+          end event) when an exception is raised
+        :type emit_error: bool
+        :param fields: additional fields to include in all events
+        """
+        self.emit('%s_start' % kind, **fields)
+        start = time.perf_counter()
+        end = dict(fields)
+        try:
+            yield
+            end['success'] = True
+        except BaseException as ex:
+            end['success'] = False
+            end['error'] = _describe(ex)
+            if emit_error:
+                self.error(ex, **fields)
+            raise
+        finally:
+            end['duration'] = round(time.perf_counter() - start, 6)
+            self.emit('%s_end' % kind, **end)
+
+    def error(self, ex, **fields):
+        """
+        Emit an ``error`` event describing an exception.
+
+        :param ex: the exception
+        :type ex: BaseException
+        :param fields: additional fields to include in the event
+        """
+        self.emit('error', error=_describe(ex), **fields)
+
+    def close(self):
+        if self._stream is not None and self._close_stream:
+            self._stream.close()
+        self._stream = None
+
+
+def _describe(ex):
+    """Return a short string description of an exception."""
+    return '%s: %s' % (ex.__class__.__name__, ex)
@@ -0,0 +1,160 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent per-(account, step, region) duration history, and the
+longest-processing-time-first (LPT) scheduling helpers that use it to order
+parallel :py:class:`~.runner.CustodianRunner` work.
+"""
+
+import os
+import json
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RunHistory(object):
+    """
+    Wall-clock durations of previous (step, region) units, per account,
+    persisted as JSON. The expected duration of a unit is the mean of its most
+    recent :py:attr:`~.max_samples` successful runs.
+    """
+
+    #: Version of the on-disk format
+    VERSION = 1
+
+    def __init__(self, path, max_samples=5):
+        """
+        :param path: path to the history file; it will be read if it exists,
+          and created by :py:meth:`~.save` if it does not
+        :type path: str
+        :param max_samples: number of most recent durations to keep per unit
+        :type max_samples: int
+        """
+        self.path = path
+        self.max_samples = max_samples
+        self._durations = {}
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as fh:
+                data = json.loads(fh.read())
+        except ValueError:
+            logger.warning(
+                'Ignoring unparseable run history file: %s', self.path
+            )
+            return
+        if data.get('version') != self.VERSION:
+            logger.warning(
+                'Ignoring run history file %s with unknown version %s',
+                self.path, data.get('version')
+            )
+            return
+        self._durations = data['durations']
+
+    def expected(self, account_name, step_name, region_name):
+        """
+        Return the expected duration of a (step, region) unit in seconds, or
+        None if there is no history for it.
+
+        :param account_name: name of the account
+        :type account_name: str
+        :param step_name: name of the step
+        :type step_name: str
+        :param region_name: name of the region
+        :type region_name: str
+        :return: expected duration in seconds, or None
+        :rtype: float
+        """
+        samples = self._durations.get(account_name, {}).get(
+            step_name, {}
+        ).get(region_name)
+        if not samples:
+            return None
+        return sum(samples) / len(samples)
+
+    def record(self, account_name, units):
+        """
+        Add the durations of successful units to the history.
+
+        :param account_name: name of the account the units ran in
+        :type account_name: str
+        :param units: units to record
+        :type units: list of :py:class:`~.run_metrics.UnitMetrics`
+        """
+        for u in units:
+            if not u.success:
+                continue
+            samples = self._durations.setdefault(
+                account_name, {}
+            ).setdefault(u.step_name, {}).setdefault(u.region_name, [])
+            samples.append(round(u.wall_time, 3))
+            del samples[:-self.max_samples]
+
+    def save(self):
+        """Write the history to :py:attr:`~.path`."""
+        logger.debug('Writing run history to: %s', self.path)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as fh:
+            fh.write(json.dumps(
+                {'version': self.VERSION, 'durations': self._durations},
+                sort_keys=True, indent=4
+            ))
+        os.rename(tmp, self.path)
+
+
+def lpt_order(items, estimates):
+    """
+    Order ``items`` longest-expected-first. Items with no estimate (None) are
+    assumed to be long and scheduled first; ties keep their original order.
+
+    :param items: items to order
+    :type items: list
+    :param estimates: expected duration of each item, in the same order as
+      ``items``; None if unknown
+    :type estimates: list
+    :return: ``items``, reordered
+    :rtype: list
+    """
+    order = sorted(
+        range(len(items)),
+        key=lambda i: (
+            estimates[i] is not None,
+            -(estimates[i] or 0)
+        )
+    )
+    return [items[i] for i in order]
+
+
+def predict_makespan(estimates, workers):
+    """
+    Predict the total wall time to run jobs of the given durations, in the
+    given order, on ``workers`` parallel workers, each job starting on the
+    first worker to become free.
+
+    :param estimates: expected duration of each job, in scheduling order
+    :type estimates: list
+    :param workers: number of parallel workers
+    :type workers: int
+    :return: predicted wall time until all jobs complete
+    :rtype: float
+    """
+    loads = [0.0] * max(1, min(workers, len(estimates)))
+    for est in estimates:
+        heapq.heapreplace(loads, loads[0] + est)
+    return max(loads)
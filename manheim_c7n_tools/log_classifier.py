@@ -0,0 +1,110 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Single-pass classification of Lambda log lines for ``errorscan``.
+"""
+
+import re
+
+
+class LogLineClassifier(object):
+    """
+    Classifies Lambda log messages as belonging to one of a set of failed
+    request IDs and/or as matching an "always match" regex, in one pass per
+    message. Cheap substring checks are done before any regex, so most
+    messages are classified without running one.
+    """
+
+    #: Leading request ID of a Lambda log message; group 2 is the request ID
+    REQ_ID_RE = re.compile(
+        r'(START|END|REPORT|\S+\s\S+)\s'
+        r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
+    )
+
+    #: Log messages to always ignore when matching an "always match" regex
+    NO_OWNER_EMAIL_LOOKUP_WARNING = re.compile(
+        r'.*?(ERROR|WARNING).*?unable to lookup owner email.*?'
+        r'Please configure LDAP or org_domain'
+    )
+
+    #: Substring of every message matching
+    #: :py:attr:`~.NO_OWNER_EMAIL_LOOKUP_WARNING`
+    NO_OWNER_EMAIL_TERM = 'unable to lookup owner email'
+
+    def __init__(self, request_ids, always_match_re=None, never_match_re=None,
+                 always_match_terms=None):
+        """
+        :param request_ids: request IDs to find the log messages of; lists
+          and tuples are converted to a ``set``, anything else (such as a
+          :py:class:`~.RequestIdIndex`) is used as-is
+        :type request_ids: set
+        :param always_match_re: Regex for logs to ALWAYS match
+        :type always_match_re: ``re``
+        :param never_match_re: Regex for logs to NEVER match, even if they
+          match ``always_match_re``.
+        :type never_match_re: ``re``
+        :param always_match_terms: substrings of which every message matching
+          ``always_match_re`` contains at least one; messages containing none
+          of them are not matched against ``always_match_re``
+        :type always_match_terms: list
+        """
+        if isinstance(request_ids, (list, tuple)):
+            request_ids = set(request_ids)
+        self._request_ids = request_ids
+        self._always_match_re = always_match_re
+        self._never_match_re = never_match_re
+        self._always_match_terms = (
+            None if always_match_terms is None else tuple(always_match_terms)
+        )
+
+    def classify(self, message):
+        """
+        Classify one log message.
+
+        :param message: log message
+        :type message: str
+        :return: (request ID, always match). The request ID is the message's
+          leading request ID if it is one of ``request_ids``, otherwise None.
+          Always match is whether the message matches ``always_match_re`` and
+          not ``never_match_re``. Messages matching
+          :py:attr:`~.NO_OWNER_EMAIL_LOOKUP_WARNING` when ``always_match_re``
+          is set give ``(None, False)``.
+        :rtype: tuple
+        """
+        always_re = self._always_match_re
+        if (
+            always_re is not None and
+            self.NO_OWNER_EMAIL_TERM in message and
+            self.NO_OWNER_EMAIL_LOOKUP_WARNING.match(message)
+        ):
+            return None, False
+        req_id = None
+        if self._request_ids:
+            m = self.REQ_ID_RE.match(message)
+            if m is not None and m.group(2) in self._request_ids:
+                req_id = m.group(2)
+        if always_re is None:
+            return req_id, False
+        terms = self._always_match_terms
+        if terms is not None and not any(t in message for t in terms):
+            return req_id, False
+        if always_re.match(message) is None:
+            return req_id, False
+        if (
+            self._never_match_re is not None and
+            self._never_match_re.match(message)
+        ):
+            return req_id, False
+        return req_id, True
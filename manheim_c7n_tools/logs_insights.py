@@ -0,0 +1,282 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Search many CloudWatch Logs groups at once with CloudWatch Logs Insights
+queries.
+"""
+
+import time
+import logging
+import calendar
+from datetime import datetime
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+
+class LogsInsightsScanner(object):
+    """
+    Finds the log events containing any of a list of terms in many log groups,
+    with as few CloudWatch Logs Insights queries as the service limits allow.
+    """
+
+    #: Maximum number of log groups one query may search
+    MAX_LOG_GROUPS = 50
+
+    #: Maximum length of a query string
+    MAX_QUERY_LENGTH = 10000
+
+    #: Maximum number of results one query may return
+    MAX_RESULTS = 10000
+
+    #: Maximum number of queries to run at once (the service allows 30
+    #: concurrent queries per account)
+    MAX_CONCURRENT = 10
+
+    #: Seconds to wait between polls for query results
+    POLL_INTERVAL = 2.0
+
+    #: Query statuses after which a query will not return results
+    FAILED_STATUSES = ['Failed', 'Cancelled', 'Timeout']
+
+    #: Query string prefix; results have the fields used by :py:meth:`~._event`
+    QUERY_PREFIX = 'fields @timestamp, @message, @logStream, @log | filter '
+
+    def __init__(self, client, poll_interval=None, sleep=time.sleep):
+        """
+        :param client: boto3 "logs" service client
+        :type client: boto3.client
+        :param poll_interval: seconds to wait between polls for query results;
+          defaults to :py:attr:`~.POLL_INTERVAL`
+        :type poll_interval: float
+        :param sleep: sleep function, for testing
+        """
+        self._client = client
+        if poll_interval is None:
+            poll_interval = self.POLL_INTERVAL
+        self._poll_interval = poll_interval
+        self._sleep = sleep
+
+    def find_log_groups(self, prefixes):
+        """
+        Return the names of all log groups starting with any of ``prefixes``.
+
+        :param prefixes: log group name prefixes
+        :type prefixes: list
+        :return: sorted list of log group names
+        :rtype: list
+        """
+        names = set()
+        paginator = self._client.get_paginator('describe_log_groups')
+        for prefix in prefixes:
+            for page in paginator.paginate(logGroupNamePrefix=prefix):
+                for group in page['logGroups']:
+                    names.add(group['logGroupName'])
+        logger.debug('Found %d log groups matching: %s', len(names), prefixes)
+        return sorted(names)
+
+    @classmethod
+    def query_strings(cls, terms):
+        """
+        Return Logs Insights query strings that together match every log
+        event containing any of ``terms``. Terms are combined with ``or``
+        into as few queries as fit in :py:attr:`~.MAX_QUERY_LENGTH`.
+
+        :param terms: terms, such as request IDs, to match
+        :type terms: list
+        :return: list of query strings; empty if ``terms`` is empty
+        :rtype: list
+        """
+        queries = []
+        current = ''
+        for term in sorted(set(terms)):
+            part = '@message like "%s"' % term.replace(
+                '\\', '\\\\').replace('"', '\\"')
+            if current and (
+                len(cls.QUERY_PREFIX) + len(current) + 4 + len(part) >
+                cls.MAX_QUERY_LENGTH
+            ):
+                queries.append(cls.QUERY_PREFIX + current)
+                current = ''
+            current = part if not current else current + ' or ' + part
+        if current:
+            queries.append(cls.QUERY_PREFIX + current)
+        return queries
+
+    def search(self, log_groups, terms, start_time, end_time):
+        """
+        Return the log events of ``log_groups`` between ``start_time`` and
+        ``end_time`` that contain any of ``terms``. Queries for up to
+        :py:attr:`~.MAX_LOG_GROUPS` groups each are run, up to
+        :py:attr:`~.MAX_CONCURRENT` at a time, and polled until complete. A
+        query that returns :py:attr:`~.MAX_RESULTS` results may have been
+        truncated, so it is run again in two parts; see :py:meth:`~._split`.
+
+        :param log_groups: names of the log groups to search
+        :type log_groups: list
+        :param terms: terms, such as request IDs, to search for
+        :type terms: list
+        :param start_time: start of the time range, as integer epoch seconds
+        :type start_time: int
+        :param end_time: end of the time range, as integer epoch seconds
+        :type end_time: int
+        :return: dict of log group name to list of log event dicts (with the
+          same keys as those from ``FilterLogEvents``, plus ``logGroupName``),
+          sorted by timestamp
+        :rtype: dict
+        """
+        log_groups = sorted(log_groups)
+        pending = []
+        for i in range(0, len(log_groups), self.MAX_LOG_GROUPS):
+            for query in self.query_strings(terms):
+                pending.append((
+                    log_groups[i:i + self.MAX_LOG_GROUPS], query,
+                    start_time, end_time
+                ))
+        logger.info(
+            'Searching %d log groups for %d terms with %d Logs Insights '
+            'queries', len(log_groups), len(set(terms)), len(pending)
+        )
+        running = {}
+        events = {}
+        while pending or running:
+            while pending and len(running) < self.MAX_CONCURRENT:
+                query_id = self._start_query(*pending[0])
+                if query_id is None:
+                    break
+                running[query_id] = pending.pop(0)
+            self._sleep(self._poll_interval)
+            for query_id in sorted(running.keys()):
+                results = self._get_results(query_id)
+                if results is None:
+                    continue
+                spec = running.pop(query_id)
+                if len(results) >= self.MAX_RESULTS:
+                    pending.extend(self._split(query_id, *spec))
+                    continue
+                for fields in results:
+                    e = self._event(fields)
+                    # an event may match more than one query
+                    events[e['eventId']] = e
+        res = {}
+        for e in sorted(events.values(), key=itemgetter('timestamp')):
+            res.setdefault(e['logGroupName'], []).append(e)
+        logger.debug(
+            'Found %d log events in %d log groups', len(events), len(res)
+        )
+        return res
+
+    def _start_query(self, log_groups, query, start_time, end_time):
+        """
+        Start a Logs Insights query and return its ID, or None if too many
+        queries are already running in the account.
+        """
+        try:
+            return self._client.start_query(
+                logGroupNames=log_groups, startTime=start_time,
+                endTime=end_time, queryString=query, limit=self.MAX_RESULTS
+            )['queryId']
+        except Exception as ex:
+            if hasattr(ex, 'response'):
+                code = ex.response.get('Error', {}).get('Code', 'unknown')
+                if code == 'LimitExceededException':
+                    logger.debug(
+                        'Too many concurrent Logs Insights queries; waiting'
+                    )
+                    return None
+            raise
+
+    def _get_results(self, query_id):
+        """
+        Return the results of a Logs Insights query, or None if it has not
+        completed yet. Raise RuntimeError if it failed.
+        """
+        resp = self._client.get_query_results(queryId=query_id)
+        if resp['status'] in self.FAILED_STATUSES:
+            raise RuntimeError(
+                'Logs Insights query %s status: %s' % (
+                    query_id, resp['status']
+                )
+            )
+        if resp['status'] != 'Complete':
+            return None
+        logger.debug(
+            'Logs Insights query %s returned %d results (%s)', query_id,
+            len(resp['results']), resp.get('statistics', {})
+        )
+        return resp['results']
+
+    def _split(self, query_id, log_groups, query, start_time, end_time):
+        """
+        Return the two queries to run instead of one that returned
+        :py:attr:`~.MAX_RESULTS` results: each over half of its time range or,
+        if that is a single second, over half of its log groups. Raise
+        RuntimeError if it can be split no further.
+
+        :return: list of (log groups, query string, start time, end time)
+        :rtype: list
+        """
+        if end_time > start_time:
+            mid = (start_time + end_time) // 2
+            logger.info(
+                'Logs Insights query %s returned the maximum of %d results; '
+                'splitting time range %d-%d', query_id, self.MAX_RESULTS,
+                start_time, end_time
+            )
+            return [
+                (log_groups, query, start_time, mid),
+                (log_groups, query, mid + 1, end_time)
+            ]
+        if len(log_groups) > 1:
+            half = len(log_groups) // 2
+            logger.info(
+                'Logs Insights query %s returned the maximum of %d results; '
+                'splitting %d log groups', query_id, self.MAX_RESULTS,
+                len(log_groups)
+            )
+            return [
+                (log_groups[:half], query, start_time, end_time),
+                (log_groups[half:], query, start_time, end_time)
+            ]
+        raise RuntimeError(
+            'Logs Insights query %s returned the maximum of %d results for '
+            '%s within one second; unable to split it further' % (
+                query_id, self.MAX_RESULTS, log_groups[0]
+            )
+        )
+
+    @staticmethod
+    def _event(fields):
+        """
+        Convert one Logs Insights result row to a log event dict.
+
+        :param fields: list of ``field`` / ``value`` dicts
+        :type fields: list
+        :return: log event dict
+        :rtype: dict
+        """
+        f = {x['field']: x['value'] for x in fields}
+        ts = datetime.strptime(f['@timestamp'], '%Y-%m-%d %H:%M:%S.%f')
+        return {
+            'eventId': f['@ptr'],
+            'timestamp': (
+                calendar.timegm(ts.timetuple()) * 1000 +
+                ts.microsecond // 1000
+            ),
+            'message': f['@message'],
+            'logStreamName': f.get('@logStream'),
+            # @log is "account_id:log_group_name"
+            'logGroupName': f['@log'].split(':', 1)[-1]
+        }
@@ -0,0 +1,282 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run manifest recording the inputs of every (step, region) unit deployed by
+the last successful :py:class:`~.runner.CustodianRunner` run, used to detect
+units that would be no-ops.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+import yaml
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.utils import aws_client, policy_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def inputs_digest(inputs):
+    """
+    Return a stable SHA256 hex digest of a JSON-serializable object, such as
+    the return value of :py:meth:`~.runner.BaseStep.manifest_inputs`.
+
+    :param inputs: object to digest
+    :return: hex digest
+    :rtype: str
+    """
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+def files_hash(paths):
+    """
+    Return a SHA256 hex digest of the names and contents of all files in
+    ``paths`` (recursively, for directories). Paths that do not exist are
+    ignored.
+
+    :param paths: list of file and/or directory paths
+    :type paths: list
+    :return: hex digest
+    :rtype: str
+    """
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append((path, path))
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for fname in filenames:
+                full = os.path.join(dirpath, fname)
+                files.append(
+                    (os.path.join(path, os.path.relpath(full, path)), full)
+                )
+    h = hashlib.sha256()
+    for name, full in sorted(files):
+        h.update(('%s\n' % name).encode('utf-8'))
+        with open(full, 'rb') as fh:
+            h.update(hashlib.sha256(fh.read()).digest())
+    return h.hexdigest()
+
+
+def load_region_policies(region_name):
+    """
+    Return the list of policies in the generated ``custodian_REGION.yml`` for
+    a region, or None if that file does not exist.
+
+    :param region_name: region name
+    :type region_name: str
+    :return: list of policies, or None
+    :rtype: list
+    """
+    fname = 'custodian_%s.yml' % region_name
+    if not os.path.exists(fname):
+        return None
+    with open(fname, 'r') as fh:
+        return yaml.load(
+            fh.read(), Loader=yaml.SafeLoader
+        ).get('policies', [])
+
+
+def region_policy_fingerprints(region_name):
+    """
+    Return a dict of policy name to :py:func:`~.utils.policy_fingerprint` for
+    every policy in the generated ``custodian_REGION.yml`` for a region, or
+    None if that file does not exist.
+
+    :param region_name: region name
+    :type region_name: str
+    :return: dict of policy name to fingerprint, or None
+    :rtype: dict
+    """
+    policies = load_region_policies(region_name)
+    if policies is None:
+        return None
+    return {p['name']: policy_fingerprint(p) for p in policies}
+
+
+class RunManifest(object):
+    """
+    The manifest of a run, stored as JSON either in a local file or, if the
+    location starts with ``s3://``, in S3. It holds, per step and region, the
+    :py:func:`~.inputs_digest` and the inputs themselves (for example the
+    policy fingerprints, mailer config hash or docs hash) of each unit as last
+    successfully deployed. A manifest is for one account; loading or saving
+    one for a different account raises :py:exc:`RuntimeError`.
+    """
+
+    #: Version of the manifest format
+    VERSION = 1
+
+    def __init__(self, location, region_name='us-east-1', account_id=None):
+        """
+        :param location: local path, or ``s3://BUCKET/KEY`` URL
+        :type location: str
+        :param region_name: region to use for the S3 client, if stored in S3
+        :type region_name: str
+        :param account_id: ID of the account being run against; if not None,
+          the stored manifest must be for this account
+        :type account_id: str
+        :raises: RuntimeError
+        """
+        self.location = location
+        self._region_name = region_name
+        self._account_id = None if account_id is None else str(account_id)
+        self._units = {}
+        self._pending = {}
+        self._load()
+
+    def _s3_location(self):
+        bucket, _, key = self.location[len('s3://'):].partition('/')
+        return bucket, key
+
+    def _read(self):
+        """Return the stored manifest as a string, or None if not present."""
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_location()
+            s3 = aws_client('s3', self._region_name)
+            try:
+                resp = s3.get_object(Bucket=bucket, Key=key)
+            except ClientError as ex:
+                if ex.response['Error']['Code'] in ['NoSuchKey', '404']:
+                    return None
+                raise
+            return resp['Body'].read().decode('utf-8')
+        if not os.path.exists(self.location):
+            return None
+        with open(self.location, 'r') as fh:
+            return fh.read()
+
+    def _load(self):
+        content = self._read()
+        if content is None:
+            logger.info(
+                'No run manifest found at %s; all units will run',
+                self.location
+            )
+            return
+        data = json.loads(content)
+        if data.get('version') != self.VERSION:
+            logger.warning(
+                'Ignoring run manifest %s with unknown version %s',
+                self.location, data.get('version')
+            )
+            return
+        self._check_account(data.get('account_id'), self._account_id)
+        self._units = data['units']
+
+    def _check_account(self, manifest_account_id, run_account_id):
+        """
+        Raise RuntimeError if the account a manifest is for is not the account
+        being run against. Nothing is checked if either is None.
+        """
+        if (
+            manifest_account_id is None or run_account_id is None or
+            manifest_account_id == run_account_id
+        ):
+            return
+        raise RuntimeError(
+            'ERROR: Run manifest %s is for account %s, not %s; use a '
+            'separate manifest for each account' % (
+                self.location, manifest_account_id, run_account_id
+            )
+        )
+
+    def digest(self, step_name, region_name):
+        """
+        Return the inputs digest of a unit as of the last successful run, or
+        None if it is not in the manifest.
+
+        :param step_name: step name
+        :type step_name: str
+        :param region_name: region name
+        :type region_name: str
+        :rtype: str
+        """
+        return self._units.get(step_name, {}).get(
+            region_name, {}
+        ).get('digest')
+
+    def is_noop(self, step_name, region_name, inputs):
+        """
+        Return whether running a unit with the given inputs would be a no-op,
+        i.e. whether the inputs are known and the same as last deployed.
+
+        :param step_name: step name
+        :type step_name: str
+        :param region_name: region name
+        :type region_name: str
+        :param inputs: the unit's current
+          :py:meth:`~.runner.BaseStep.manifest_inputs`
+        :rtype: bool
+        """
+        if inputs is None:
+            return False
+        return self.digest(step_name, region_name) == inputs_digest(inputs)
+
+    def record(self, step_name, region_name, inputs):
+        """
+        Record the inputs of a unit that was deployed (or found to be a no-op)
+        in this run. Recorded units are only stored by :py:meth:`~.save`.
+
+        :param step_name: step name
+        :type step_name: str
+        :param region_name: region name
+        :type region_name: str
+        :param inputs: the unit's :py:meth:`~.runner.BaseStep.manifest_inputs`
+        """
+        if inputs is None:
+            return
+        self._pending[(step_name, region_name)] = {
+            'digest': inputs_digest(inputs), 'inputs': inputs
+        }
+
+    def save(self, account_name, account_id):
+        """
+        Merge the units recorded in this run into the manifest and store it.
+
+        :param account_name: name of the account the run was for
+        :type account_name: str
+        :param account_id: ID of the account the run was for
+        :type account_id: str
+        :raises: RuntimeError
+        """
+        self._check_account(self._account_id, str(account_id))
+        for (step_name, region_name), unit in self._pending.items():
+            self._units.setdefault(step_name, {})[region_name] = unit
+        self._pending = {}
+        content = json.dumps({
+            'version': self.VERSION,
+            'account_name': account_name,
+            'account_id': str(account_id),
+            'generated': datetime.utcnow().isoformat() + 'Z',
+            'units': self._units
+        }, sort_keys=True, indent=4)
+        logger.info('Writing run manifest to: %s', self.location)
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_location()
+            aws_client('s3', self._region_name).put_object(
+                Bucket=bucket, Key=key, Body=content.encode('utf-8'),
+                ContentType='application/json'
+            )
+            return
+        with open(self.location, 'w') as fh:
+            fh.write(content)
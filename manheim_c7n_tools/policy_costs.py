@@ -0,0 +1,182 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-policy cost report for :py:class:`~.runner.CustodianStep`: wall time, AWS
+API calls by operation, and resources fetched and matched by each policy.
+
+Wall time, API calls and matched resources come from the ``metadata.json``
+that c7n writes to each policy's output directory (c7n counts API calls with
+a botocore ``after-call`` event hook). The number of resources fetched before
+filtering is not recorded by c7n, so it is captured by wrapping
+:py:meth:`c7n.query.QueryResourceManager.check_resource_limit` (see
+:py:func:`~.install`).
+"""
+
+import os
+import json
+import logging
+import threading
+
+from c7n.query import QueryResourceManager
+
+logger = logging.getLogger(__name__)
+
+#: Name of the per-region report file, written to the c7n output directory
+REPORT_FILENAME = 'policy_costs.json'
+
+_fetched_lock = threading.Lock()
+_fetched = {}
+
+_c7n_check_resource_limit = QueryResourceManager.check_resource_limit
+
+
+def _check_resource_limit(self, selection_count, population_count):
+    key = (self.config.region, self.ctx.policy.name)
+    with _fetched_lock:
+        _fetched[key] = _fetched.get(key, 0) + population_count
+    return _c7n_check_resource_limit(self, selection_count, population_count)
+
+
+def install():
+    """
+    Have c7n record the number of resources each policy fetches (before
+    filtering). This is process-wide and idempotent.
+    """
+    if QueryResourceManager.check_resource_limit is not _check_resource_limit:
+        logger.debug('Installing c7n fetched resource counter')
+        QueryResourceManager.check_resource_limit = _check_resource_limit
+
+
+def pop_fetched(region_name, policy_name):
+    """
+    Return and reset the number of resources fetched by a policy in a region
+    since the last call, or None if it did not fetch any resources.
+
+    :param region_name: region name
+    :type region_name: str
+    :param policy_name: policy name
+    :type policy_name: str
+    :rtype: int
+    """
+    with _fetched_lock:
+        return _fetched.pop((region_name, policy_name), None)
+
+
+def pop_all_fetched():
+    """
+    Return and reset the number of resources fetched by every policy since
+    the last call, e.g. to pass them from a worker process to
+    :py:func:`~.add_fetched` in the parent process.
+
+    :return: dict of (region name, policy name) to resources fetched
+    :rtype: dict
+    """
+    with _fetched_lock:
+        res = dict(_fetched)
+        _fetched.clear()
+    return res
+
+
+def add_fetched(fetched):
+    """
+    Add resources fetched elsewhere, as returned by :py:func:`~.pop_all_fetched`
+    in another process, to the counts :py:func:`~.pop_fetched` returns.
+
+    :param fetched: dict of (region name, policy name) to resources fetched
+    :type fetched: dict
+    """
+    with _fetched_lock:
+        for key, count in fetched.items():
+            _fetched[key] = _fetched.get(key, 0) + count
+
+
+def _metric(metadata, name):
+    for m in metadata.get('metrics', []):
+        if m.get('MetricName') == name:
+            return m['Value']
+    return None
+
+
+def policy_costs(output_dir, region_name, policy_names, since):
+    """
+    Collect the costs of the policies that ran in a region.
+
+    :param output_dir: c7n output directory the policies ran with
+    :type output_dir: str
+    :param region_name: region name
+    :type region_name: str
+    :param policy_names: names of the policies that were run
+    :type policy_names: list
+    :param since: only include policies whose execution started at or after
+      this time (seconds since the epoch), ignoring output of previous runs
+    :type since: float
+    :return: list of per-policy dicts, most expensive (by wall time) first
+    :rtype: list
+    """
+    costs = []
+    for name in policy_names:
+        fetched = pop_fetched(region_name, name)
+        path = os.path.join(output_dir, name, 'metadata.json')
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as fh:
+            md = json.loads(fh.read())
+        if md['execution']['start'] < since:
+            continue
+        api_calls = md.get('api-stats', {})
+        costs.append({
+            'policy': name,
+            'resource_type': md['policy'].get('resource'),
+            'wall_time': round(md['execution']['duration'], 3),
+            'api_calls': sum(api_calls.values()),
+            'api_calls_by_operation': api_calls,
+            'resources_fetched': fetched,
+            'resources_matched': _metric(md, 'ResourceCount')
+        })
+    return sorted(costs, key=lambda x: (-x['wall_time'], x['policy']))
+
+
+def write_report(output_dir, region_name, costs, top=10):
+    """
+    Write ``costs`` (as returned by :py:func:`~.policy_costs`) to
+    :py:const:`~.REPORT_FILENAME` in ``output_dir``, and log the ``top`` most
+    expensive policies.
+
+    :param output_dir: directory to write the report to
+    :type output_dir: str
+    :param region_name: region name
+    :type region_name: str
+    :param costs: per-policy costs
+    :type costs: list
+    :param top: number of policies to log
+    :type top: int
+    """
+    if not costs:
+        return
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    path = os.path.join(output_dir, REPORT_FILENAME)
+    with open(path, 'w') as fh:
+        fh.write(json.dumps(costs, sort_keys=True, indent=4))
+    lines = [
+        '%s: %.1fs, %d API calls, %s fetched, %s matched' % (
+            x['policy'], x['wall_time'], x['api_calls'],
+            x['resources_fetched'], x['resources_matched']
+        ) for x in costs[:top]
+    ]
+    logger.info(
+        'Most expensive of %d policies in %s (full report in %s):\n%s',
+        len(costs), region_name, path, "\n".join(lines)
+    )
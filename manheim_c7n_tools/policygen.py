@@ -32,7 +32,9 @@ except ImportError:
 
 from manheim_c7n_tools.version import VERSION, PROJECT_URL
 from manheim_c7n_tools.config import ManheimConfig
-from manheim_c7n_tools.utils import git_html_url
+from manheim_c7n_tools.utils import (
+    git_html_url, policy_fingerprint, policy_resource_type, FINGERPRINT_TAG
+)
 
 whtspc_re = re.compile(r'\s+')
 
@@ -268,18 +270,16 @@ class PolicyGen(object):
     def _write_custodian_configs(self, result, region_name):
         """
         Write the per-region ``custodian_REGION.yml`` config file to disk. This
-        also handles ``%%`` macro and environment variable substitution.
+        also handles ``%%`` macro and environment variable substitution, and
+        stamps each Lambda-mode policy with its fingerprint (see
+        :py:meth:`~._stamp_fingerprint`). Policies are written ordered by
+        resource type.
 
         :param result: final custodian configuration
         :type result: dict
         :param region_name: the name of the region the configs are for
         :type region_name: str
         """
-        enabled_policies = list(filter(is_enabled, result['policies']))
-        config_str = yaml.dump({"policies": enabled_policies})
-        fname = 'custodian_%s.yml' % region_name
-        logger.info('Writing %s policies to %s...' % (region_name, fname))
-        conf = config_str
         replacements = [
             ['%%BUCKET_NAME%%', self._config.output_s3_bucket_name],
             ['%%LOG_GROUP%%', self._config.custodian_log_group],
@@ -293,10 +293,47 @@ class PolicyGen(object):
         for k, v in os.environ.items():
             if k.startswith('POLICYGEN_ENV_'):
                 replacements.append(['%%' + k + '%%', v])
+        # group policies by resource type, so consecutive policies can use
+        # the resources cached by the previous one
+        enabled_policies = [
+            self._stamp_fingerprint(p, replacements)
+            for p in sorted(
+                filter(is_enabled, result['policies']),
+                key=policy_resource_type
+            )
+        ]
+        config_str = yaml.dump({"policies": enabled_policies})
+        fname = 'custodian_%s.yml' % region_name
+        logger.info('Writing %s policies to %s...' % (region_name, fname))
+        conf = config_str
         for macro, val in replacements:
             conf = conf.replace(macro, val)
         self._write_file(fname, conf)
 
+    def _stamp_fingerprint(self, policy, replacements):
+        """
+        If ``policy`` runs in Lambda (i.e. has a ``mode`` other than ``pull``),
+        return a copy of it with its :py:func:`~.utils.policy_fingerprint` (as
+        it will be deployed, after macro substitution) set as the
+        :py:const:`~.utils.FINGERPRINT_TAG` tag in ``mode.tags``. Otherwise
+        return ``policy`` unchanged. :py:class:`~.runner.CustodianStep` uses
+        this tag to skip re-provisioning unchanged functions.
+
+        :param policy: the policy to stamp
+        :type policy: dict
+        :param replacements: list of ``[macro, value]`` pairs that will be
+          substituted in the generated config
+        :type replacements: list
+        :return: the stamped policy
+        :rtype: dict
+        """
+        if policy.get('mode', {}).get('type', 'pull') == 'pull':
+            return policy
+        policy = deepcopy(policy)
+        fingerprint = policy_fingerprint(policy, replacements)
+        policy['mode'].setdefault('tags', {})[FINGERPRINT_TAG] = fingerprint
+        return policy
+
     def _check_policies(self, policies):
         """
         Check all of our policies to ensure that they conform with some rules
@@ -0,0 +1,185 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Optional profiling of :py:class:`~.runner.BaseStep` ``run`` / ``dryrun``
+calls, enabled via the ``--profile-step`` option of ``manheim-c7n-runner``.
+
+Each profiled (step, region) unit is measured by exactly one profiler, either
+:py:mod:`cProfile` or :py:class:`~.StackSampler`, never both: each adds
+overhead to the thread running the step, which would skew the other's timings.
+"""
+
+import os
+import sys
+import logging
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler(object):
+    """
+    Minimal wall-clock sampling profiler. A background thread periodically
+    captures the stack of one target thread; the result is written in the
+    "collapsed stack" format understood by ``flamegraph.pl`` and speedscope.
+
+    The target thread is not instrumented, but each sample holds the GIL
+    while walking its stack, pausing the target for a few microseconds per
+    frame; at the default 5ms interval this is typically well under 1% of
+    wall time. Because samples are wall-clock, time spent waiting on I/O
+    (i.e. AWS API calls) is counted like time spent computing.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        """
+        :param thread_id: ident of the thread to sample
+        :type thread_id: int
+        :param interval: seconds between samples
+        :type interval: float
+        """
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='StackSampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.sample()
+
+    def sample(self):
+        """Capture one sample of the target thread's stack."""
+        frame = sys._current_frames().get(self._thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append('%s (%s:%d)' % (
+                code.co_name, code.co_filename, code.co_firstlineno
+            ))
+            frame = frame.f_back
+        if stack:
+            self._stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """
+        Return the samples collected so far in collapsed-stack format.
+
+        :return: one ``frame;frame;frame count`` line per distinct stack
+        :rtype: str
+        """
+        return ''.join(
+            '%s %d\n' % (stack, count)
+            for stack, count in sorted(self._stacks.items())
+        )
+
+
+class StepProfiler(object):
+    """
+    Wraps (step, region) units of a runner invocation in a profiler, writing
+    one file per unit: by default a ``.pstats`` file from :py:mod:`cProfile`,
+    or, if ``collapsed`` is True, a ``.collapsed`` flamegraph input file from
+    :py:class:`~.StackSampler` instead.
+
+    cProfile is deterministic: it records every Python function call, which
+    commonly makes call-heavy pure-Python code run 1.5 to 2 times as slowly
+    or more, and inflates the times of small, frequently-called functions
+    relative to I/O. The sampler's overhead is much lower (see
+    :py:class:`~.StackSampler`), but it only shows where wall time is spent,
+    not call counts.
+    """
+
+    def __init__(self, step_names, output_dir='profiles', collapsed=False):
+        """
+        :param step_names: names of the steps to profile; may include ``all``
+          to profile every step
+        :type step_names: list
+        :param output_dir: directory to write profile data to
+        :type output_dir: str
+        :param collapsed: whether to sample stacks and write collapsed-stack
+          files instead of using cProfile
+        :type collapsed: bool
+        """
+        self.step_names = step_names
+        self.output_dir = output_dir
+        self.collapsed = collapsed
+
+    def enabled_for(self, step_name):
+        """
+        Return whether the given step should be profiled.
+
+        :param step_name: name of the step
+        :type step_name: str
+        :rtype: bool
+        """
+        return 'all' in self.step_names or step_name in self.step_names
+
+    def _path(self, step_name, region_name, ext):
+        return os.path.join(
+            self.output_dir, '%s_%s.%s' % (step_name, region_name, ext)
+        )
+
+    @contextmanager
+    def profile(self, step_name, region_name):
+        """
+        Context manager to profile the enclosed block, with either cProfile
+        or the stack sampler, if profiling is enabled for ``step_name``;
+        otherwise it does nothing.
+
+        :param step_name: name of the step
+        :type step_name: str
+        :param region_name: name of the region
+        :type region_name: str
+        """
+        if not self.enabled_for(step_name):
+            yield
+            return
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        if self.collapsed:
+            sampler = StackSampler(threading.current_thread().ident)
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                path = self._path(step_name, region_name, 'collapsed')
+                with open(path, 'w') as fh:
+                    fh.write(sampler.collapsed())
+                logger.info('Wrote collapsed stacks for %s in %s to: %s',
+                            step_name, region_name, path)
+            return
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            path = self._path(step_name, region_name, 'pstats')
+            prof.dump_stats(path)
+            logger.info('Wrote profile for %s in %s to: %s',
+                        step_name, region_name, path)
@@ -0,0 +1,119 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hit and miss counting for the c7n resource cache used by
+:py:class:`~.runner.CustodianStep`.
+"""
+
+import logging
+import threading
+
+from c7n import cache
+from c7n.cache import FileCacheManager
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats(object):
+    """
+    Thread-safe hit and miss counts per cache file path. A hit is a resource
+    list served from the cache; a miss is a resource list that had to be
+    fetched from AWS (and was then saved to the cache).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _incr(self, path, idx):
+        with self._lock:
+            self._counts.setdefault(path, [0, 0])[idx] += 1
+
+    def hit(self, path):
+        self._incr(path, 0)
+
+    def miss(self, path):
+        self._incr(path, 1)
+
+    def add(self, path, hits, misses):
+        """
+        Add hits and misses counted elsewhere, such as in another process.
+
+        :param path: cache file path
+        :type path: str
+        :param hits: number of hits
+        :type hits: int
+        :param misses: number of misses
+        :type misses: int
+        """
+        with self._lock:
+            counts = self._counts.setdefault(path, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+
+    def counts(self, paths):
+        """
+        Return the total hits and misses for the given cache file paths.
+
+        :param paths: cache file paths
+        :type paths: list
+        :return: (hits, misses)
+        :rtype: tuple
+        """
+        with self._lock:
+            hits = sum(self._counts.get(p, [0, 0])[0] for p in paths)
+            misses = sum(self._counts.get(p, [0, 0])[1] for p in paths)
+        return hits, misses
+
+
+#: The :py:class:`~.CacheStats` for all c7n file caches in this process
+cache_stats = CacheStats()
+
+
+class CountingFileCache(FileCacheManager):
+    """
+    :py:class:`c7n.cache.FileCacheManager` that records hits and misses in
+    :py:data:`~.cache_stats`, keyed by its (absolute) cache path.
+    """
+
+    def get(self, key):
+        res = super(CountingFileCache, self).get(key)
+        if res is not None:
+            cache_stats.hit(self.cache_path)
+        return res
+
+    def save(self, key, data):
+        cache_stats.miss(self.cache_path)
+        super(CountingFileCache, self).save(key, data)
+
+
+_c7n_factory = cache.factory
+
+
+def _counting_factory(config):
+    res = _c7n_factory(config)
+    if isinstance(res, FileCacheManager):
+        return CountingFileCache(config)
+    return res
+
+
+def install():
+    """
+    Have c7n resource managers use :py:class:`~.CountingFileCache` for their
+    file caches. This is process-wide and idempotent.
+    """
+    if cache.factory is not _counting_factory:
+        logger.debug('Installing counting c7n resource cache factory')
+        cache.factory = _counting_factory
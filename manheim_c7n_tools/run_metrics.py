@@ -0,0 +1,269 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Timing and resource usage metrics for :py:class:`~.runner.CustodianRunner`
+runs, recorded per (step, region) unit of work.
+
+CPU time and peak RSS are those of the process that ran the unit, so they
+include any other threads of that process, such as the concurrent policy
+groups of the ``custodian`` step.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError:  # nocoverage
+    resource = None  # nocoverage
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_bytes():
+    """
+    Return the peak resident set size of the current process so far, in bytes,
+    or 0 if this cannot be determined on the current platform.
+
+    :return: peak RSS of this process, in bytes
+    :rtype: int
+    """
+    if resource is None:
+        return 0  # nocoverage
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # macOS reports bytes; Linux reports KiB
+        return maxrss  # nocoverage
+    return maxrss * 1024
+
+
+class UnitMetrics(object):
+    """Metrics for one (step, region) unit of a run."""
+
+    def __init__(self, step_name, region_name, wall_time, cpu_time,
+                 peak_rss, success=True):
+        """
+        :param step_name: name of the step
+        :type step_name: str
+        :param region_name: name of the region
+        :type region_name: str
+        :param wall_time: wall clock time taken, in seconds
+        :type wall_time: float
+        :param cpu_time: CPU time (user + system) used by the process that
+          ran the unit while it ran, in seconds
+        :type cpu_time: float
+        :param peak_rss: peak RSS of the process that ran the unit, at the end
+          of the unit, in bytes
+        :type peak_rss: int
+        :param success: whether the unit completed without an exception
+        :type success: bool
+        """
+        self.step_name = step_name
+        self.region_name = region_name
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+        self.success = success
+
+    def as_dict(self):
+        return {
+            'step': self.step_name,
+            'region': self.region_name,
+            'wall_seconds': round(self.wall_time, 6),
+            'process_cpu_seconds': round(self.cpu_time, 6),
+            'process_peak_rss_bytes': self.peak_rss,
+            'success': self.success
+        }
+
+
+class RunMetrics(object):
+    """
+    Collects :py:class:`~.UnitMetrics` for every (step, region) unit that
+    :py:class:`~.runner.CustodianRunner` executes, and reports on them as a
+    summary table, a JSON document, or a Prometheus textfile-collector file.
+    """
+
+    #: Prefix for all Prometheus metric names
+    PROM_PREFIX = 'manheim_c7n_runner'
+
+    def __init__(self, account_name, action):
+        """
+        :param account_name: name of the account being run against
+        :type account_name: str
+        :param action: the runner action, "run" or "dryrun"
+        :type action: str
+        """
+        self.account_name = account_name
+        self.action = action
+        self.units = []
+        self._start = time.time()
+
+    @contextmanager
+    def measure(self, step_name, region_name):
+        """
+        Context manager to time one (step, region) unit and record the result,
+        whether or not it raises an exception.
+
+        :param step_name: name of the step
+        :type step_name: str
+        :param region_name: name of the region
+        :type region_name: str
+        """
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.units.append(UnitMetrics(
+                step_name, region_name,
+                time.perf_counter() - wall_start,
+                time.process_time() - cpu_start,
+                peak_rss_bytes(),
+                success=success
+            ))
+
+    @property
+    def total_wall_time(self):
+        """Sum of the wall time of all recorded units, in seconds."""
+        return sum(u.wall_time for u in self.units)
+
+    def summary_table(self):
+        """
+        Return a human-readable table of all recorded units, slowest first.
+
+        :return: summary table
+        :rtype: str
+        """
+        rows = []
+        for u in sorted(self.units, key=lambda x: x.wall_time, reverse=True):
+            rows.append([
+                u.step_name, u.region_name, '%.2f' % u.wall_time,
+                '%.2f' % u.cpu_time, '%.1f' % (u.peak_rss / 1048576.0),
+                'OK' if u.success else 'FAILED'
+            ])
+        return tabulate(
+            rows,
+            headers=[
+                'Step', 'Region', 'Wall (s)', 'Process CPU (s)',
+                'Process Peak RSS (MiB)', 'Status'
+            ],
+            disable_numparse=True
+        )
+
+    def as_dict(self):
+        return {
+            'account_name': self.account_name,
+            'action': self.action,
+            'start_time': self._start,
+            'total_wall_seconds': round(self.total_wall_time, 6),
+            'units': [u.as_dict() for u in self.units]
+        }
+
+    def write_json(self, path):
+        """
+        Write all recorded metrics to ``path`` as JSON.
+
+        :param path: path to write to
+        :type path: str
+        """
+        logger.info('Writing run metrics JSON to: %s', path)
+        _write_atomic(
+            path, json.dumps(self.as_dict(), sort_keys=True, indent=4)
+        )
+
+    def prometheus_text(self):
+        """
+        Return all recorded metrics in the Prometheus text exposition format.
+
+        :return: Prometheus metrics text
+        :rtype: str
+        """
+        metrics = [
+            ('unit_wall_seconds', 'Wall clock time per step and region',
+             'wall_time'),
+            ('unit_process_cpu_seconds',
+             'CPU time of the process running each step and region',
+             'cpu_time'),
+            ('unit_process_peak_rss_bytes',
+             'Peak RSS of the process running each step and region, at its '
+             'end', 'peak_rss'),
+            ('unit_success', '1 if the step succeeded in the region, else 0',
+             'success')
+        ]
+        lines = []
+        for suffix, desc, attr in metrics:
+            name = '%s_%s' % (self.PROM_PREFIX, suffix)
+            lines.append('# HELP %s %s' % (name, desc))
+            lines.append('# TYPE %s gauge' % name)
+            for u in self.units:
+                lines.append('%s{%s} %s' % (
+                    name, self._labels(step=u.step_name, region=u.region_name),
+                    float(getattr(u, attr))
+                ))
+        name = '%s_wall_seconds' % self.PROM_PREFIX
+        lines.append('# HELP %s Total wall clock time of all units' % name)
+        lines.append('# TYPE %s gauge' % name)
+        lines.append('%s{%s} %s' % (
+            name, self._labels(), float(self.total_wall_time)
+        ))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write all recorded metrics to ``path`` for the Prometheus node_exporter
+        textfile collector.
+
+        :param path: path to write to; should end in ``.prom``
+        :type path: str
+        """
+        logger.info('Writing run metrics for Prometheus to: %s', path)
+        _write_atomic(path, self.prometheus_text())
+
+    def _labels(self, **kwargs):
+        labels = {'account': self.account_name, 'action': self.action}
+        labels.update(kwargs)
+        return ','.join(
+            '%s="%s"' % (k, _escape_label(labels[k]))
+            for k in sorted(labels.keys())
+        )
+
+
+def _escape_label(value):
+    """
+    Escape a Prometheus label value: backslash, double quote and newline must
+    be written as ``\\\\``, ``\\"`` and ``\\n``.
+    """
+    return str(value).replace('\\', '\\\\').replace(
+        '"', '\\"'
+    ).replace('\n', '\\n')
+
+
+def _write_atomic(path, content):
+    """
+    Write ``content`` to a temporary file next to ``path`` and then rename it
+    into place, so that scrapers never see a partially-written file.
+    """
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as fh:
+        fh.write(content)
+    os.rename(tmp, path)
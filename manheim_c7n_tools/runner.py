@@ -24,29 +24,38 @@ command line.
 """
 
 import sys
+import time
 import logging
 import argparse
+import traceback
+import multiprocessing
 import abc
 import functools
+import tempfile
 from shutil import rmtree
 import os
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 import re
 
 from sphinx.cmd.build import main as sphinx_main
 import jsonschema
-import boto3
+import yaml
+from tabulate import tabulate
+from botocore.exceptions import ClientError
 
-from c7n.commands import validate, run
+from c7n.commands import run
 from c7n.config import Config
 from c7n.policy import PolicyCollection
+from c7n.version import version as c7n_version
 from c7n_mailer.cli import session_factory
 from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
 from c7n_mailer.utils import setup_defaults as mailer_setup_defaults
 from c7n_mailer import deploy as mailer_deploy
 
 from manheim_c7n_tools.utils import (
-    set_log_info, set_log_debug, bold, assume_role
+    set_log_info, set_log_debug, bold, assume_role, aws_client,
+    policy_fingerprint, policy_resource_type, FINGERPRINT_TAG
 )
 from manheim_c7n_tools.version import VERSION, PROJECT_URL
 from manheim_c7n_tools.policygen import PolicyGen
@@ -56,6 +65,18 @@ from manheim_c7n_tools.vendor.mugc import (
 from manheim_c7n_tools.dryrun_diff import DryRunDiffer
 from manheim_c7n_tools.s3_archiver import S3Archiver
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.run_metrics import RunMetrics
+from manheim_c7n_tools.profiling import StepProfiler
+from manheim_c7n_tools.events import EventSink
+from manheim_c7n_tools.validation import PolicyValidator
+from manheim_c7n_tools import resource_cache, policy_costs
+from manheim_c7n_tools.manifest import (
+    RunManifest, inputs_digest, files_hash, load_region_policies,
+    region_policy_fingerprints
+)
+from manheim_c7n_tools.history import (
+    RunHistory, lpt_order, predict_makespan
+)
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=FORMAT)
@@ -67,6 +88,115 @@ for lname in ['boto3', 'botocore', 'urllib', 'urllib3']:
     log.setLevel(logging.WARNING)
     log.propagate = True
 
+#: Number of most expensive policies per region to log after custodian runs
+POLICY_COSTS_TOP = 10
+
+
+class _ProcessTraceback(Exception):
+    """
+    Traceback of an exception raised in a process started by
+    :py:func:`~._call_in_process`; set as the ``__cause__`` of the exception
+    when it is re-raised, so that both tracebacks are shown.
+    """
+
+    def __str__(self):
+        return '\n"""\n%s"""' % self.args[0]
+
+
+def _process_main(conn, log_level, func, args):
+    """
+    Entry point of the processes started by :py:func:`~._call_in_process`;
+    call ``func(*args)`` and send (result, exception, traceback) to ``conn``.
+    """
+    logger.setLevel(log_level)
+    try:
+        res = (func(*args), None, None)
+    except BaseException as ex:
+        res = (None, ex, traceback.format_exc())
+    try:
+        conn.send(res)
+    except Exception:
+        # the result or exception could not be pickled
+        conn.send((None, RuntimeError(
+            'ERROR: unable to return the result of %s: %s' % (
+                func.__name__, traceback.format_exc()
+            )
+        ), res[2]))
+    conn.close()
+
+
+def _call_in_process(func, *args):
+    """
+    Call ``func(*args)`` in a new process and return its result, re-raising
+    any exception it raises. The process is started with the ``spawn`` method,
+    so it shares no state with this one (such as loggers, c7n's loaded
+    resources or patched modules) and can itself start processes. ``func``
+    must be a module-level function or static method, and its arguments,
+    result and exceptions must be picklable.
+
+    :param func: function to call
+    :type func: ``callable``
+    :param args: positional arguments for ``func``
+    :return: the return value of ``func``
+    :raises: RuntimeError if the process exits without returning a result
+    """
+    ctx = multiprocessing.get_context('spawn')
+    reader, writer = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_process_main, args=(writer, logger.level, func, args)
+    )
+    proc.start()
+    writer.close()
+    try:
+        res = reader.recv()
+    except EOFError:
+        res = None
+    reader.close()
+    proc.join()
+    if res is None:
+        raise RuntimeError(
+            'ERROR: process running %s exited with code %s without a '
+            'result' % (func.__name__, proc.exitcode)
+        )
+    result, error, tb = res
+    if error is not None:
+        raise error from _ProcessTraceback(tb)
+    return result
+
+
+def _run_step_process(action, step, region_name, region_conf, options):
+    """
+    Run one step in one region, in a process started by
+    :py:meth:`~.CustodianRunner._run_unit` when running regions in parallel.
+    The :py:class:`~.UnitMetrics` are returned whether or not the step
+    succeeded, so CPU time and peak RSS are those of this process alone.
+
+    :param action: Name of the action to do, "run" or "dryrun"
+    :type action: str
+    :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+    :type step: object
+    :param region_name: region name
+    :type region_name: str
+    :param region_conf: configuration to run the step with
+    :type region_conf: ManheimConfig
+    :param options: run-wide step options
+    :type options: dict
+    :return: (:py:class:`~.UnitMetrics`, exception raised by the step or
+      None, traceback of that exception or None)
+    :rtype: tuple
+    """
+    metrics = RunMetrics(None, action)
+    try:
+        with metrics.measure(step.name, region_name):
+            inst = step(region_name, region_conf, options=options)
+            if action == 'run':
+                inst.run()
+            else:
+                inst.dryrun()
+    except BaseException as ex:
+        return metrics.units[0], ex, traceback.format_exc()
+    return metrics.units[0], None, None
+
 
 class BaseStep(object):
     """
@@ -80,7 +210,7 @@ class BaseStep(object):
     #: The name of the step, as used on the CLI
     name = None
 
-    def __init__(self, region_name, config):
+    def __init__(self, region_name, config, options=None):
         """
         Base Step class initializer.
 
@@ -95,9 +225,14 @@ class BaseStep(object):
           class is intialized in
           :py:meth:`~.CustodianRunner._run_step_in_regions`).
         :type config: ManheimConfig
+        :param options: run-wide options for steps, as set up by
+          :py:meth:`~.CustodianRunner.run` (see
+          :py:attr:`~.CustodianRunner.step_options`)
+        :type options: dict
         """
         self.region_name = region_name
         self.config = config
+        self.options = options if options is not None else {}
 
     @abc.abstractmethod
     def run(self):
@@ -108,7 +243,7 @@ class BaseStep(object):
         pass  # nocoverage
 
     @staticmethod
-    def run_in_region(region_name, config):
+    def run_in_region(region_name, config, options=None):
         """
         Return True if this step should run in the specified region,
         False if it should not.
@@ -121,11 +256,27 @@ class BaseStep(object):
           class is intialized in
           :py:meth:`~.CustodianRunner._run_step_in_regions`).
         :type config: ManheimConfig
+        :param options: run-wide options for steps (see
+          :py:attr:`~.CustodianRunner.step_options`), or None
+        :type options: dict
         :return: whether this step should run in the specified region
         :rtype: bool
         """
         return True
 
+    def manifest_inputs(self):
+        """
+        Return a JSON-serializable description of everything that determines
+        what this step does in this region during a ``run``, or None if the
+        step must always run. If the inputs are the same as those recorded in
+        the :py:class:`~.RunManifest` of the last successful run, running the
+        step would be a no-op and it is skipped.
+
+        :return: inputs of this step in this region, or None
+        :rtype: dict
+        """
+        return None
+
 
 class PolicygenStep(BaseStep):
     """Step to run policygen to generate custodian-ready policies on disk."""
@@ -142,22 +293,44 @@ class PolicygenStep(BaseStep):
         self._do_policygen()
 
     @staticmethod
-    def run_in_region(region_name, conf):
+    def run_in_region(region_name, conf, options=None):
         # only run in the first-configured region
         return region_name == conf.regions[0]
 
 
 class ValidateStep(BaseStep):
-    """Step to run custodian validate on generated policies."""
+    """
+    Step to validate the generated policies of all regions, in-process and in
+    a single pass (see :py:class:`~.PolicyValidator`).
+    """
 
     name = 'validate'
 
+    #: Name of the validation cache file, in ``custodian_cache_dir``
+    CACHE_FILENAME = 'c7n-validation.json'
+
+    @staticmethod
+    def _regions(conf, options):
+        """
+        Return the names of the regions whose policies to validate: those
+        selected for this run, if known, else all configured regions.
+        """
+        if options and options.get('regions'):
+            return options['regions']
+        return conf.regions
+
     def _do_validate(self):
-        conf = Config.empty(
-            configs=['custodian_%s.yml' % self.region_name],
-            region=self.region_name
+        paths = [
+            'custodian_%s.yml' % rname
+            for rname in self._regions(self.config, self.options)
+        ]
+        cache_path = os.path.join(
+            os.path.expanduser(self.config.custodian_cache_dir),
+            self.CACHE_FILENAME
         )
-        validate(conf)
+        results = PolicyValidator(cache_path).validate_files(paths)
+        if any(results.values()):
+            raise SystemExit(1)
 
     def run(self):
         self._do_validate()
@@ -165,6 +338,21 @@ class ValidateStep(BaseStep):
     def dryrun(self):
         self._do_validate()
 
+    @staticmethod
+    def run_in_region(region_name, conf, options=None):
+        # validates the policies of all selected regions at once; only run in
+        # the first of them
+        return region_name == ValidateStep._regions(conf, options)[0]
+
+    def manifest_inputs(self):
+        res = {}
+        for rname in self._regions(self.config, self.options):
+            fingerprints = region_policy_fingerprints(rname)
+            if fingerprints is None:
+                return None
+            res[rname] = fingerprints
+        return {'policies': res}
+
 
 class MugcStep(BaseStep):
     """
@@ -237,6 +425,15 @@ class MugcStep(BaseStep):
         )
         resources_gc_prefix(conf, conf, policies)
 
+    def manifest_inputs(self):
+        fingerprints = region_policy_fingerprints(self.region_name)
+        if fingerprints is None:
+            return None
+        return {
+            'policies': fingerprints,
+            'function_prefix': self.config.function_prefix
+        }
+
 
 class CustodianStep(BaseStep):
     """Step for actual custodian run"""
@@ -252,9 +449,20 @@ class CustodianStep(BaseStep):
           cloud-custodian-${account_id}-${region}/logs \
           --log-group=/cloud-custodian/${account_id}/${region} \
           -c custodian_${region}.yml \
-          --cache '/tmp/.cache/cloud-custodian.cache'
+          --cache CACHE_PATH --cache-period CACHE_TTL
+
+        but only for the policies returned by
+        :py:meth:`~._policies_to_provision`.
         """
-        conf = Config.empty(
+        policy_names = self._policies_to_provision()
+        if policy_names == []:
+            logger.info(
+                'All policies in %s are deployed and unchanged; skipping '
+                'custodian run', self.region_name
+            )
+            return
+        self._run_policies(
+            policy_names,
             configs=['custodian_%s.yml' % self.region_name],
             region=self.region_name,
             regions=[self.region_name],
@@ -262,13 +470,317 @@ class CustodianStep(BaseStep):
             verbose=1,
             metrics_enabled=True,
             subparser='run',
-            cache='/tmp/.cache/cloud-custodian.cache',
             command='c7n.commands.run',
             output_dir='%s/logs' % self.config.output_s3_bucket_name,
             vars=None,
             dryrun=False
         )
-        run(conf)
+
+    def _run_policies(self, policy_names, **kwargs):
+        """
+        Run custodian with the :py:class:`c7n.config.Config` options given as
+        ``kwargs``, for the policies named in ``policy_names`` (or all
+        policies, if None).
+
+        If the ``policy_jobs`` option is greater than one, the policies are
+        grouped by resource type (so that each group can reuse the c7n
+        resource cache) and up to that many groups are run concurrently,
+        largest group first, each in its own process and with only its own
+        policies (see :py:meth:`~._run_policy_group`). Every group runs to
+        completion; if any of them exited non-zero, the highest exit code is
+        then raised as :py:exc:`SystemExit`, as c7n itself would.
+
+        The c7n resource cache is a per-account, per-region file (per resource
+        type group, if run concurrently) in the configured
+        ``custodian_cache_dir``, valid for ``custodian_cache_ttl`` minutes. If
+        that is not zero, cache hit and miss counts are logged at the end.
+
+        Afterwards, whether or not custodian succeeded, a per-policy cost
+        report is written to the output directory and the most expensive
+        policies are logged (see :py:meth:`~._report_policy_costs`).
+
+        :param policy_names: names of the policies to run, or None for all
+        :type policy_names: list
+        """
+        resource_cache.install()
+        policy_costs.install()
+        kwargs['cache_period'] = self.config.custodian_cache_ttl
+        start = time.time()
+        try:
+            self._run_policy_groups(policy_names, kwargs)
+        finally:
+            self._report_policy_costs(
+                kwargs['output_dir'], policy_names, start
+            )
+
+    def _run_policy_groups(self, policy_names, kwargs):
+        """
+        Run custodian for ``policy_names``, either all at once or in
+        concurrent resource type groups; see :py:meth:`~._run_policies`.
+
+        :param policy_names: names of the policies to run, or None for all
+        :type policy_names: list
+        :param kwargs: :py:class:`c7n.config.Config` options
+        :type kwargs: dict
+        """
+        jobs = self.options.get('policy_jobs', 1)
+        groups = None
+        if jobs > 1:
+            groups = self._policy_groups(policy_names)
+        if groups is None or len(groups) < 2:
+            paths = [self._cache_path(kwargs['dryrun'])]
+            before = resource_cache.cache_stats.counts(paths)
+            try:
+                run(Config.empty(
+                    policy_filters=policy_names or [], resource_types=[],
+                    cache=paths[0], **kwargs
+                ))
+            finally:
+                self._log_cache_stats(paths, before)
+            return
+        logger.info(
+            'Running %d resource type groups of policies in %s with %d '
+            'workers', len(groups), self.region_name, jobs
+        )
+        rtypes = lpt_order(
+            list(groups.keys()), [len(x) for x in groups.values()]
+        )
+        paths = [self._cache_path(kwargs['dryrun'], x) for x in rtypes]
+        before = resource_cache.cache_stats.counts(paths)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    _call_in_process, self._run_policy_group, groups[rtype],
+                    dict(kwargs, cache=path)
+                )
+                for rtype, path in zip(rtypes, paths)
+            ]
+        failed = []
+        for rtype, path, future in zip(rtypes, paths, futures):
+            code, hits, misses, fetched = future.result()
+            resource_cache.cache_stats.add(path, hits, misses)
+            policy_costs.add_fetched(fetched)
+            if code:
+                logger.error(
+                    'Custodian exited %s for policies in %s: %s',
+                    code, self.region_name,
+                    ', '.join(p['name'] for p in groups[rtype])
+                )
+                failed.append(code)
+        self._log_cache_stats(paths, before)
+        if failed:
+            raise SystemExit(max(failed))
+
+    def _report_policy_costs(self, output_dir, policy_names, start):
+        """
+        Write the :py:mod:`~.policy_costs` report for the policies run since
+        ``start`` to ``output_dir``, and log the most expensive of them.
+        Failures are logged, but do not fail the step.
+
+        :param output_dir: c7n output directory the policies ran with
+        :type output_dir: str
+        :param policy_names: names of the policies run, or None for all
+        :type policy_names: list
+        :param start: time the run started, in seconds since the epoch
+        :type start: float
+        """
+        try:
+            if policy_names is None:
+                policy_names = [
+                    p['name']
+                    for p in load_region_policies(self.region_name) or []
+                ]
+            policy_costs.write_report(
+                output_dir, self.region_name, policy_costs.policy_costs(
+                    output_dir, self.region_name, policy_names, start
+                ), top=POLICY_COSTS_TOP
+            )
+        except Exception:
+            logger.warning(
+                'Unable to write policy cost report for %s',
+                self.region_name, exc_info=True
+            )
+
+    def _cache_path(self, dryrun, resource_type=None):
+        """
+        Return the absolute path of the c7n resource cache file for this
+        account, region and action, and optionally resource type. ``run`` and
+        ``dryrun`` use separate files, so that resources cached by a dryrun
+        are never acted on by a run.
+
+        :param dryrun: whether the cache is for a dryrun
+        :type dryrun: bool
+        :param resource_type: c7n resource type, or None
+        :type resource_type: str
+        :rtype: str
+        """
+        name = 'cloud-custodian-%s-%s-%s' % (
+            self.config.account_id, self.region_name,
+            'dryrun' if dryrun else 'run'
+        )
+        if resource_type is not None:
+            name += '-%s' % resource_type
+        return os.path.abspath(os.path.join(
+            os.path.expanduser(self.config.custodian_cache_dir),
+            '%s.cache' % name
+        ))
+
+    def _log_cache_stats(self, paths, before):
+        """
+        If the resource cache is enabled, log its hits and misses for
+        ``paths`` since the ``before`` counts were taken.
+
+        :param paths: cache file paths
+        :type paths: list
+        :param before: (hits, misses) for ``paths`` before running
+        :type before: tuple
+        """
+        if not self.config.custodian_cache_ttl:
+            return
+        hits, misses = resource_cache.cache_stats.counts(paths)
+        logger.info(
+            'Resource cache for %s: %d hits, %d misses',
+            self.region_name, hits - before[0], misses - before[1]
+        )
+
+    @staticmethod
+    def _run_policy_group(policies, kwargs):
+        """
+        Run custodian for one group of policies, in a process started by
+        :py:func:`~._call_in_process`. The policies are written to a temporary
+        policy file, so that c7n only loads and validates this group's
+        policies.
+
+        :param policies: the policies to run
+        :type policies: list
+        :param kwargs: :py:class:`c7n.config.Config` options
+        :type kwargs: dict
+        :return: (exit code (0 on success), resource cache hits, resource cache
+          misses, :py:func:`~.policy_costs.pop_all_fetched`)
+        :rtype: tuple
+        """
+        resource_cache.install()
+        policy_costs.install()
+        tmpdir = tempfile.mkdtemp(prefix='manheim-c7n-tools-')
+        path = os.path.join(tmpdir, 'policies.yml')
+        with open(path, 'w') as fh:
+            yaml.safe_dump({'policies': policies}, fh)
+        code = 0
+        try:
+            run(Config.empty(
+                policy_filters=[], resource_types=[],
+                **dict(kwargs, configs=[path])
+            ))
+        except SystemExit as ex:
+            code = ex.code or 0
+        finally:
+            rmtree(tmpdir)
+        hits, misses = resource_cache.cache_stats.counts([kwargs['cache']])
+        return code, hits, misses, policy_costs.pop_all_fetched()
+
+    def _policy_groups(self, policy_names):
+        """
+        Group the policies in ``custodian_REGION.yml`` by resource type.
+
+        :param policy_names: names of the policies to include, or None for all
+        :type policy_names: list
+        :return: dict of c7n resource type (e.g. ``aws.ec2``) to list of
+          policies, or None if the policies could not be read
+        :rtype: dict
+        """
+        policies = load_region_policies(self.region_name)
+        if policies is None:
+            return None
+        groups = {}
+        for pol in policies:
+            if policy_names is not None and pol['name'] not in policy_names:
+                continue
+            groups.setdefault(policy_resource_type(pol), []).append(pol)
+        return groups
+
+    def _policies_to_provision(self):
+        """
+        Determine which policies in ``custodian_REGION.yml`` need to be run.
+        Pull-mode policies always run; Lambda-mode policies only run (i.e. are
+        provisioned) if the :py:const:`~.utils.FINGERPRINT_TAG` tag that
+        policygen stamped on them differs from the one on the deployed
+        function.
+
+        :return: None if all policies should run (including when
+          ``custodian_REGION.yml`` is missing), otherwise a (possibly empty)
+          list of the names of the policies to run
+        :rtype: list
+        """
+        policies = load_region_policies(self.region_name) or []
+        deployed = self._deployed_fingerprints()
+        if deployed is None:
+            return None
+        names = []
+        for pol in policies:
+            mode = pol.get('mode', {})
+            fingerprint = mode.get('tags', {}).get(FINGERPRINT_TAG)
+            if mode.get('type', 'pull') == 'pull' or fingerprint is None:
+                names.append(pol['name'])
+                continue
+            func_name = mode.get('function-prefix', 'custodian-') + pol['name']
+            if deployed.get(func_name) != fingerprint:
+                names.append(pol['name'])
+        logger.info(
+            '%d of %d policies in %s are pull-mode or new/changed and will be '
+            'run', len(names), len(policies), self.region_name
+        )
+        if len(names) == len(policies):
+            return None
+        return names
+
+    def manifest_inputs(self):
+        """
+        Pull-mode policies do work on every run, so this returns None if there
+        are any; otherwise the fingerprints of all (Lambda-mode) policies.
+        """
+        policies = load_region_policies(self.region_name)
+        if policies is None:
+            return None
+        if any(
+            p.get('mode', {}).get('type', 'pull') == 'pull' for p in policies
+        ):
+            return None
+        return {
+            'policies': {p['name']: policy_fingerprint(p) for p in policies}
+        }
+
+    def _deployed_fingerprints(self):
+        """
+        Return a dict of Lambda function name to the value of its
+        :py:const:`~.utils.FINGERPRINT_TAG` tag, for all functions in the
+        region that have one; or None if this could not be determined.
+
+        :rtype: dict
+        """
+        client = aws_client('resourcegroupstaggingapi', self.region_name)
+        res = {}
+        try:
+            for page in client.get_paginator('get_resources').paginate(
+                ResourceTypeFilters=['lambda:function'],
+                TagFilters=[{'Key': FINGERPRINT_TAG}]
+            ):
+                for r in page['ResourceTagMappingList']:
+                    # arn:aws:lambda:REGION:ACCT:function:NAME
+                    func_name = r['ResourceARN'].split(':')[6]
+                    for tag in r['Tags']:
+                        if tag['Key'] == FINGERPRINT_TAG:
+                            res[func_name] = tag['Value']
+        except ClientError:
+            logger.warning(
+                'Unable to list deployed Lambda function fingerprints in %s; '
+                'provisioning all policies', self.region_name, exc_info=True
+            )
+            return None
+        logger.debug(
+            'Found %d fingerprinted Lambda functions in %s',
+            len(res), self.region_name
+        )
+        return res
 
     def dryrun(self):
         """
@@ -278,22 +790,41 @@ class CustodianStep(BaseStep):
 
         custodian run --region '${region}' --dryrun -v -s dryrun/${region} \
           -c custodian_${region}.yml \
-          --cache '/tmp/.cache/cloud-custodian.cache'
+          --cache CACHE_PATH --cache-period CACHE_TTL
+
+        If the ``dryrun_policies`` option is set (a targeted dryrun), only
+        those of the listed policies that are deployed to this region are run;
+        if there are none, c7n is not invoked at all.
         """
-        conf = Config.empty(
+        policy_names = self.options.get('dryrun_policies')
+        if policy_names is not None:
+            in_region = set(
+                p['name'] for p in load_region_policies(self.region_name) or []
+            )
+            policy_names = [x for x in policy_names if x in in_region]
+            if not policy_names:
+                logger.info(
+                    'No changed policies in %s; skipping custodian dryrun',
+                    self.region_name
+                )
+                return
+            logger.info(
+                'Targeted dryrun of %d changed policies in %s: %s',
+                len(policy_names), self.region_name, policy_names
+            )
+        self._run_policies(
+            policy_names,
             configs=['custodian_%s.yml' % self.region_name],
             region=self.region_name,
             regions=[self.region_name],
             verbose=1,
             metrics_enabled=False,
             subparser='run',
-            cache='/tmp/.cache/cloud-custodian.cache',
             command='c7n.commands.run',
             output_dir='dryrun/%s' % self.region_name,
             vars=None,
             dryrun=True
         )
-        run(conf)
 
 
 class MailerStep(BaseStep):
@@ -333,6 +864,20 @@ class MailerStep(BaseStep):
 
     def run(self):
         conf = self.mailer_config
+        fingerprint = self._fingerprint(conf)
+        deployed = self._deployed_fingerprint(conf)
+        if deployed == fingerprint:
+            logger.info(
+                'Mailer config and templates unchanged since last deployed '
+                '(fingerprint %s); skipping mailer provisioning in %s',
+                fingerprint, self.region_name
+            )
+            return
+        logger.info(
+            'Mailer fingerprint changed from %s to %s; provisioning mailer',
+            deployed, fingerprint
+        )
+        conf.setdefault('lambda_tags', {})[FINGERPRINT_TAG] = fingerprint
         mailer_deploy.provision(
             conf,
             functools.partial(session_factory, conf)
@@ -343,7 +888,58 @@ class MailerStep(BaseStep):
         self.mailer_config
 
     @staticmethod
-    def run_in_region(region_name, config):
+    def _fingerprint(conf):
+        """
+        Return a fingerprint of what the mailer Lambda would be provisioned
+        from: the validated mailer config (as returned by
+        :py:attr:`~.mailer_config`), the contents of every file in its
+        ``templates_folders``, and the c7n version (which c7n-mailer is
+        released in lockstep with).
+
+        :param conf: validated c7n-mailer config
+        :type conf: dict
+        :return: hex digest
+        :rtype: str
+        """
+        conf = dict(conf)
+        # template folder paths vary by checkout location; hash their content
+        folders = conf.pop('templates_folders')
+        return inputs_digest({
+            'config': conf,
+            'templates': files_hash(folders),
+            'c7n': c7n_version
+        })
+
+    def _deployed_fingerprint(self, conf):
+        """
+        Return the value of the :py:const:`~.utils.FINGERPRINT_TAG` tag on the
+        deployed mailer Lambda function, or None if the function does not
+        exist, is not tagged, or could not be described.
+
+        :param conf: validated c7n-mailer config
+        :type conf: dict
+        :rtype: str
+        """
+        name = conf.get('lambda_name', 'cloud-custodian-mailer')
+        client = session_factory(conf).client('lambda')
+        try:
+            tags = client.get_function(FunctionName=name).get('Tags', {})
+        except ClientError as ex:
+            if ex.response['Error']['Code'] == 'ResourceNotFoundException':
+                logger.info('Mailer function %s is not deployed yet', name)
+            else:
+                logger.warning(
+                    'Unable to get mailer function %s; provisioning it',
+                    name, exc_info=True
+                )
+            return None
+        return tags.get(FINGERPRINT_TAG)
+
+    def manifest_inputs(self):
+        return {'mailer_config_hash': self._fingerprint(self.mailer_config)}
+
+    @staticmethod
+    def run_in_region(region_name, config, options=None):
         return region_name in config.mailer_regions
 
 
@@ -359,7 +955,7 @@ class DryRunDiffStep(BaseStep):
         DryRunDiffer(self.config).run(diff_against='origin/master')
 
     @staticmethod
-    def run_in_region(region_name, conf):
+    def run_in_region(region_name, conf, options=None):
         return region_name == conf.regions[-1]
 
 
@@ -383,22 +979,71 @@ class S3ArchiverStep(BaseStep):
             dryrun=True
         ).run()
 
+    def manifest_inputs(self):
+        fingerprints = region_policy_fingerprints(self.region_name)
+        if fingerprints is None:
+            return None
+        return {'policy_names': sorted(fingerprints.keys())}
+
 
 class DocsBuildStep(BaseStep):
     """Builds generated documentation."""
 
     name = 'docs'
 
+    #: Paths whose content determines the generated documentation
+    DOCS_INPUTS = ['policies.rst', 'regions.rst', 'docs/source']
+
+    #: Name of the file in ``docs_cache_dir`` holding the
+    #: :py:func:`~.files_hash` of :py:attr:`~.DOCS_INPUTS` as last built
+    HASH_FILENAME = 'docs-inputs.sha256'
+
     def _run_sphinx_build(self):
-        if os.path.exists('docs/_build'):
-            logger.info('Removing docs/_build')
-            rmtree('docs/_build')
-        # "sphinx-build -W docs/source docs/_build -b dirhtml"
-        argv = ['-W', 'docs/source', 'docs/_build', '-b', 'dirhtml']
+        cache_dir = self.config.docs_cache_dir
+        # "sphinx-build -W -j auto docs/source docs/_build -b dirhtml"
+        argv = [
+            '-W', '-j', 'auto', 'docs/source', 'docs/_build', '-b', 'dirhtml'
+        ]
+        if cache_dir is None:
+            if os.path.exists('docs/_build'):
+                logger.info('Removing docs/_build')
+                rmtree('docs/_build')
+        else:
+            cache_dir = os.path.expanduser(cache_dir)
+            hash_path = os.path.join(cache_dir, self.HASH_FILENAME)
+            docs_hash = files_hash(self.DOCS_INPUTS)
+            if (
+                os.path.exists('docs/_build') and
+                self._read_docs_hash(hash_path) == docs_hash
+            ):
+                logger.info(
+                    'Docs sources unchanged since last build (hash %s); '
+                    'skipping Sphinx build', docs_hash
+                )
+                return
+            # keep docs/_build and the doctree cache for an incremental build
+            argv = ['-d', os.path.join(cache_dir, 'doctrees')] + argv
         logger.info('Running: sphinx-build %s' % ' '.join(argv))
         rcode = sphinx_main(argv)
         if rcode != 0:
             raise RuntimeError('Sphinx exited %d' % rcode)
+        if cache_dir is not None:
+            with open(hash_path, 'w') as fh:
+                fh.write(docs_hash)
+
+    @staticmethod
+    def _read_docs_hash(path):
+        """
+        Return the docs inputs hash stored at ``path``, or None if not present.
+
+        :param path: path to the hash file
+        :type path: str
+        :rtype: str
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as fh:
+            return fh.read().strip()
 
     def run(self):
         self._run_sphinx_build()
@@ -406,8 +1051,11 @@ class DocsBuildStep(BaseStep):
     def dryrun(self):
         self._run_sphinx_build()
 
+    def manifest_inputs(self):
+        return {'docs_hash': files_hash(self.DOCS_INPUTS)}
+
     @staticmethod
-    def run_in_region(region_name, conf):
+    def run_in_region(region_name, conf, options=None):
         # only run in the first-configured region
         return region_name == conf.regions[0]
 
@@ -440,7 +1088,27 @@ class CustodianRunner(object):
         :type config_path: str
         """
         self._config_path = config_path
+        self._account_name = account_name
         self.config = ManheimConfig.from_file(config_path, account_name)
+        #: :py:class:`~.RunMetrics` for the current (or last) run
+        self.metrics = RunMetrics(account_name, None)
+        #: :py:class:`~.StepProfiler` for the current (or last) run
+        self.profiler = StepProfiler([])
+        #: :py:class:`~.EventSink` for the current (or last) run
+        self.events = EventSink()
+        #: number of regions to run each step in concurrently
+        self.jobs = 1
+        #: :py:class:`~.RunHistory` of unit durations, or None
+        self.history = None
+        #: :py:class:`~.RunManifest` of the last successful run, or None
+        self.manifest = None
+        #: run-wide options passed to every :py:class:`~.BaseStep` and to
+        #: :py:meth:`~.BaseStep.run_in_region`: ``regions``, the names of the
+        #: regions selected for the run, ``dryrun_policies``, the list of
+        #: policy names to limit a targeted dryrun to (None to run all
+        #: policies), and ``policy_jobs``, the number of threads to run each
+        #: region's policies on
+        self.step_options = {}
 
     def _steps_to_run(self, step_names, skip_steps):
         """
@@ -465,7 +1133,10 @@ class CustodianRunner(object):
             if x.name in step_names and x.name not in skip_steps
         ]
 
-    def run(self, action, regions=[], step_names=[], skip_steps=[]):
+    def run(self, action, regions=[], step_names=[], skip_steps=[],
+            metrics_json=None, metrics_prom=None, profiler=None,
+            events=None, jobs=1, history=None, manifest=None,
+            targeted_dryrun=False, policy_jobs=1):
         """
         Main method to run all steps. This calls :py:meth:`~._steps_to_run`
         to determine which step classes to run and the order to run them in,
@@ -473,6 +1144,18 @@ class CustodianRunner(object):
         or :py:meth:`~.BaseStep.dryrun` method on each of them, according to the
         ``action`` specified.
 
+        Wall time, CPU time and peak RSS are recorded for every (step, region)
+        unit in :py:attr:`~.metrics`; a summary table is logged at the end of
+        the run, whether or not it succeeded.
+
+        Steps always run one after another. If ``jobs`` is greater than one,
+        each step runs in up to ``jobs`` regions concurrently, each in its own
+        process, and cannot be profiled; if a
+        ``history`` is also given, the regions expected to take longest (per
+        the history) are started first. When a ``history`` is given, the
+        predicted and actual completion times are logged and the durations of
+        this run are added to it.
+
         :param action: Name of the action to do, "run" or "dryrun"
         :type action: str
         :param regions: list of string region names to run in; if left empty,
@@ -484,7 +1167,41 @@ class CustodianRunner(object):
         :type step_names: list
         :param skip_steps: list of string step names to skip running
         :type skip_steps: list
+        :param metrics_json: if not None, path to write run metrics to as JSON
+        :type metrics_json: str
+        :param metrics_prom: if not None, path to write run metrics to in the
+          Prometheus textfile-collector format
+        :type metrics_prom: str
+        :param profiler: if not None, profiler to wrap selected (step, region)
+          units in
+        :type profiler: :py:class:`~.StepProfiler`
+        :param events: if not None, sink to write progress events to
+        :type events: :py:class:`~.EventSink`
+        :param jobs: maximum number of regions to run each step in concurrently
+        :type jobs: int
+        :param history: if not None, history of previous unit durations to
+          schedule with, and to record this run's durations to
+        :type history: :py:class:`~.RunHistory`
+        :param manifest: if not None, manifest of the last successful run. When
+          ``action`` is "run", (step, region) units whose
+          :py:meth:`~.BaseStep.manifest_inputs` are unchanged since then are
+          skipped, and the manifest is updated after a successful run.
+        :type manifest: :py:class:`~.RunManifest`
+        :param targeted_dryrun: if True and ``action`` is "dryrun", determine
+          the policies changed from ``origin/master`` (per
+          :py:meth:`~.DryRunDiffer.policies_to_dryrun`) before running any
+          steps, and have :py:class:`~.CustodianStep` only dryrun those
+        :type targeted_dryrun: bool
+        :param policy_jobs: maximum number of resource type groups of policies
+          for :py:class:`~.CustodianStep` to run concurrently within a region
+        :type policy_jobs: int
+        :raises: RuntimeError
         """
+        if jobs > 1 and profiler is not None and profiler.step_names:
+            raise RuntimeError(
+                'ERROR: steps cannot be profiled when running with more than '
+                'one job'
+            )
         self._validate_account()
         to_run = self._steps_to_run(step_names, skip_steps)
         if to_run == self.ordered_step_classes:
@@ -497,22 +1214,176 @@ class CustodianRunner(object):
                     action, len(to_run), len(self.ordered_step_classes)
                 )
             ))
-        if regions:
-            if not set(regions).issubset(set(self.config.regions)):
-                raise RuntimeError(
-                    'ERROR: All specified region names must be listed in the '
-                    '"regions" section of the config file '
-                    '(%s)' % self._config_path
+        regions = self._regions_to_run(regions)
+        self.metrics = RunMetrics(self._account_name, action)
+        self.profiler = profiler if profiler is not None else StepProfiler([])
+        self.events = events if events is not None else EventSink()
+        self.events.context.update(account=self._account_name, action=action)
+        self.jobs = jobs
+        self.history = history
+        self.manifest = manifest
+        self.step_options = {'regions': regions, 'policy_jobs': policy_jobs}
+        if targeted_dryrun and action == 'dryrun':
+            self.step_options['dryrun_policies'] = DryRunDiffer(
+                self.config
+            ).policies_to_dryrun(diff_against='origin/master')
+        predicted = None
+        if history is not None:
+            predicted = self._predict_completion(to_run, regions)
+        self.events.emit(
+            'run_start', steps=[x.name for x in to_run], regions=regions
+        )
+        start = time.perf_counter()
+        success = False
+        try:
+            for idx, step in enumerate(to_run):
+                logger.info(bold(
+                    'Step %d of %d - %s' % (idx + 1, len(to_run), step.name)
+                ))
+                with self.events.span(
+                    'step', step=step.name, step_number=idx + 1,
+                    step_count=len(to_run)
+                ):
+                    self._run_step_in_regions(action, step, regions)
+            logger.info(bold('SUCCESS: All %d steps complete!' % len(to_run)))
+            success = True
+            if manifest is not None and action == 'run':
+                manifest.save(self.config.account_name, self.config.account_id)
+        finally:
+            duration = time.perf_counter() - start
+            self._report_metrics(metrics_json, metrics_prom)
+            if history is not None:
+                logger.info(
+                    'Predicted completion time %.1fs; actual %.1fs',
+                    predicted, duration
                 )
-        else:
+                history.record(self._account_name, self.metrics.units)
+                history.save()
+            self.events.emit(
+                'summary', success=success, duration=round(duration, 6),
+                steps=len(to_run), units=len(self.metrics.units),
+                failed_units=len(
+                    [u for u in self.metrics.units if not u.success]
+                )
+            )
+
+    def _predict_completion(self, steps, regions):
+        """
+        Predict the wall time to run ``steps`` in ``regions`` with
+        :py:attr:`~.jobs` workers, from :py:attr:`~.history`. Units without
+        history (including regions a step does not run in) count as zero.
+
+        :param steps: step classes that will be run
+        :type steps: list
+        :param regions: region names that will be run in
+        :type regions: list
+        :return: predicted wall time in seconds
+        :rtype: float
+        """
+        total = 0.0
+        unknown = 0
+        for step in steps:
+            estimates = [
+                self.history.expected(self._account_name, step.name, r)
+                for r in regions
+            ]
+            unknown += estimates.count(None)
+            total += predict_makespan(
+                lpt_order([e or 0.0 for e in estimates], estimates),
+                self.jobs
+            )
+        logger.info(
+            'Predicted completion time with %d job(s): %.1fs (%d of %d '
+            '(step, region) units have no history)', self.jobs, total,
+            unknown, len(steps) * len(regions)
+        )
+        return total
+
+    def _regions_to_run(self, regions):
+        """
+        Given the ``regions`` passed to :py:meth:`~.run` or :py:meth:`~.plan`,
+        validate them and return the list of regions to run in.
+
+        :param regions: list of region names; if empty, use all configured
+          regions
+        :type regions: list
+        :return: list of region names to run in
+        :rtype: list
+        :raises: RuntimeError
+        """
+        if not regions:
             # use all regions from config file
-            regions = self.config.regions
-        for idx, step in enumerate(to_run):
-            logger.info(bold(
-                'Step %d of %d - %s' % (idx + 1, len(to_run), step.name)
-            ))
-            self._run_step_in_regions(action, step, regions)
-        logger.info(bold('SUCCESS: All %d steps complete!' % len(to_run)))
+            return self.config.regions
+        if not set(regions).issubset(set(self.config.regions)):
+            raise RuntimeError(
+                'ERROR: All specified region names must be listed in the '
+                '"regions" section of the config file '
+                '(%s)' % self._config_path
+            )
+        return regions
+
+    def plan(self, manifest, regions=[], step_names=[], skip_steps=[]):
+        """
+        Compare the currently-generated configuration (i.e. the output of
+        the ``policygen`` step) with ``manifest`` and determine which
+        (step, region) units a ``run`` would actually do work in.
+
+        :param manifest: manifest of the last successful run
+        :type manifest: :py:class:`~.RunManifest`
+        :param regions: list of string region names; if left empty, use all
+          regions listed in config file
+        :type regions: list
+        :param step_names: list of string step names to plan; if not
+          specified, plan all defined steps
+        :type step_names: list
+        :param skip_steps: list of string step names to skip
+        :type skip_steps: list
+        :return: list of (step name, region name, status) tuples, where status
+          is one of "always", "changed" or "no-op"
+        :rtype: list
+        """
+        regions = self._regions_to_run(regions)
+        self.step_options = {'regions': regions}
+        result = []
+        for step in self._steps_to_run(step_names, skip_steps):
+            for region_name in regions:
+                region_conf = self._region_conf(step, region_name)
+                if not step.run_in_region(
+                    region_name, region_conf, options=self.step_options
+                ):
+                    continue
+                inputs = step(
+                    region_name, region_conf, options=self.step_options
+                ).manifest_inputs()
+                if inputs is None:
+                    status = 'always'
+                elif manifest.is_noop(step.name, region_name, inputs):
+                    status = 'no-op'
+                else:
+                    status = 'changed'
+                result.append((step.name, region_name, status))
+        return result
+
+    def _report_metrics(self, metrics_json, metrics_prom):
+        """
+        Log the :py:attr:`~.metrics` summary table and write the metrics files,
+        if paths for them were given.
+
+        :param metrics_json: if not None, path to write run metrics to as JSON
+        :type metrics_json: str
+        :param metrics_prom: if not None, path to write run metrics to in the
+          Prometheus textfile-collector format
+        :type metrics_prom: str
+        """
+        if self.metrics.units:
+            logger.info(
+                'Run timing by step and region:\n%s',
+                self.metrics.summary_table()
+            )
+        if metrics_json is not None:
+            self.metrics.write_json(metrics_json)
+        if metrics_prom is not None:
+            self.metrics.write_prometheus(metrics_prom)
 
     def _validate_account(self):
         """
@@ -521,7 +1392,7 @@ class CustodianRunner(object):
         :raises: RuntimeError
         """
         logger.debug('Connecting to STS in us-east-1 to verify account')
-        sts = boto3.client('sts', region_name='us-east-1')
+        sts = aws_client('sts', 'us-east-1')
         cid = sts.get_caller_identity()
         logger.debug('Caller Identity: %s', cid)
         if cid['Account'] != self.config.account_id:
@@ -545,30 +1416,163 @@ class CustodianRunner(object):
         :param regions: list of string region names to run in
         :type regions: list
         """
+        if self.jobs > 1:
+            return self._run_step_in_regions_parallel(action, step, regions)
+        for unit in self._region_units(step, regions):
+            self._run_unit(action, step, *unit)
+
+    def _region_units(self, step, regions):
+        """
+        Generator over the regions that ``step`` should run in, logging and
+        emitting a ``skip`` event for those it should not run in.
+
+        :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+        :type step: object
+        :param regions: list of string region names to run in
+        :type regions: list
+        :return: generator of (region name, region config, event fields)
+          tuples, as accepted by :py:meth:`~._run_unit`
+        """
         for r_idx, region_name in enumerate(regions):
-            if step.name in ['policygen', 'dryrun-diff']:
-                # Some steps need a config with %%AWS_REGION%% un-interpolated
-                region_conf = self.config
-            else:
-                region_conf = self.config.config_for_region(region_name)
-            if not step.run_in_region(region_name, region_conf):
+            region_conf = self._region_conf(step, region_name)
+            ev_fields = {
+                'step': step.name, 'region': region_name,
+                'region_number': r_idx + 1, 'region_count': len(regions)
+            }
+            if not step.run_in_region(
+                region_name, region_conf, options=self.step_options
+            ):
                 logger.info(bold(
                     'SKIPPING Step %s in REGION %d of %d (%s)' % (
                         step.name, r_idx + 1, len(regions), region_name
                     )
                 ))
+                self.events.emit('skip', **ev_fields)
                 continue
-            logger.info(bold(
-                'Step %s in REGION %d of %d (%s)' % (
-                    step.name, r_idx + 1, len(regions), region_name
+            yield region_name, region_conf, ev_fields
+
+    def _run_step_in_regions_parallel(self, action, step, regions):
+        """
+        Called from :py:meth:`~._run_step_in_regions` when :py:attr:`~.jobs`
+        is greater than one; run a given step in all applicable / specified
+        regions, up to :py:attr:`~.jobs` at a time. If :py:attr:`~.history` is
+        set, regions are started longest-expected-first. Each region runs in
+        its own process (see :py:meth:`~._run_unit`). If any region fails,
+        regions that have not started yet are cancelled, running ones are
+        allowed to finish, and the first failure is re-raised.
+
+        :param action: Name of the action to do, "run" or "dryrun"
+        :type action: str
+        :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+        :type step: object
+        :param regions: list of string region names to run in
+        :type regions: list
+        """
+        units = list(self._region_units(step, regions))
+        if self.history is not None:
+            units = lpt_order(units, [
+                self.history.expected(self._account_name, step.name, u[0])
+                for u in units
+            ])
+        logger.info(
+            'Running step %s in %d region(s) with up to %d jobs: %s',
+            step.name, len(units), self.jobs, ', '.join(u[0] for u in units)
+        )
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [
+                executor.submit(
+                    self._run_unit, action, step, *u, in_process=True
                 )
-            ))
-            if action == 'run':
-                step(region_name, region_conf).run()
+                for u in units
+            ]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for f in futures:
+                f.cancel()
+        for f in futures:
+            if not f.cancelled():
+                f.result()
+
+    def _region_conf(self, step, region_name):
+        """
+        Return the configuration to run ``step`` in ``region_name`` with.
+
+        :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+        :type step: object
+        :param region_name: region name
+        :type region_name: str
+        :rtype: ManheimConfig
+        """
+        if step.name in ['policygen', 'dryrun-diff']:
+            # Some steps need a config with %%AWS_REGION%% un-interpolated
+            return self.config
+        return self.config.config_for_region(region_name)
+
+    def _run_unit(self, action, step, region_name, region_conf, ev_fields,
+                  in_process=False):
+        """
+        Run one step in one region, recording metrics, events and (if enabled)
+        profile data for it.
+
+        If ``in_process`` is True, the step itself runs in a new process (with
+        :py:func:`~._run_step_process`), so that steps running concurrently
+        share no state or loggers, and their CPU time and peak RSS are
+        measured separately; steps are not profiled in this case. The
+        manifest, events and metrics are still handled in this process.
+
+        :param action: Name of the action to do, "run" or "dryrun"
+        :type action: str
+        :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+        :type step: object
+        :param region_name: region name
+        :type region_name: str
+        :param region_conf: configuration to run the step with
+        :type region_conf: ManheimConfig
+        :param ev_fields: fields to include in progress events
+        :type ev_fields: dict
+        :param in_process: whether to run the step in a new process
+        :type in_process: bool
+        """
+        inst = step(region_name, region_conf, options=self.step_options)
+        inputs = None
+        if self.manifest is not None and action == 'run':
+            inputs = inst.manifest_inputs()
+            if self.manifest.is_noop(step.name, region_name, inputs):
+                logger.info(bold(
+                    'SKIPPING Step %s in REGION %d of %d (%s) - unchanged '
+                    'since last run' % (
+                        step.name, ev_fields['region_number'],
+                        ev_fields['region_count'], region_name
+                    )
+                ))
+                self.events.emit('skip', reason='unchanged', **ev_fields)
+                self.manifest.record(step.name, region_name, inputs)
+                return
+        logger.info(bold(
+            'Step %s in REGION %d of %d (%s)' % (
+                step.name, ev_fields['region_number'],
+                ev_fields['region_count'], region_name
+            )
+        ))
+        with self.events.span('region', emit_error=True, **ev_fields):
+            if in_process:
+                unit, error, tb = _call_in_process(
+                    _run_step_process, action, step, region_name,
+                    region_conf, self.step_options
+                )
+                self.metrics.units.append(unit)
+                if error is not None:
+                    raise error from _ProcessTraceback(tb)
             else:
-                step(region_name, region_conf).dryrun()
-            sys.stdout.flush()
-            sys.stderr.flush()
+                with self.metrics.measure(step.name, region_name), \
+                        self.profiler.profile(step.name, region_name):
+                    if action == 'run':
+                        inst.run()
+                    else:
+                        inst.dryrun()
+        if self.manifest is not None and action == 'run':
+            self.manifest.record(step.name, region_name, inputs)
+        sys.stdout.flush()
+        sys.stderr.flush()
 
 
 def parse_args(argv):
@@ -599,22 +1603,95 @@ def parse_args(argv):
                    action='store_false', default=True,
                    help='Do not assume a role, even if  specified in the '
                         'configuration file.')
+    p.add_argument('--metrics-json', dest='metrics_json', action='store',
+                   default=None,
+                   help='Write per-step, per-region timing metrics as JSON to '
+                        'this path.')
+    p.add_argument('--metrics-prom', dest='metrics_prom', action='store',
+                   default=None,
+                   help='Write per-step, per-region timing metrics to this '
+                        'path, for the Prometheus node_exporter textfile '
+                        'collector.')
+    p.add_argument('--profile-step', dest='profile_steps', action='append',
+                   default=[], metavar='NAME',
+                   choices=['all'] + [
+                       x.name for x in CustodianRunner.ordered_step_classes
+                   ],
+                   help='Profile the named step with cProfile, writing one '
+                        '.pstats file per step and region; may be specified '
+                        'multiple times, or as "all" to profile every step. '
+                        'Cannot be used with --jobs greater than 1.')
+    p.add_argument('--profile-dir', dest='profile_dir', action='store',
+                   default='profiles',
+                   help='Directory to write profile output to (default: '
+                        './profiles)')
+    p.add_argument('--profile-collapsed', dest='profile_collapsed',
+                   action='store_true', default=False,
+                   help='When profiling, sample stacks instead of using '
+                        'cProfile, and write a flamegraph-compatible '
+                        'collapsed-stack file per step and region instead of '
+                        'a .pstats file.')
+    events_group = p.add_mutually_exclusive_group()
+    events_group.add_argument('--events-file', dest='events_file',
+                              action='store', default=None,
+                              help='Write machine-readable progress events to '
+                                   'this path as JSON Lines.')
+    events_group.add_argument('--events-fd', dest='events_fd', action='store',
+                              type=int, default=None,
+                              help='Write machine-readable progress events as '
+                                   'JSON Lines to this already-open file '
+                                   'descriptor.')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=1,
+                   help='Run each step in up to this many regions concurrently '
+                        '(default: 1)')
+    p.add_argument('-J', '--policy-jobs', dest='policy_jobs', action='store',
+                   type=int, default=1,
+                   help='In the custodian step, run up to this many resource '
+                        'types\' policies concurrently within each region '
+                        '(default: 1)')
+    p.add_argument('--history-file', dest='history_file', action='store',
+                   default=None,
+                   help='Path to a JSON file of per-step, per-region durations '
+                        'from previous runs; used to start the longest '
+                        'regions first when running with --jobs, and to '
+                        'predict completion time. Created if missing and '
+                        'updated after each run.')
+    p.add_argument('--manifest', dest='manifest', action='store',
+                   default=None,
+                   help='Local path or s3://BUCKET/KEY URL of the run '
+                        'manifest. If given, "run" skips step/region units '
+                        'that are unchanged since the last successful run, '
+                        'and updates the manifest after a successful run. '
+                        'Required for "plan".')
     subp = p.add_subparsers(help='command', title='subcommands')
 
     run_parser = subp.add_parser(
         'run', help='Perform a full run (must specify ACCT_NAME)'
     )
-    run_parser.set_defaults(ACTION='run')
+    run_parser.set_defaults(ACTION='run', targeted=False)
     dryrun_parser = subp.add_parser(
         'dryrun', help='Perform a dry run (must specify ACCT_NAME)'
     )
     dryrun_parser.set_defaults(ACTION='dryrun')
+    dryrun_parser.add_argument(
+        '-t', '--targeted', dest='targeted', action='store_true',
+        default=False,
+        help='Only dryrun the policies changed from origin/master (all '
+             'policies if defaults.yml changed), as reported on by the '
+             'dryrun-diff step'
+    )
+    plan_parser = subp.add_parser(
+        'plan', help='List the step/region units a run would do work in, '
+                     'based on --manifest (must specify ACCT_NAME)'
+    )
+    plan_parser.set_defaults(ACTION='plan', targeted=False)
     list_parser = subp.add_parser('list', help='List available steps')
     list_parser.set_defaults(ACTION='list')
     acct_parser = subp.add_parser('accounts', help='List configured accounts')
     acct_parser.set_defaults(ACTION='accounts')
 
-    for parser in [run_parser, dryrun_parser]:
+    for parser in [run_parser, dryrun_parser, plan_parser]:
         parser.add_argument(
             'ACCT_NAME', action='store', type=str, default=None,
             help='account_name value from config file, for account to run '
@@ -622,6 +1699,9 @@ def parse_args(argv):
         )
 
     args = p.parse_args(argv)
+    if args.profile_steps and args.jobs > 1:
+        # cProfile and the stack sampler profile one thread of the process
+        p.error('--profile-step cannot be used with --jobs greater than 1')
     return args
 
 
@@ -648,9 +1728,49 @@ def main():
     cr = CustodianRunner(args.ACCT_NAME, args.config)
     if args.assume_role:
         assume_role(cr.config)
-    cr.run(
-        args.ACTION, args.regions, step_names=args.steps, skip_steps=args.skip
-    )
+    manifest = None
+    if args.manifest is not None:
+        manifest = RunManifest(
+            args.manifest, region_name=cr.config.regions[0],
+            account_id=cr.config.account_id
+        )
+    if args.ACTION == 'plan':
+        if manifest is None:
+            raise SystemExit('ERROR: the plan action requires --manifest')
+        plan = cr.plan(
+            manifest, args.regions, step_names=args.steps,
+            skip_steps=args.skip
+        )
+        print(tabulate(plan, headers=['Step', 'Region', 'Status']))
+        print('%d of %d units would do work' % (
+            len([x for x in plan if x[2] != 'no-op']), len(plan)
+        ))
+        raise SystemExit(0)
+    profiler = None
+    if args.profile_steps:
+        profiler = StepProfiler(
+            args.profile_steps, output_dir=args.profile_dir,
+            collapsed=args.profile_collapsed
+        )
+    events = None
+    if args.events_file is not None:
+        events = EventSink.from_path(args.events_file)
+    elif args.events_fd is not None:
+        events = EventSink.from_fd(args.events_fd)
+    history = None
+    if args.history_file is not None:
+        history = RunHistory(args.history_file)
+    try:
+        cr.run(
+            args.ACTION, args.regions, step_names=args.steps,
+            skip_steps=args.skip, metrics_json=args.metrics_json,
+            metrics_prom=args.metrics_prom, profiler=profiler, events=events,
+            jobs=args.jobs, history=history, manifest=manifest,
+            targeted_dryrun=args.targeted, policy_jobs=args.policy_jobs
+        )
+    finally:
+        if events is not None:
+            events.close()
 
 
 if __name__ == "__main__":
@@ -19,7 +19,6 @@ policies to an "archived-logs/" prefix.
 
 import sys
 import logging
-import boto3
 import argparse
 
 import yaml
@@ -29,7 +28,9 @@ try:
 except ImportError:
     from yaml import SafeLoader
 
-from manheim_c7n_tools.utils import set_log_info, set_log_debug
+from manheim_c7n_tools.utils import (
+    set_log_info, set_log_debug, aws_resource
+)
 from manheim_c7n_tools.version import VERSION
 
 logger = logging.getLogger(__name__)
@@ -40,7 +41,7 @@ class S3Archiver(object):
     def __init__(self, region_name, bucket_name, conf_file, dryrun=False):
         logger.info('Connecting to S3 in %s for bucket %s (config file: %s)',
                     region_name, bucket_name, conf_file)
-        self._s3 = boto3.resource('s3', region_name=region_name)
+        self._s3 = aws_resource('s3', region_name)
         self._region_name = region_name
         self._bucket_name = bucket_name
         self._bucket = self._s3.Bucket(bucket_name)
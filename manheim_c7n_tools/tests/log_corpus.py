@@ -0,0 +1,94 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Corpus of Lambda log messages and the log line classification ``errorscan``
+did before :py:class:`~.LogLineClassifier`, shared by
+``test_log_classifier`` and ``benchmarks/bench_log_classifier.py``.
+"""
+
+import os
+import re
+import json
+
+#: Corpus of Lambda log messages, one JSON string per line
+CORPUS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fixtures',
+    'lambda_log_lines.jsonl'
+)
+
+#: The regexes used by ``errorscan`` before :py:class:`~.LogLineClassifier`
+LEGACY_REQ_ID_RE = re.compile(
+    r'^(START|END|REPORT|\S+\s\S+)\s'
+    r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}).*'
+)
+LEGACY_NO_OWNER_EMAIL_LOOKUP_WARNING = re.compile(
+    r'.*(ERROR|WARNING).*unable to lookup owner email.*'
+    'Please configure LDAP or org_domain'
+)
+LEGACY_ALL_ERROR_LOG_RE = re.compile(r'.*(ERROR|WARNING).*')
+
+#: The regex and filter pattern terms ``errorscan`` uses now
+ALL_ERROR_LOG_RE = re.compile(r'.*?(ERROR|WARNING)')
+ALL_ERROR_LOG_TERMS = ['ERROR', 'WARNING']
+
+
+def load_corpus(path=CORPUS):
+    """
+    Return the log messages of a corpus file.
+
+    :param path: path to a file of one JSON string per line
+    :type path: str
+    :return: list of log messages
+    :rtype: list
+    """
+    with open(path, 'r') as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def failed_request_ids(messages, every=5):
+    """
+    Return every ``every``-th distinct request ID in ``messages``, as a
+    stand-in for the request IDs from the dead letter queue.
+    """
+    ids = []
+    for msg in messages:
+        m = LEGACY_REQ_ID_RE.match(msg)
+        if m is not None and m.group(2) not in ids:
+            ids.append(m.group(2))
+    return ids[::every]
+
+
+def legacy_classify(message, request_ids, always_match_re=None,
+                    never_match_re=None):
+    """
+    Classify a log message the way ``errorscan`` did before
+    :py:class:`~.LogLineClassifier`, with the same return value as
+    :py:meth:`~.LogLineClassifier.classify`.
+    """
+    m = LEGACY_REQ_ID_RE.match(message)
+    if always_match_re is None:
+        always_m = None
+    else:
+        if re.match(LEGACY_NO_OWNER_EMAIL_LOOKUP_WARNING, message):
+            return None, False
+        always_m = always_match_re.match(message)
+    req_id = None
+    if m is not None and m.group(2) in request_ids:
+        req_id = m.group(2)
+    if always_m is None:
+        return req_id, False
+    if never_match_re is not None and never_match_re.match(message):
+        return req_id, False
+    return req_id, True
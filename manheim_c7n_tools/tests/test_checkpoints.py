@@ -0,0 +1,130 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from io import BytesIO
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.checkpoints import LogCheckpoints
+
+from mock import patch, call
+
+pbm = 'manheim_c7n_tools.checkpoints'
+
+
+class TestLogCheckpoints(object):
+
+    def test_local_roundtrip(self, tmpdir):
+        path = str(tmpdir.join('cp.json'))
+        cls = LogCheckpoints(path)
+        assert cls.get('1234', 'r1', '/g/a') is None
+        cls.record('1234', 'r1', '/g/a', 1000000, {
+            'e1': 1000000 - 300001,
+            'e2': 1000000 - 300000,
+            'e3': 999999
+        })
+        cls.record(5678, 'r2', '/g/b', 2000000, {})
+        cls.save()
+        cls = LogCheckpoints(path)
+        assert cls.get('1234', 'r1', '/g/a') == (
+            700000, {'e2': 700000, 'e3': 999999}
+        )
+        assert cls.get('5678', 'r2', '/g/b') == (1700000, {})
+        assert cls.get('1234', 'r2', '/g/a') is None
+        with open(path, 'r') as fh:
+            data = json.loads(fh.read())
+        assert data['version'] == 1
+        assert data['checkpoints'] == {
+            '1234': {
+                'r1': {
+                    '/g/a': {
+                        'end': 1000000,
+                        'events': {'e2': 700000, 'e3': 999999}
+                    }
+                }
+            },
+            '5678': {'r2': {'/g/b': {'end': 2000000, 'events': {}}}}
+        }
+
+    def test_get_copy(self, tmpdir):
+        cls = LogCheckpoints(str(tmpdir.join('cp.json')))
+        cls.record('1234', 'r1', '/g/a', 1000000, {'e1': 999999})
+        cls.get('1234', 'r1', '/g/a')[1]['e2'] = 1
+        assert cls.get('1234', 'r1', '/g/a') == (700000, {'e1': 999999})
+
+    def test_local_wrong_version(self, tmpdir):
+        path = tmpdir.join('cp.json')
+        path.write(json.dumps({
+            'version': 99,
+            'checkpoints': {'1234': {'r1': {'/g/a': {'end': 1, 'events': {}}}}}
+        }))
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = LogCheckpoints(str(path))
+        assert cls.get('1234', 'r1', '/g/a') is None
+        assert mock_logger.mock_calls == [
+            call.warning(
+                'Ignoring errorscan checkpoints %s with unknown version %s',
+                str(path), 99
+            )
+        ]
+
+    def test_s3(self):
+        body = json.dumps({
+            'version': 1,
+            'checkpoints': {
+                '1234': {'r1': {'/g/a': {'end': 400000, 'events': {}}}}
+            }
+        }).encode('utf-8')
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.return_value = {
+                'Body': BytesIO(body)
+            }
+            cls = LogCheckpoints('s3://bkt/path/to/cp.json', region_name='r2')
+            assert cls.get('1234', 'r1', '/g/a') == (100000, {})
+            cls.save()
+        assert mock_client.mock_calls[0] == call('s3', 'r2')
+        s3 = mock_client.return_value
+        assert s3.get_object.mock_calls == [
+            call(Bucket='bkt', Key='path/to/cp.json')
+        ]
+        assert len(s3.put_object.mock_calls) == 1
+        kwargs = s3.put_object.mock_calls[0][2]
+        assert kwargs['Bucket'] == 'bkt'
+        assert kwargs['Key'] == 'path/to/cp.json'
+        assert kwargs['ContentType'] == 'application/json'
+        assert json.loads(
+            kwargs['Body'].decode('utf-8')
+        )['checkpoints'] == {
+            '1234': {'r1': {'/g/a': {'end': 400000, 'events': {}}}}
+        }
+
+    def test_s3_missing(self):
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.side_effect = ClientError(
+                {'Error': {'Code': 'NoSuchKey', 'Message': 'nope'}},
+                'GetObject'
+            )
+            cls = LogCheckpoints('s3://bkt/cp.json')
+        assert cls.get('1234', 'r1', '/g/a') is None
+
+    def test_s3_error(self):
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.side_effect = ClientError(
+                {'Error': {'Code': 'AccessDenied', 'Message': 'nope'}},
+                'GetObject'
+            )
+            with pytest.raises(ClientError):
+                LogCheckpoints('s3://bkt/cp.json')
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
+
 from mock import patch, call, Mock, mock_open
 import pytest
 import yaml
@@ -36,7 +38,9 @@ class TestManheimConfig(object):
         assert cls._config == {
             'foo': 'bar', 'baz': 2, 'regions': ['us-east-1'],
             'account_id': '1234', 'cleanup_notify': ['foo@bar.com'],
-            'function_prefix': 'custodian-'
+            'function_prefix': 'custodian-',
+            'custodian_cache_dir': '/tmp/.cache', 'custodian_cache_ttl': 0,
+            'docs_cache_dir': None
         }
         assert cls.config_path == 'manheim-c7n-tools.yml'
         assert mock_logger.mock_calls == [
@@ -60,12 +64,14 @@ class TestManheimConfig(object):
                 cls = ManheimConfig(
                     foo='bar', baz=2, regions=['us-east-2'],
                     config_path='manheim-c7n-tools.yml', account_id='1234',
-                    cleanup_notify=['foo@bar.com'], function_prefix='foo-'
+                    cleanup_notify=['foo@bar.com'], function_prefix='foo-',
+                    custodian_cache_dir='/cache', custodian_cache_ttl=60
                 )
         assert cls._config == {
             'foo': 'bar', 'baz': 2, 'regions': ['us-east-2'],
             'account_id': '1234', 'cleanup_notify': ['foo@bar.com'],
-            'function_prefix': 'foo-'
+            'function_prefix': 'foo-', 'custodian_cache_dir': '/cache',
+            'custodian_cache_ttl': 60, 'docs_cache_dir': None
         }
         assert cls.config_path == 'manheim-c7n-tools.yml'
         assert mock_logger.mock_calls == [
@@ -76,7 +82,8 @@ class TestManheimConfig(object):
                 {
                     'foo': 'bar', 'baz': 2, 'regions': ['us-east-2'],
                     'account_id': '1234', 'cleanup_notify': ['foo@bar.com'],
-                    'function_prefix': 'foo-'
+                    'function_prefix': 'foo-', 'custodian_cache_dir': '/cache',
+                    'custodian_cache_ttl': 60
                 },
                 MANHEIM_CONFIG_SCHEMA
             )
@@ -96,6 +103,18 @@ class TestManheimConfig(object):
         with pytest.raises(AttributeError):
             cls.missingAttr
 
+    def test_pickle(self):
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.jsonschema.validate' % pbm, autospec=True):
+                cls = ManheimConfig(
+                    foo='bar', regions=['us-east-1'], config_path='foo',
+                    account_id='012345'
+                )
+        res = pickle.loads(pickle.dumps(cls))
+        assert res.foo == 'bar'
+        assert res.config_path == 'foo'
+        assert res.account_id == '012345'
+
     def test_from_file(self):
         m_conf = Mock()
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
@@ -264,7 +283,9 @@ class TestManheimConfig(object):
             'account_id': '012345',
             'regions': ['us-east-1', 'us-east-2'],
             'cleanup_notify': [],
-            'function_prefix': 'custodian-'
+            'function_prefix': 'custodian-',
+            'custodian_cache_dir': '/tmp/.cache', 'custodian_cache_ttl': 0,
+            'docs_cache_dir': None
         }
         with patch('%s.jsonschema.validate' % pbm, autospec=True):
             with patch.dict(
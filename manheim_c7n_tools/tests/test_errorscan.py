@@ -0,0 +1,663 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from io import StringIO
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.errorscan import (
+    LambdaHealthChecker, LambdaMetricsCollector, RequestIdIndex,
+    CustodianErrorReporter, scan_regions
+)
+from manheim_c7n_tools.checkpoints import LogCheckpoints
+
+from mock import patch, call, Mock, DEFAULT
+
+pbm = 'manheim_c7n_tools.errorscan'
+
+RID1 = '0123abcd-0000-4000-8000-000000000001'
+RID2 = '0123abcd-0000-4000-8000-000000000002'
+RID9 = '0123abcd-0000-4000-8000-000000000009'
+
+
+def event(eid, ts, message, stream='s1', group=None):
+    e = {
+        'eventId': eid,
+        'timestamp': ts,
+        'message': message,
+        'logStreamName': stream
+    }
+    if group is not None:
+        e['logGroupName'] = group
+    return e
+
+
+def logs_client(pages):
+    """
+    Return a Mock "logs" client whose ``filter_log_events`` paginator returns
+    the events in ``pages`` (a dict of filter pattern to list of events).
+    """
+    client = Mock()
+    client.get_paginator.return_value.paginate.side_effect = \
+        lambda **kwargs: [{'events': list(pages[kwargs.get('filterPattern')])}]
+    return client
+
+
+class TestLambdaHealthChecker(object):
+
+    def test_filter_patterns(self):
+        with patch(
+            '%s.LambdaHealthChecker.MAX_FILTER_PATTERN_LENGTH' % pbm, 20
+        ):
+            res = LambdaHealthChecker.filter_patterns(
+                ['ccc', 'aaa', 'b"b', 'aaa', 'dddddd']
+            )
+        assert res == ['?"aaa" ?"b\\"b"', '?"ccc" ?"dddddd"']
+        assert LambdaHealthChecker.filter_patterns([]) == []
+
+    def test_merge_events(self):
+        res = LambdaHealthChecker._merge_events([
+            [event('e1', 1, 'a'), event('e3', 3, 'c'), event('e4', 4, 'd')],
+            [event('e2', 2, 'b'), event('e3', 3, 'c')],
+            []
+        ])
+        assert [e['eventId'] for e in res] == ['e1', 'e2', 'e3', 'e4']
+
+    def test_get_cloudwatch_logs_patterns(self):
+        logs = logs_client({
+            'p1': [event('e3', 3, 'c'), event('e1', 1, 'a')],
+            'p2': [event('e2', 2, 'b'), event('e3', 3, 'c')],
+            'p3': []
+        })
+        cls = LambdaHealthChecker('fname', 'r1', logs=logs, cw=Mock())
+        with patch(
+            '%s.ThreadPoolExecutor' % pbm, wraps=ThreadPoolExecutor
+        ) as m_tpe:
+            res = cls.get_cloudwatch_logs(
+                interval=10, filter_patterns=['p1', 'p2', 'p3'],
+                end_time=50000
+            )
+        assert m_tpe.mock_calls[0] == call(max_workers=3)
+        assert [e['eventId'] for e in res] == ['e1', 'e2', 'e3']
+        assert sorted(
+            logs.get_paginator.return_value.paginate.mock_calls,
+            key=lambda c: c[2]['filterPattern']
+        ) == [
+            call(
+                logGroupName='/aws/lambda/fname', startTime=40000,
+                endTime=50000, filterPattern=x
+            ) for x in ['p1', 'p2', 'p3']
+        ]
+
+    def test_get_cloudwatch_logs_no_group(self):
+        logs = Mock()
+        logs.get_paginator.return_value.paginate.side_effect = ClientError(
+            {'Error': {'Code': 'ResourceNotFoundException'}},
+            'FilterLogEvents'
+        )
+        cls = LambdaHealthChecker('fname', 'r1', logs=logs, cw=Mock())
+        with patch('%s.logger' % pbm) as mock_logger:
+            assert cls.get_cloudwatch_logs(group_name='/g/a') == []
+        assert mock_logger.warning.mock_calls == [
+            call('CloudWatch Log group does not exist: %s', '/g/a')
+        ]
+
+    def test_get_filtered_logs(self):
+        e1 = event('e1', 1000, 'START RequestId: %s Version: 1' % RID1)
+        e2 = event('e2', 2000, 'REPORT RequestId: %s Duration' % RID2)
+        e3 = event('e3', 3000, 'foo %s' % RID2)
+        logs = logs_client({'?"%s" ?"%s"' % (RID1, RID2): [e3, e2, e1]})
+        cls = LambdaHealthChecker('fname', 'r1', logs=logs, cw=Mock())
+        res = cls.get_filtered_logs([RID2, RID1], end_time=90000000)
+        assert res == {RID1: [e1], RID2: [e2]}
+        assert e1['logGroupName'] == '/aws/lambda/fname'
+        assert LambdaHealthChecker(
+            'fname', 'r1', logs=logs, cw=Mock()
+        ).get_filtered_logs([]) == {}
+
+    def test_get_filtered_logs_since(self):
+        e1 = event('e1', 1000, 'START RequestId: %s' % RID1)
+        e2 = event('e2', 5000, '[ERROR]\tts\t%s\tboom' % RID1)
+        e3 = event('e3', 6000, '[ERROR]\tts\t%s\tseen' % RID9)
+        e4 = event('e4', 7000, '[WARNING]\tts\t%s\tnew' % RID9)
+        logs = logs_client({
+            '?"%s"' % RID1: [e1, e2],
+            '?"ERROR" ?"WARNING"': [e2, e3, e4]
+        })
+        cls = LambdaHealthChecker('fname', 'r1', logs=logs, cw=Mock())
+        res = cls.get_filtered_logs(
+            [RID1], interval=20,
+            always_match_re=CustodianErrorReporter.ALL_ERROR_LOG_RE,
+            always_match_terms=CustodianErrorReporter.ALL_ERROR_LOG_TERMS,
+            since=4000, seen_event_ids={'e3'}, end_time=20000
+        )
+        assert res == {RID1: [e1, e2], 'always_match': [e2, e4]}
+        assert logs.get_paginator.return_value.paginate.mock_calls == [
+            call(
+                logGroupName='/aws/lambda/fname', startTime=0,
+                endTime=20000, filterPattern='?"%s"' % RID1
+            ),
+            call(
+                logGroupName='/aws/lambda/fname', startTime=4000,
+                endTime=20000, filterPattern='?"ERROR" ?"WARNING"'
+            )
+        ]
+
+    def test_get_cloudwatch_metric_sums(self):
+        # Lambda publishes each metric with just the FunctionName dimension,
+        # and again with FunctionName and Resource; only the former count.
+        # Both the GetMetricData and the ListMetrics / GetMetricStatistics
+        # APIs are mocked, so that this also checks the metrics are not
+        # dropped, as they were by the comparison of the dimension names
+        # with a list.
+        def metric(name, total, dims):
+            m = Mock(metric_name=name, dimensions=dims)
+            m.get_statistics.return_value = {'Datapoints': [{'Sum': total}]}
+            return m
+
+        def se_paginate(MetricDataQueries=None, StartTime=None, EndTime=None):
+            return [{'MetricDataResults': [
+                {
+                    'Id': q['Id'],
+                    'Values': [totals[q['MetricStat']['Metric']['MetricName']]]
+                } for q in MetricDataQueries
+                if q['MetricStat']['Metric']['Dimensions'] == fn_dims
+            ]}]
+
+        fn_dims = [{'Name': 'FunctionName', 'Value': 'fname'}]
+        res_dims = fn_dims + [{'Name': 'Resource', 'Value': 'fname:1'}]
+        totals = {'Errors': 3.0, 'Throttles': 0.0, 'Invocations': 4.0}
+        cw = Mock()
+        cw.metrics.filter.return_value = [
+            metric(k, v, fn_dims) for k, v in totals.items()
+        ] + [metric(k, 100.0, res_dims) for k in totals]
+        cw.meta.client.get_paginator.return_value.paginate.side_effect = \
+            se_paginate
+        cls = LambdaHealthChecker('fname', 'r1', logs=Mock(), cw=cw)
+        assert cls.get_cloudwatch_metric_sums() == totals
+
+
+class TestLambdaMetricsCollector(object):
+
+    def test_get_metric_sums(self):
+        client = Mock()
+
+        def se_paginate(MetricDataQueries=None, StartTime=None, EndTime=None):
+            assert EndTime - StartTime == timedelta(seconds=3600)
+            # split each chunk's results over two pages
+            results = [
+                {'Id': q['Id'], 'Values': [float(q['Id'][1:]), 0.5]}
+                for q in MetricDataQueries
+            ]
+            return [
+                {'MetricDataResults': results[:1]},
+                {'MetricDataResults': results[1:]}
+            ]
+
+        client.get_paginator.return_value.paginate.side_effect = se_paginate
+        with patch('%s.LambdaMetricsCollector.MAX_QUERIES' % pbm, 4):
+            res = LambdaMetricsCollector(client).get_metric_sums(
+                ['f1', 'f2'], interval=3600, period=60
+            )
+        assert res == {
+            'f1': {'Errors': 0.5, 'Throttles': 1.5, 'Invocations': 2.5},
+            'f2': {'Errors': 3.5, 'Throttles': 4.5, 'Invocations': 5.5}
+        }
+        calls = client.get_paginator.return_value.paginate.mock_calls
+        assert [len(c[2]['MetricDataQueries']) for c in calls] == [4, 2]
+        assert calls[1][2]['MetricDataQueries'][0] == {
+            'Id': 'm4',
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/Lambda',
+                    'MetricName': 'Throttles',
+                    'Dimensions': [{'Name': 'FunctionName', 'Value': 'f2'}]
+                },
+                'Period': 60,
+                'Stat': 'Sum'
+            },
+            'ReturnData': True
+        }
+        assert client.get_paginator.mock_calls[0] == call('get_metric_data')
+
+
+class TestRequestIdIndex(object):
+
+    def test_index(self):
+        cls = RequestIdIndex([RID2, RID1, RID9])
+        assert len(cls) == 3
+        assert RID1 in cls
+        it = iter(cls)
+        cls.discard(x for x in [RID1, RID9, 'foo'])
+        # iterating returns a snapshot
+        assert list(it) == [RID1, RID2, RID9]
+        assert list(cls) == [RID2]
+        assert RID1 not in cls
+        assert len(cls) == 1
+        assert len(RequestIdIndex()) == 0
+
+    def test_concurrent_discard(self):
+        ids = ['0123abcd-0000-4000-8000-%012d' % x for x in range(1000)]
+        cls = RequestIdIndex(ids)
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            list(ex.map(
+                lambda i: cls.discard(ids[i:i + 10]), range(0, 1000, 10)
+            ))
+        assert len(cls) == 0
+
+
+class ErrorReporterTester(object):
+    """Base class for tests of a CustodianErrorReporter with Mock clients."""
+
+    def setup(self):
+        self.clients = {
+            'logs': Mock(), 'lambda': Mock(), 'sqs': Mock(),
+            'cloudwatch': Mock()
+        }
+        self.clients['sqs'].get_queue_url.return_value = {
+            'QueueUrl': 'https://dlq'
+        }
+        self.m_conf = Mock()
+        self.r_conf = self.m_conf.config_for_region.return_value
+        self.r_conf.account_id = '1234'
+        self.r_conf.dead_letter_queue_arn = 'arn:aws:sqs:r1:1234:dlq'
+        self.r_conf.custodian_log_group = '/c7n/logs'
+        self.r_conf.function_prefix = 'cloud-custodian-'
+        self.out = StringIO()
+
+    def reporter(self, **kwargs):
+        with patch.multiple(
+            pbm, aws_client=DEFAULT, aws_resource=DEFAULT
+        ) as mocks:
+            mocks['aws_client'].side_effect = \
+                lambda svc, *args, **kw: self.clients[svc]
+            mocks['aws_resource'].side_effect = \
+                lambda svc, *args, **kw: self.clients[svc]
+            return CustodianErrorReporter(
+                self.m_conf, 'r1', output=self.out, **kwargs
+            )
+
+
+class TestCustodianErrorReporter(ErrorReporterTester):
+
+    def test_init(self):
+        cls = self.reporter()
+        assert self.m_conf.config_for_region.mock_calls == [call('r1')]
+        assert cls._dlq_url == 'https://dlq'
+        assert self.clients['sqs'].get_queue_url.mock_calls == [
+            call(QueueName='dlq', QueueOwnerAWSAccountId='1234')
+        ]
+        assert cls._logs is self.clients['logs']
+
+    def test_run_concurrent_in_order(self):
+        names = [
+            'cloud-custodian-a', 'cloud-custodian-b', 'cloud-custodian-c'
+        ]
+        c_done = threading.Event()
+        reported = []
+
+        def se_gfd(fname, req_ids, never_match_re=None):
+            # the first function finishes last
+            if fname == names[0]:
+                assert c_done.wait(5)
+            if fname == names[2]:
+                c_done.set()
+            return {fname: []}, {'fname': fname}
+
+        def se_report(fname, logs, metrics):
+            reported.append((fname, logs, metrics))
+            return fname != names[1]
+
+        cls = self.reporter()
+        with patch.multiple(
+            cls, _get_sqs_dlq=DEFAULT, _ack_sqs=DEFAULT,
+            _get_function_data=DEFAULT, _report_function=DEFAULT
+        ) as mocks:
+            mocks['_get_function_data'].side_effect = se_gfd
+            mocks['_report_function'].side_effect = se_report
+            with patch.multiple(
+                pbm, LambdaMetricsCollector=DEFAULT,
+                LambdaHealthChecker=DEFAULT
+            ) as m_mod:
+                m_mod[
+                    'LambdaHealthChecker'
+                ].find_matching_func_names.return_value = names
+                with pytest.raises(SystemExit) as exc:
+                    cls.run(never_match_re='nm', jobs=3)
+        assert exc.value.code == 1
+        assert reported == [
+            (x, {x: []}, {'fname': x}) for x in names
+        ]
+        # workers may start in any order
+        assert sorted(
+            mocks['_get_function_data'].mock_calls, key=lambda c: c[1][0]
+        ) == [
+            call(x, cls._unattributed, never_match_re='nm') for x in names
+        ]
+        assert m_mod['LambdaMetricsCollector'].mock_calls == [
+            call(self.clients['cloudwatch'].meta.client),
+            call().get_metric_sums(names, interval=86400, period=86400)
+        ]
+        assert len(mocks['_ack_sqs'].mock_calls) == 1
+        assert 'Some lambda functions had errors' in self.out.getvalue()
+
+    def test_get_function_data(self):
+        cls = self.reporter()
+        cls._metrics = {'cloud-custodian-a': {'Errors': 1}}
+        req_ids = RequestIdIndex([RID1])
+        with patch('%s.LambdaHealthChecker' % pbm, autospec=True) as m_lhc:
+            m_lhc.return_value.get_filtered_logs.return_value = {'a': 1}
+            m_lhc.return_value.get_cloudwatch_metric_sums.return_value = {
+                'Errors': 2
+            }
+            assert cls._get_function_data(
+                'cloud-custodian-a', req_ids, never_match_re='nm'
+            ) == ({'a': 1}, {'Errors': 1})
+            assert cls._get_function_data('custodian-b', req_ids) == (
+                {'a': 1}, {'Errors': 2}
+            )
+        assert m_lhc.mock_calls == [
+            call(
+                'cloud-custodian-a', 'r1', logs=self.clients['logs'],
+                cw=self.clients['cloudwatch']
+            ),
+            call().get_filtered_logs(
+                req_ids, always_match_re=cls.ALL_ERROR_LOG_RE,
+                never_match_re='nm', always_match_terms=['ERROR', 'WARNING']
+            ),
+            call(
+                'custodian-b', 'r1', logs=self.clients['logs'],
+                cw=self.clients['cloudwatch']
+            ),
+            call().get_filtered_logs(req_ids),
+            call().get_cloudwatch_metric_sums()
+        ]
+
+    def test_get_function_data_discards_found(self):
+        e1 = event('e1', 1000, 'START RequestId: %s' % RID1)
+        self.clients['logs'] = logs_client({
+            '?"%s" ?"%s"' % (RID1, RID2): [e1],
+            '?"%s"' % RID2: []
+        })
+        cls = self.reporter()
+        cls._metrics = {'custodian-a': {}, 'custodian-b': {}}
+        req_ids = RequestIdIndex([RID1, RID2])
+        assert cls._get_function_data('custodian-a', req_ids) == (
+            {RID1: [e1]}, {}
+        )
+        assert list(req_ids) == [RID2]
+        # the next function only queries and matches the remaining IDs
+        assert cls._get_function_data('custodian-b', req_ids) == ({}, {})
+        assert [
+            c[2]['filterPattern'] for c in
+            self.clients['logs'].get_paginator.return_value.paginate.mock_calls
+        ] == ['?"%s" ?"%s"' % (RID1, RID2), '?"%s"' % RID2]
+        assert list(req_ids) == [RID2]
+
+    def test_get_sqs_dlq(self):
+        msgs = [
+            {
+                'MessageId': 'm%02d' % x,
+                'ReceiptHandle': 'rh%02d' % x,
+                'MessageAttributes': {
+                    'RequestID': {
+                        'StringValue': '0123abcd-0000-4000-8000-%012d' % (
+                            x % 23
+                        )
+                    }
+                }
+            } for x in range(24)
+        ]
+        msgs.append({'MessageId': 'm24', 'ReceiptHandle': 'rh24'})
+        lock = threading.Lock()
+
+        def se_receive(**kwargs):
+            with lock:
+                batch = msgs[:10]
+                del msgs[:10]
+            return {'Messages': batch}
+
+        sqs = self.clients['sqs']
+        sqs.get_queue_attributes.return_value = {
+            'Attributes': {'ApproximateNumberOfMessages': '25'}
+        }
+        sqs.receive_message.side_effect = se_receive
+        cls = self.reporter()
+        cls._failed_request_ids = {RID1: 'fname'}
+        with patch(
+            '%s.ThreadPoolExecutor' % pbm, wraps=ThreadPoolExecutor
+        ) as m_tpe:
+            cls._get_sqs_dlq()
+        assert m_tpe.mock_calls[0] == call(max_workers=3)
+        # 23 distinct request IDs, one of them already attributed
+        assert len(cls._failed_request_ids) == 23
+        assert cls._failed_request_ids[RID1] == 'fname'
+        assert sorted(cls._sqs_rcpts.keys()) == ['m%02d' % x for x in range(24)]
+        assert len(cls._unattributed) == 22
+        assert RID1 not in cls._unattributed
+        assert '0123abcd-0000-4000-8000-000000000022' in cls._unattributed
+        assert sqs.receive_message.mock_calls[0] == call(
+            QueueUrl='https://dlq', WaitTimeSeconds=0,
+            MaxNumberOfMessages=10,
+            MessageAttributeNames=['RequestID', 'ErrorMessage'],
+            AttributeNames=['SentTimestamp']
+        )
+
+    def test_get_sqs_dlq_no_queue(self):
+        cls = self.reporter()
+        cls._dlq_url = None
+        cls._get_sqs_dlq()
+        assert self.clients['sqs'].receive_message.mock_calls == []
+
+    def test_ack_sqs(self):
+        sqs = self.clients['sqs']
+        sqs.delete_message_batch.side_effect = [
+            {},
+            {'Failed': [{'Id': '1', 'Code': 'c1', 'Message': 'msg1'}]},
+            {'Failed': []}
+        ]
+        cls = self.reporter()
+        cls._sqs_rcpts = {'m%02d' % x: 'rh%02d' % x for x in range(23)}
+        with patch('%s.logger' % pbm) as mock_logger:
+            cls._ack_sqs()
+        calls = sqs.delete_message_batch.mock_calls
+        assert [len(c[2]['Entries']) for c in calls] == [10, 10, 3]
+        assert calls[2] == call(QueueUrl='https://dlq', Entries=[
+            {'Id': '0', 'ReceiptHandle': 'rh20'},
+            {'Id': '1', 'ReceiptHandle': 'rh21'},
+            {'Id': '2', 'ReceiptHandle': 'rh22'}
+        ])
+        assert mock_logger.warning.mock_calls == [
+            call('Failed to delete SQS message %s: %s %s', 'm11', 'c1', 'msg1')
+        ]
+
+    def test_get_incremental_logs(self, tmpdir):
+        checkpoints = LogCheckpoints(str(tmpdir.join('cp.json')))
+        checkpoints.record(
+            '1234', 'r1', '/aws/lambda/cloud-custodian-a', 9000000,
+            {'e0': 8000000, 'e1': 8800000}
+        )
+        cls = self.reporter(checkpoints=checkpoints)
+        cls._end_time = 10000000
+        req_ids = RequestIdIndex([RID1])
+        checker = Mock()
+        checker.get_filtered_logs.return_value = {
+            RID1: [event('e2', 9000000, 'x')],
+            'always_match': [event('e3', 9999000, 'ERROR')]
+        }
+        res = cls._get_incremental_logs(
+            checker, 'cloud-custodian-a', req_ids, never_match_re='nm'
+        )
+        assert res == checker.get_filtered_logs.return_value
+        cls._get_incremental_logs(checker, 'cloud-custodian-b', req_ids)
+        assert checker.get_filtered_logs.mock_calls == [
+            call(
+                req_ids, interval=86400,
+                group_name='/aws/lambda/cloud-custodian-a',
+                always_match_re=cls.ALL_ERROR_LOG_RE, never_match_re='nm',
+                always_match_terms=['ERROR', 'WARNING'], since=8700000,
+                seen_event_ids={'e1'}, end_time=10000000
+            ),
+            call(
+                req_ids, interval=86400,
+                group_name='/aws/lambda/cloud-custodian-b',
+                always_match_re=cls.ALL_ERROR_LOG_RE, never_match_re=None,
+                always_match_terms=['ERROR', 'WARNING'], since=None,
+                seen_event_ids=set(), end_time=10000000
+            )
+        ]
+        assert checkpoints.get(
+            '1234', 'r1', '/aws/lambda/cloud-custodian-a'
+        ) == (9700000, {'e3': 9999000})
+        assert checkpoints.get(
+            '1234', 'r1', '/aws/lambda/cloud-custodian-b'
+        ) == (9700000, {'e3': 9999000})
+
+    def test_get_insights_results(self):
+        e_p1a = event(
+            'p1a', 1, 'START RequestId: %s' % RID1,
+            group='/aws/lambda/cloud-custodian-p1'
+        )
+        e_p1b = event(
+            'p1b', 2, '[ERROR]\tts\t%s\tboom' % RID9,
+            group='/aws/lambda/cloud-custodian-p1'
+        )
+        e_ma = event(
+            'ma', 3, '[ERROR]\tts\t%s\tignored' % RID9,
+            group='/aws/lambda/custodian-mailer'
+        )
+        e_mb = event(
+            'mb', 4, 'REPORT RequestId: %s' % RID2,
+            group='/aws/lambda/custodian-mailer'
+        )
+        e_c1 = event(
+            'c1', 5, 'ERROR in p2', stream='r1/p2', group='/c7n/logs'
+        )
+        e_c2 = event(
+            'c2', 6, 'WARNING other', stream='other', group='/c7n/logs'
+        )
+        names = ['cloud-custodian-p1', 'cloud-custodian-p2', 'custodian-mailer']
+        cls = self.reporter()
+        cls._metrics = {x: {'name': x} for x in names}
+        req_ids = RequestIdIndex([RID1, RID2])
+        with patch('%s.LogsInsightsScanner' % pbm, autospec=True) as m_lis:
+            with patch('%s.time' % pbm) as m_time:
+                m_time.return_value = 100000.5
+                scanner = m_lis.return_value
+                scanner.find_log_groups.return_value = [
+                    '/aws/lambda/cloud-custodian-p1',
+                    '/aws/lambda/custodian-mailer',
+                    '/aws/lambda/custodian-other', '/c7n/logs'
+                ]
+                scanner.search.return_value = {
+                    '/aws/lambda/cloud-custodian-p1': [e_p1a, e_p1b],
+                    '/aws/lambda/custodian-mailer': [e_ma, e_mb],
+                    '/c7n/logs': [e_c1, e_c2]
+                }
+                res = cls._get_insights_results(names, req_ids)
+        assert res == [
+            (
+                'cloud-custodian-p1',
+                {RID1: [e_p1a], 'always_match': [e_p1b]},
+                {'name': 'cloud-custodian-p1'}
+            ),
+            (
+                'cloud-custodian-p2', {'always_match': [e_c1]},
+                {'name': 'cloud-custodian-p2'}
+            ),
+            ('custodian-mailer', {RID2: [e_mb]}, {'name': 'custodian-mailer'}),
+            (
+                '/c7n/logs', {'always_match': [e_c2]},
+                {'Errors': 0.0, 'Throttles': 0.0, 'Invocations': 0.0}
+            )
+        ]
+        assert len(req_ids) == 0
+        assert m_lis.mock_calls[0] == call(self.clients['logs'])
+        assert scanner.find_log_groups.mock_calls == [call([
+            '/aws/lambda/cloud-custodian-', '/aws/lambda/custodian-',
+            '/c7n/logs'
+        ])]
+        assert scanner.search.mock_calls == [call(
+            [
+                '/aws/lambda/cloud-custodian-p1',
+                '/aws/lambda/custodian-mailer', '/c7n/logs'
+            ],
+            [RID1, RID2, 'ERROR', 'WARNING'], 100000 - 86400, 100000
+        )]
+
+    def test_report_function(self):
+        cls = self.reporter()
+        cls._failed_request_ids = {RID1: None, RID2: None}
+        metrics = {'Invocations': 4, 'Errors': 3, 'Throttles': 0}
+        assert cls._report_function(
+            'fname', {}, {'Invocations': 0, 'Errors': 0, 'Throttles': 0}
+        ) is True
+        assert cls._report_function('fname', {
+            RID1: [event('e1', 1, 'foo\n\tbar', group='/g/a')],
+            'always_match': [event('e2', 2, 'ERROR baz', group='/g/a')]
+        }, metrics) is False
+        assert cls._failed_request_ids == {RID1: 'fname', RID2: None}
+        out = self.out.getvalue()
+        assert 'fname: OK' in out
+        assert 'Lambda Function Errors: 75.0% (3 of 4 invocations)' in out
+        assert 'RequestID=%s logGroupName=/g/a logStreamName=s1' % RID1 in out
+        assert '\t\tfoo\n\t\t bar\n' in out
+        assert '\t\tERROR baz\n' in out
+
+
+class TestScanRegions(object):
+
+    def test_scan_regions(self, capsys):
+        checkpoints = Mock()
+
+        def se_cer(config, region_name, checkpoints=None, output=None):
+            def se_run(**kwargs):
+                assert kwargs == {'jobs': 2}
+                output.write('report %s\n' % region_name)
+                if region_name == 'r2':
+                    raise SystemExit(1)
+                if region_name == 'r3':
+                    raise RuntimeError('foo')
+                if region_name == 'r4':
+                    raise SystemExit(0)
+
+            m = Mock()
+            m.run.side_effect = se_run
+            return m
+
+        with patch('%s.CustodianErrorReporter' % pbm) as m_cer:
+            m_cer.side_effect = se_cer
+            with patch('%s.logger' % pbm):
+                res = scan_regions(
+                    'conf', ['r1', 'r2', 'r3', 'r4'],
+                    checkpoints=checkpoints, jobs=2
+                )
+        assert res == ['r2', 'r3']
+        assert sorted(c[1][1] for c in m_cer.mock_calls) == [
+            'r1', 'r2', 'r3', 'r4'
+        ]
+        assert all(
+            c[1][0] == 'conf' and c[2]['checkpoints'] is checkpoints
+            for c in m_cer.mock_calls
+        )
+        out = capsys.readouterr().out
+        assert out.index('===== r1 =====') < out.index('report r1') < \
+            out.index('===== r2 =====') < out.index('report r2') < \
+            out.index('===== r3 =====') < out.index('report r3') < \
+            out.index('errorscan failed in r3') < \
+            out.index('===== r4 =====') < out.index('report r4')
@@ -0,0 +1,113 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+from io import StringIO
+
+import pytest
+
+from manheim_c7n_tools.events import EventSink
+
+from mock import patch
+
+pbm = 'manheim_c7n_tools.events'
+
+
+def _events(stream):
+    return [json.loads(x) for x in stream.getvalue().splitlines()]
+
+
+class TestEventSink(object):
+
+    def test_emit_disabled(self):
+        cls = EventSink()
+        assert cls.enabled is False
+        cls.emit('foo', bar=1)
+        cls.close()
+
+    def test_emit(self):
+        stream = StringIO()
+        cls = EventSink(stream)
+        cls.context['account'] = 'acct'
+        assert cls.enabled is True
+        with patch('%s.time.time' % pbm) as m_time:
+            m_time.return_value = 1234.5
+            cls.emit('foo', bar=1, account='other')
+            cls.emit('baz')
+        assert _events(stream) == [
+            {'event': 'foo', 'timestamp': 1234.5, 'bar': 1,
+             'account': 'other'},
+            {'event': 'baz', 'timestamp': 1234.5, 'account': 'acct'}
+        ]
+
+    def test_span(self):
+        stream = StringIO()
+        cls = EventSink(stream)
+        with patch('%s.time.perf_counter' % pbm) as m_perf:
+            m_perf.side_effect = [1.0, 3.5]
+            with cls.span('step', step='s1'):
+                pass
+        res = _events(stream)
+        assert [(e['event'], e['step']) for e in res] == [
+            ('step_start', 's1'), ('step_end', 's1')
+        ]
+        assert res[1]['success'] is True
+        assert res[1]['duration'] == 2.5
+        assert 'error' not in res[1]
+
+    def test_span_exception(self):
+        stream = StringIO()
+        cls = EventSink(stream)
+        with pytest.raises(RuntimeError):
+            with cls.span('step', step='s1'):
+                raise RuntimeError('foo')
+        res = _events(stream)
+        assert [e['event'] for e in res] == ['step_start', 'step_end']
+        assert res[1]['success'] is False
+        assert res[1]['error'] == 'RuntimeError: foo'
+
+    def test_span_exception_emit_error(self):
+        stream = StringIO()
+        cls = EventSink(stream)
+        with pytest.raises(SystemExit):
+            with cls.span('region', emit_error=True, region='r1'):
+                raise SystemExit(2)
+        res = _events(stream)
+        assert [(e['event'], e['region']) for e in res] == [
+            ('region_start', 'r1'), ('error', 'r1'), ('region_end', 'r1')
+        ]
+        assert res[1]['error'] == 'SystemExit: 2'
+
+    def test_from_path(self, tmpdir):
+        path = str(tmpdir.join('events.jsonl'))
+        cls = EventSink.from_path(path)
+        cls.emit('foo')
+        cls.close()
+        assert cls.enabled is False
+        with open(path, 'r') as fh:
+            assert json.loads(fh.read())['event'] == 'foo'
+
+    def test_from_fd(self):
+        r, w = os.pipe()
+        try:
+            cls = EventSink.from_fd(w)
+            cls.emit('foo')
+            cls.close()
+            # the descriptor itself must still be open
+            os.fstat(w)
+        finally:
+            os.close(w)
+        with os.fdopen(r, 'r') as fh:
+            assert json.loads(fh.read())['event'] == 'foo'
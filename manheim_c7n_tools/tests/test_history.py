@@ -0,0 +1,93 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from manheim_c7n_tools.history import (
+    RunHistory, lpt_order, predict_makespan
+)
+from manheim_c7n_tools.run_metrics import UnitMetrics
+
+from mock import patch, call
+
+pbm = 'manheim_c7n_tools.history'
+
+
+class TestRunHistory(object):
+
+    def test_no_file(self, tmpdir):
+        cls = RunHistory(str(tmpdir.join('hist.json')))
+        assert cls.expected('a', 's', 'r') is None
+
+    def test_record_save_load(self, tmpdir):
+        path = str(tmpdir.join('hist.json'))
+        cls = RunHistory(path, max_samples=2)
+        cls.record('a', [
+            UnitMetrics('s1', 'r1', 1.0, 0, 0),
+            UnitMetrics('s1', 'r2', 10.0, 0, 0, success=False)
+        ])
+        cls.record('a', [UnitMetrics('s1', 'r1', 2.0, 0, 0)])
+        cls.record('a', [UnitMetrics('s1', 'r1', 4.0, 0, 0)])
+        assert cls.expected('a', 's1', 'r1') == 3.0
+        assert cls.expected('a', 's1', 'r2') is None
+        assert cls.expected('b', 's1', 'r1') is None
+        cls.save()
+        assert tmpdir.listdir() == [tmpdir.join('hist.json')]
+        with open(path, 'r') as fh:
+            assert json.loads(fh.read()) == {
+                'version': 1,
+                'durations': {'a': {'s1': {'r1': [2.0, 4.0]}}}
+            }
+        assert RunHistory(path).expected('a', 's1', 'r1') == 3.0
+
+    def test_load_invalid(self, tmpdir):
+        path = tmpdir.join('hist.json')
+        path.write('not json')
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = RunHistory(str(path))
+        assert cls.expected('a', 's1', 'r1') is None
+        assert mock_logger.mock_calls == [
+            call.warning(
+                'Ignoring unparseable run history file: %s', str(path)
+            )
+        ]
+
+    def test_load_wrong_version(self, tmpdir):
+        path = tmpdir.join('hist.json')
+        path.write(json.dumps({
+            'version': 99, 'durations': {'a': {'s1': {'r1': [1.0]}}}
+        }))
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = RunHistory(str(path))
+        assert cls.expected('a', 's1', 'r1') is None
+        assert mock_logger.mock_calls == [
+            call.warning(
+                'Ignoring run history file %s with unknown version %s',
+                str(path), 99
+            )
+        ]
+
+
+class TestScheduling(object):
+
+    def test_lpt_order(self):
+        assert lpt_order(
+            ['a', 'b', 'c', 'd', 'e'], [1.0, None, 5.0, 1.0, None]
+        ) == ['b', 'e', 'c', 'a', 'd']
+
+    def test_predict_makespan(self):
+        assert predict_makespan([5.0, 3.0, 2.0, 2.0], 2) == 7.0
+        assert predict_makespan([5.0, 3.0, 2.0, 2.0], 1) == 12.0
+        assert predict_makespan([5.0, 3.0], 10) == 5.0
+        assert predict_makespan([], 4) == 0.0
@@ -0,0 +1,107 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+from manheim_c7n_tools.log_classifier import LogLineClassifier
+from manheim_c7n_tools.tests.log_corpus import (
+    load_corpus, failed_request_ids, legacy_classify,
+    LEGACY_ALL_ERROR_LOG_RE, ALL_ERROR_LOG_RE, ALL_ERROR_LOG_TERMS
+)
+
+RID1 = '0123abcd-0000-4000-8000-000000000001'
+RID2 = '0123abcd-0000-4000-8000-000000000002'
+
+
+class TestLogLineClassifier(object):
+
+    def test_request_ids(self):
+        cls = LogLineClassifier([RID1])
+        assert cls.classify('START RequestId: %s Version: 1' % RID1) == (
+            RID1, False
+        )
+        assert cls.classify('REPORT RequestId: %s\tDuration' % RID1) == (
+            RID1, False
+        )
+        assert cls.classify('[ERROR]\t2020-01-01T00:00:00Z\t%s\tfoo' % RID1) \
+            == (RID1, False)
+        assert cls.classify('START RequestId: %s' % RID2) == (None, False)
+        assert cls.classify('foo bar baz %s' % RID1) == (None, False)
+
+    def test_no_request_ids(self):
+        cls = LogLineClassifier(set())
+        assert cls.classify('START RequestId: %s' % RID1) == (None, False)
+
+    def test_always_match(self):
+        cls = LogLineClassifier(
+            [RID1], always_match_re=ALL_ERROR_LOG_RE,
+            never_match_re=re.compile(r'.*ignore me'),
+            always_match_terms=ALL_ERROR_LOG_TERMS
+        )
+        assert cls.classify('[ERROR]\tts\t%s\tfoo' % RID1) == (RID1, True)
+        assert cls.classify('[WARNING]\tts\t%s\tfoo' % RID2) == (None, True)
+        assert cls.classify('[INFO]\tts\t%s\tfoo' % RID2) == (None, False)
+        assert cls.classify('ERROR ignore me') == (None, False)
+        assert cls.classify('[ERROR]\tts\t%s\tignore me' % RID1) == (
+            RID1, False
+        )
+        # only the first line is matched
+        assert cls.classify('foo\nERROR') == (None, False)
+
+    def test_terms_prefilter(self):
+        always_re = re.compile(r'.*bar')
+        assert LogLineClassifier(
+            [], always_match_re=always_re
+        ).classify('foo bar') == (None, True)
+        assert LogLineClassifier(
+            [], always_match_re=always_re, always_match_terms=['baz']
+        ).classify('foo bar') == (None, False)
+
+    def test_no_owner_email(self):
+        msg = '[WARNING]\tts\t%s\tc7n_mailer.utils:unable to lookup owner ' \
+              'email for resource i-1. Please configure LDAP or ' \
+              'org_domain' % RID1
+        assert LogLineClassifier([RID1]).classify(msg) == (RID1, False)
+        assert LogLineClassifier(
+            [RID1], always_match_re=ALL_ERROR_LOG_RE
+        ).classify(msg) == (None, False)
+        assert LogLineClassifier(
+            [RID1], always_match_re=ALL_ERROR_LOG_RE
+        ).classify(
+            'INFO unable to lookup owner email for %s' % RID1
+        ) == (None, False)
+
+    def test_corpus_matches_legacy(self):
+        messages = load_corpus()
+        req_ids = failed_request_ids(messages)
+        assert len(req_ids) > 5
+        never_re = re.compile(r'.*Throttled, retrying')
+        for legacy_re, new_re, terms, never in [
+            (None, None, None, None),
+            (LEGACY_ALL_ERROR_LOG_RE, ALL_ERROR_LOG_RE, None, None),
+            (LEGACY_ALL_ERROR_LOG_RE, ALL_ERROR_LOG_RE, ALL_ERROR_LOG_TERMS,
+             never_re)
+        ]:
+            cls = LogLineClassifier(
+                req_ids, always_match_re=new_re, never_match_re=never,
+                always_match_terms=terms
+            )
+            res = [cls.classify(m) for m in messages]
+            assert res == [
+                legacy_classify(m, req_ids, legacy_re, never)
+                for m in messages
+            ]
+            assert any(r[0] is not None for r in res)
+            if new_re is not None:
+                assert any(r[1] for r in res)
@@ -0,0 +1,289 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.logs_insights import LogsInsightsScanner
+
+from mock import patch
+
+pbm = 'manheim_c7n_tools.logs_insights'
+
+
+def row(ptr, ts, message, group, stream='s1'):
+    return [
+        {'field': '@timestamp', 'value': ts},
+        {'field': '@message', 'value': message},
+        {'field': '@logStream', 'value': stream},
+        {'field': '@log', 'value': '123456789012:%s' % group},
+        {'field': '@ptr', 'value': ptr}
+    ]
+
+
+class FakeLogsClient(object):
+    """
+    Local stand-in for the CloudWatch Logs Insights API: each query returns
+    the rows of its log groups with a message containing any of its terms,
+    after ``polls`` calls to get_query_results. If ``times`` is given, it is
+    the epoch second of each row, and only rows within the query's time range
+    are returned.
+    """
+
+    def __init__(self, rows, polls=1, max_running=None, times=None):
+        self.rows = rows
+        self.polls = polls
+        self.max_running = max_running
+        self.times = times
+        self.queries = {}
+        self.started = []
+        self.peak = 0
+
+    def _running(self):
+        return len([
+            q for q in self.queries.values() if q['polls'] < self.polls
+        ])
+
+    def start_query(self, logGroupNames=None, startTime=None, endTime=None,
+                    queryString=None, limit=None):
+        if (
+            self.max_running is not None and
+            self._running() >= self.max_running
+        ):
+            raise ClientError(
+                {'Error': {'Code': 'LimitExceededException'}}, 'StartQuery'
+            )
+        qid = 'q%d' % len(self.started)
+        self.started.append((logGroupNames, startTime, endTime, queryString))
+        self.queries[qid] = {
+            'groups': logGroupNames, 'query': queryString, 'polls': 0,
+            'start': startTime, 'end': endTime
+        }
+        self.peak = max(self.peak, self._running())
+        return {'queryId': qid}
+
+    def get_query_results(self, queryId=None):
+        q = self.queries[queryId]
+        q['polls'] += 1
+        if q['polls'] < self.polls:
+            return {'status': 'Running', 'results': []}
+        terms = [
+            x.split('"')[1] for x in q['query'].split(' or ')
+        ]
+        return {
+            'status': 'Complete',
+            'results': [
+                r for i, r in enumerate(self.rows)
+                if r[3]['value'].split(':')[1] in q['groups'] and
+                any(t in r[1]['value'] for t in terms) and (
+                    self.times is None or
+                    q['start'] <= self.times[i] <= q['end']
+                )
+            ]
+        }
+
+
+class TestLogsInsightsScanner(object):
+
+    def setup(self):
+        self.sleeps = []
+
+    def scanner(self, client):
+        return LogsInsightsScanner(
+            client, poll_interval=1.5, sleep=self.sleeps.append
+        )
+
+    def test_query_strings(self):
+        assert LogsInsightsScanner.query_strings([]) == []
+        assert LogsInsightsScanner.query_strings(['b"', 'a', 'a']) == [
+            'fields @timestamp, @message, @logStream, @log | filter '
+            '@message like "a" or @message like "b\\""'
+        ]
+
+    def test_query_strings_split(self):
+        terms = ['%04d' % x for x in range(10)]
+        prefix = len(LogsInsightsScanner.QUERY_PREFIX)
+        with patch(
+            '%s.LogsInsightsScanner.MAX_QUERY_LENGTH' % pbm, prefix + 68
+        ):
+            res = LogsInsightsScanner.query_strings(terms)
+        assert [x[prefix:] for x in res] == [
+            '@message like "0000" or @message like "0001" or '
+            '@message like "0002"',
+            '@message like "0003" or @message like "0004" or '
+            '@message like "0005"',
+            '@message like "0006" or @message like "0007" or '
+            '@message like "0008"',
+            '@message like "0009"'
+        ]
+        for q in res:
+            assert len(q) <= prefix + 68
+
+    def test_search(self):
+        client = FakeLogsClient([
+            row('p1', '2020-01-02 03:04:05.678', 'REPORT req1 foo', '/g/a'),
+            row('p2', '2020-01-02 03:04:01.000', 'ERROR bar', '/g/b', 's2'),
+            row('p3', '2020-01-02 03:04:02.000', 'nothing', '/g/a'),
+            row('p4', '2020-01-02 03:04:03.000', 'ERROR req1', '/g/a'),
+            row('p5', '2020-01-02 03:04:04.000', 'ERROR x', '/g/other')
+        ], polls=2)
+        res = self.scanner(client).search(
+            ['/g/b', '/g/a'], ['req1', 'ERROR'], 100, 200
+        )
+        assert res == {
+            '/g/a': [
+                {
+                    'eventId': 'p4',
+                    'timestamp': 1577934243000,
+                    'message': 'ERROR req1',
+                    'logStreamName': 's1',
+                    'logGroupName': '/g/a'
+                },
+                {
+                    'eventId': 'p1',
+                    'timestamp': 1577934245678,
+                    'message': 'REPORT req1 foo',
+                    'logStreamName': 's1',
+                    'logGroupName': '/g/a'
+                }
+            ],
+            '/g/b': [
+                {
+                    'eventId': 'p2',
+                    'timestamp': 1577934241000,
+                    'message': 'ERROR bar',
+                    'logStreamName': 's2',
+                    'logGroupName': '/g/b'
+                }
+            ]
+        }
+        assert client.started == [(
+            ['/g/a', '/g/b'], 100, 200,
+            'fields @timestamp, @message, @logStream, @log | filter '
+            '@message like "ERROR" or @message like "req1"'
+        )]
+        assert self.sleeps == [1.5, 1.5]
+
+    def test_search_batches(self):
+        groups = ['/g/%02d' % x for x in range(12)]
+        client = FakeLogsClient(
+            [
+                row('p%d' % i, '2020-01-02 03:04:05.000', 'ERROR', g)
+                for i, g in enumerate(groups)
+            ], polls=3, max_running=2
+        )
+        with patch.multiple(
+            '%s.LogsInsightsScanner' % pbm,
+            MAX_LOG_GROUPS=5, MAX_CONCURRENT=3
+        ):
+            res = self.scanner(client).search(groups, ['ERROR'], 1, 2)
+        assert sorted(res.keys()) == groups
+        assert [x[0] for x in client.started] == [
+            groups[0:5], groups[5:10], groups[10:]
+        ]
+        assert client.peak == 2
+
+    def test_search_nothing(self):
+        client = FakeLogsClient([])
+        assert self.scanner(client).search([], ['ERROR'], 1, 2) == {}
+        assert self.scanner(client).search(['/g/a'], [], 1, 2) == {}
+        assert client.started == []
+        assert self.sleeps == []
+
+    def test_search_failed(self):
+        client = FakeLogsClient([])
+        client.get_query_results = lambda queryId=None: {
+            'status': 'Timeout', 'results': []
+        }
+        with pytest.raises(RuntimeError) as exc:
+            self.scanner(client).search(['/g/a'], ['ERROR'], 1, 2)
+        assert str(exc.value) == 'Logs Insights query q0 status: Timeout'
+
+    def test_start_query_error(self):
+        client = FakeLogsClient([])
+
+        def se(**kwargs):
+            raise ClientError(
+                {'Error': {'Code': 'ResourceNotFoundException'}}, 'StartQuery'
+            )
+
+        client.start_query = se
+        with pytest.raises(ClientError):
+            self.scanner(client).search(['/g/a'], ['ERROR'], 1, 2)
+
+    def test_truncated_split_time(self):
+        client = FakeLogsClient(
+            [
+                row('p%d' % x, '2020-01-02 03:04:05.000', 'ERROR', '/g/a')
+                for x in range(5)
+            ], times=[10, 11, 12, 15, 19]
+        )
+        with patch('%s.LogsInsightsScanner.MAX_RESULTS' % pbm, 3):
+            res = self.scanner(client).search(['/g/a'], ['ERROR'], 10, 20)
+        assert sorted(x['eventId'] for x in res['/g/a']) == [
+            'p0', 'p1', 'p2', 'p3', 'p4'
+        ]
+        assert [x[1:3] for x in client.started] == [
+            (10, 20), (10, 15), (16, 20), (10, 12), (13, 15), (10, 11),
+            (12, 12)
+        ]
+
+    def test_truncated_split_groups(self):
+        client = FakeLogsClient(
+            [
+                row('p%d' % x, '2020-01-02 03:04:05.000', 'ERROR', g)
+                for x, g in enumerate(['/g/a', '/g/a', '/g/b', '/g/c'])
+            ], times=[5, 5, 5, 5]
+        )
+        with patch('%s.LogsInsightsScanner.MAX_RESULTS' % pbm, 3):
+            res = self.scanner(client).search(
+                ['/g/a', '/g/b', '/g/c'], ['ERROR'], 5, 5
+            )
+        assert {k: len(v) for k, v in res.items()} == {
+            '/g/a': 2, '/g/b': 1, '/g/c': 1
+        }
+        assert [x[0] for x in client.started] == [
+            ['/g/a', '/g/b', '/g/c'], ['/g/a'], ['/g/b', '/g/c']
+        ]
+
+    def test_truncated_no_split(self):
+        client = FakeLogsClient(
+            [
+                row('p%d' % x, '2020-01-02 03:04:05.000', 'ERROR', '/g/a')
+                for x in range(3)
+            ], times=[5, 5, 5]
+        )
+        with patch('%s.LogsInsightsScanner.MAX_RESULTS' % pbm, 3):
+            with pytest.raises(RuntimeError) as exc:
+                self.scanner(client).search(['/g/a'], ['ERROR'], 1, 10)
+        assert str(exc.value) == 'Logs Insights query q6 returned the ' \
+            'maximum of 3 results for /g/a within one second; unable to ' \
+            'split it further'
+
+    def test_find_log_groups(self):
+        pages = {
+            '/a': [{'logGroups': [{'logGroupName': '/a1'}]},
+                   {'logGroups': [{'logGroupName': '/a2'}]}],
+            '/b': [{'logGroups': [{'logGroupName': '/a1'}]}]
+        }
+
+        class Paginator(object):
+            def paginate(self, logGroupNamePrefix=None):
+                return pages[logGroupNamePrefix]
+
+        client = FakeLogsClient([])
+        client.get_paginator = lambda name: Paginator()
+        assert self.scanner(client).find_log_groups(['/a', '/b']) == [
+            '/a1', '/a2'
+        ]
@@ -0,0 +1,202 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from io import BytesIO
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.manifest import (
+    inputs_digest, files_hash, load_region_policies,
+    region_policy_fingerprints, RunManifest
+)
+from manheim_c7n_tools.utils import policy_fingerprint
+
+from mock import patch, call
+
+pbm = 'manheim_c7n_tools.manifest'
+
+
+class TestInputsDigest(object):
+
+    def test_stable(self):
+        assert inputs_digest({'a': 1, 'b': [1, 2]}) == inputs_digest(
+            {'b': [1, 2], 'a': 1}
+        )
+        assert inputs_digest({'a': 1}) != inputs_digest({'a': 2})
+
+
+class TestFilesHash(object):
+
+    def test_files_hash(self, tmpdir):
+        d = tmpdir.mkdir('docs')
+        d.join('a.rst').write('foo')
+        d.mkdir('sub').join('b.rst').write('bar')
+        f = tmpdir.join('conf.yml')
+        f.write('baz')
+        paths = [str(d), str(f), str(tmpdir.join('missing'))]
+        orig = files_hash(paths)
+        assert files_hash(paths) == orig
+        d.join('sub').join('b.rst').write('quux')
+        changed = files_hash(paths)
+        assert changed != orig
+        d.join('sub').join('b.rst').rename(d.join('sub').join('c.rst'))
+        assert files_hash(paths) != changed
+
+    def test_files_hash_empty(self, tmpdir):
+        assert files_hash([str(tmpdir.join('missing'))]) == files_hash([])
+
+
+class TestRegionPolicies(object):
+
+    def test_missing(self, tmpdir):
+        with tmpdir.as_cwd():
+            assert load_region_policies('r1') is None
+            assert region_policy_fingerprints('r1') is None
+
+    def test_present(self, tmpdir):
+        pols = [
+            {'name': 'p1', 'resource': 'ec2'},
+            {'name': 'p2', 'resource': 's3'}
+        ]
+        tmpdir.join('custodian_r1.yml').write(
+            json.dumps({'policies': pols})
+        )
+        with tmpdir.as_cwd():
+            assert load_region_policies('r1') == pols
+            assert region_policy_fingerprints('r1') == {
+                'p1': policy_fingerprint(pols[0]),
+                'p2': policy_fingerprint(pols[1])
+            }
+
+
+class TestRunManifest(object):
+
+    def test_local_missing(self, tmpdir):
+        path = str(tmpdir.join('manifest.json'))
+        cls = RunManifest(path)
+        assert cls.digest('s1', 'r1') is None
+        assert cls.is_noop('s1', 'r1', {'a': 1}) is False
+        assert cls.is_noop('s1', 'r1', None) is False
+
+    def test_local_roundtrip(self, tmpdir):
+        path = str(tmpdir.join('manifest.json'))
+        cls = RunManifest(path)
+        cls.record('s1', 'r1', {'a': 1})
+        cls.record('s1', 'r2', None)
+        cls.record('s2', 'r1', {'b': 2})
+        # not stored until saved
+        assert cls.is_noop('s1', 'r1', {'a': 1}) is False
+        cls.save('acct', 1234)
+        data = json.loads(tmpdir.join('manifest.json').read())
+        assert data['version'] == 1
+        assert data['account_name'] == 'acct'
+        assert data['account_id'] == '1234'
+        assert data['units'] == {
+            's1': {'r1': {'digest': inputs_digest({'a': 1}),
+                          'inputs': {'a': 1}}},
+            's2': {'r1': {'digest': inputs_digest({'b': 2}),
+                          'inputs': {'b': 2}}}
+        }
+        cls = RunManifest(path)
+        assert cls.is_noop('s1', 'r1', {'a': 1}) is True
+        assert cls.is_noop('s1', 'r1', {'a': 2}) is False
+        assert cls.is_noop('s1', 'r2', {'a': 1}) is False
+        # merge: units not run this time are kept
+        cls.record('s1', 'r1', {'a': 3})
+        cls.save('acct', 1234)
+        cls = RunManifest(path)
+        assert cls.is_noop('s1', 'r1', {'a': 3}) is True
+        assert cls.is_noop('s2', 'r1', {'b': 2}) is True
+
+    def test_local_account(self, tmpdir):
+        path = str(tmpdir.join('manifest.json'))
+        cls = RunManifest(path, account_id=1234)
+        cls.record('s1', 'r1', {'a': 1})
+        cls.save('acct', 1234)
+        cls = RunManifest(path, account_id='1234')
+        assert cls.is_noop('s1', 'r1', {'a': 1}) is True
+        with pytest.raises(RuntimeError) as exc:
+            cls.save('other', '5678')
+        assert str(exc.value) == 'ERROR: Run manifest %s is for account ' \
+            '1234, not 5678; use a separate manifest for each ' \
+            'account' % path
+        with pytest.raises(RuntimeError) as exc:
+            RunManifest(path, account_id='5678')
+        assert str(exc.value) == 'ERROR: Run manifest %s is for account ' \
+            '1234, not 5678; use a separate manifest for each ' \
+            'account' % path
+        # not checked without an account ID
+        assert RunManifest(path).is_noop('s1', 'r1', {'a': 1}) is True
+
+    def test_local_wrong_version(self, tmpdir):
+        path = tmpdir.join('manifest.json')
+        path.write(json.dumps({
+            'version': 99,
+            'units': {'s1': {'r1': {'digest': inputs_digest({'a': 1})}}}
+        }))
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = RunManifest(str(path))
+        assert cls.is_noop('s1', 'r1', {'a': 1}) is False
+        assert mock_logger.mock_calls == [
+            call.warning(
+                'Ignoring run manifest %s with unknown version %s',
+                str(path), 99
+            )
+        ]
+
+    def test_s3(self):
+        body = json.dumps({
+            'version': 1,
+            'units': {'s1': {'r1': {'digest': inputs_digest({'a': 1})}}}
+        }).encode('utf-8')
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.return_value = {
+                'Body': BytesIO(body)
+            }
+            cls = RunManifest('s3://bkt/path/to/m.json', region_name='r2')
+            assert cls.is_noop('s1', 'r1', {'a': 1}) is True
+            cls.save('acct', '1234')
+        assert mock_client.mock_calls[0] == call('s3', 'r2')
+        s3 = mock_client.return_value
+        assert s3.get_object.mock_calls == [
+            call(Bucket='bkt', Key='path/to/m.json')
+        ]
+        assert len(s3.put_object.mock_calls) == 1
+        kwargs = s3.put_object.mock_calls[0][2]
+        assert kwargs['Bucket'] == 'bkt'
+        assert kwargs['Key'] == 'path/to/m.json'
+        assert kwargs['ContentType'] == 'application/json'
+        assert json.loads(kwargs['Body'].decode('utf-8'))['units'] == {
+            's1': {'r1': {'digest': inputs_digest({'a': 1})}}
+        }
+
+    def test_s3_missing(self):
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.side_effect = ClientError(
+                {'Error': {'Code': 'NoSuchKey', 'Message': 'nope'}},
+                'GetObject'
+            )
+            cls = RunManifest('s3://bkt/m.json')
+        assert cls.digest('s1', 'r1') is None
+
+    def test_s3_error(self):
+        with patch('%s.aws_client' % pbm, autospec=True) as mock_client:
+            mock_client.return_value.get_object.side_effect = ClientError(
+                {'Error': {'Code': 'AccessDenied', 'Message': 'nope'}},
+                'GetObject'
+            )
+            with pytest.raises(ClientError):
+                RunManifest('s3://bkt/m.json')
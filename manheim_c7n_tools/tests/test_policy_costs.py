@@ -0,0 +1,151 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from c7n.query import QueryResourceManager
+
+from manheim_c7n_tools import policy_costs
+from manheim_c7n_tools.policy_costs import (
+    install, pop_fetched, pop_all_fetched, add_fetched, write_report,
+    REPORT_FILENAME
+)
+
+from mock import patch, call, Mock
+
+pbm = 'manheim_c7n_tools.policy_costs'
+
+
+def _metadata(name, start, duration, api_stats, matched):
+    return json.dumps({
+        'policy': {'name': name, 'resource': 'ec2'},
+        'execution': {'start': start, 'duration': duration},
+        'api-stats': api_stats,
+        'metrics': [
+            {'MetricName': 'ApiCalls', 'Value': 99},
+            {'MetricName': 'ResourceCount', 'Value': matched}
+        ]
+    })
+
+
+class TestInstall(object):
+
+    def test_install(self):
+        orig = QueryResourceManager.check_resource_limit
+        mgr = Mock()
+        mgr.config.region = 'r1'
+        mgr.ctx.policy.name = 'p1'
+        try:
+            with patch(
+                '%s._c7n_check_resource_limit' % pbm
+            ) as mock_crl:
+                mock_crl.return_value = 'res'
+                install()
+                install()
+                assert QueryResourceManager.check_resource_limit is \
+                    policy_costs._check_resource_limit
+                assert QueryResourceManager.check_resource_limit(
+                    mgr, 2, 10
+                ) == 'res'
+                QueryResourceManager.check_resource_limit(mgr, 1, 5)
+        finally:
+            QueryResourceManager.check_resource_limit = orig
+        assert mock_crl.mock_calls == [call(mgr, 2, 10), call(mgr, 1, 5)]
+        assert pop_fetched('r1', 'p1') == 15
+        assert pop_fetched('r1', 'p1') is None
+        assert pop_fetched('r2', 'p1') is None
+
+
+class TestFetched(object):
+
+    def test_pop_all_add(self):
+        assert pop_all_fetched() == {}
+        add_fetched({('r1', 'p1'): 2, ('r1', 'p2'): 3})
+        add_fetched({('r1', 'p1'): 4})
+        assert pop_all_fetched() == {('r1', 'p1'): 6, ('r1', 'p2'): 3}
+        assert pop_all_fetched() == {}
+        add_fetched({('r2', 'p1'): 1})
+        assert pop_fetched('r2', 'p1') == 1
+
+
+class TestPolicyCosts(object):
+
+    def test_policy_costs(self, tmpdir):
+        for name, start, duration, stats, matched in [
+            ('p1', 100.0, 1.23456, {'ec2.DescribeInstances': 2}, 3),
+            ('p2', 101.0, 5.0, {'ec2.DescribeImages': 1, 'sts.X': 1}, 0),
+            ('p3', 50.0, 9.0, {}, 0)
+        ]:
+            tmpdir.mkdir(name).join('metadata.json').write(
+                _metadata(name, start, duration, stats, matched)
+            )
+        policy_costs._fetched[('r1', 'p1')] = 10
+        policy_costs._fetched[('r1', 'p4')] = 4
+        res = policy_costs.policy_costs(
+            str(tmpdir), 'r1', ['p1', 'p2', 'p3', 'p4'], 100.0
+        )
+        assert res == [
+            {
+                'policy': 'p2',
+                'resource_type': 'ec2',
+                'wall_time': 5.0,
+                'api_calls': 2,
+                'api_calls_by_operation': {
+                    'ec2.DescribeImages': 1, 'sts.X': 1
+                },
+                'resources_fetched': None,
+                'resources_matched': 0
+            },
+            {
+                'policy': 'p1',
+                'resource_type': 'ec2',
+                'wall_time': 1.235,
+                'api_calls': 2,
+                'api_calls_by_operation': {'ec2.DescribeInstances': 2},
+                'resources_fetched': 10,
+                'resources_matched': 3
+            }
+        ]
+        assert policy_costs._fetched == {}
+
+
+class TestWriteReport(object):
+
+    def test_empty(self, tmpdir):
+        outdir = tmpdir.join('out')
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            write_report(str(outdir), 'r1', [])
+        assert not outdir.exists()
+        assert mock_logger.mock_calls == []
+
+    def test_write(self, tmpdir):
+        outdir = tmpdir.join('out')
+        costs = [
+            {
+                'policy': 'p%d' % x, 'wall_time': 10.0 - x, 'api_calls': x,
+                'resources_fetched': None, 'resources_matched': x
+            } for x in range(3)
+        ]
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            write_report(str(outdir), 'r1', costs, top=2)
+        path = str(outdir.join(REPORT_FILENAME))
+        assert json.loads(outdir.join(REPORT_FILENAME).read()) == costs
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Most expensive of %d policies in %s (full report in %s):\n%s',
+                3, 'r1', path,
+                'p0: 10.0s, 0 API calls, None fetched, 0 matched\n'
+                'p1: 9.0s, 1 API calls, None fetched, 1 matched'
+            )
+        ]
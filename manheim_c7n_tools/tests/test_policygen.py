@@ -18,7 +18,9 @@ import os
 from freezegun import freeze_time
 from collections import defaultdict
 
+import yaml
 import manheim_c7n_tools.policygen as policygen
+from manheim_c7n_tools.utils import policy_fingerprint
 from manheim_c7n_tools.config import ManheimConfig
 
 pbm = 'manheim_c7n_tools.policygen'
@@ -1843,6 +1845,71 @@ class TestWriteCustodianConfigs(PolicyGenTester):
             )
         ]
 
+    @patch.dict('os.environ', {}, clear=True)
+    def test_write_fingerprints(self):
+        original = {"policies": [
+            {
+                'name': 'p1',
+                'mode': {
+                    'type': 'periodic',
+                    'schedule': 'rate(1 day)',
+                    'tags': {'Component': 'p1'}
+                },
+                'filters': [{'tag:Foo': '%%AWS_REGION%%'}]
+            },
+            {
+                'name': 'p2',
+                'mode': {'type': 'cloudtrail', 'events': ['RunInstances']}
+            },
+            {'name': 'p3', 'mode': {'type': 'pull'}},
+            {'name': 'p4'}
+        ]}
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen._write_file', autospec=True
+        ) as mock_wf:
+            self.cls._write_custodian_configs(original, 'region1')
+        written = yaml.safe_load(mock_wf.mock_calls[0][1][2])['policies']
+        expected_p1 = {
+            'name': 'p1',
+            'mode': {
+                'type': 'periodic',
+                'schedule': 'rate(1 day)',
+                'tags': {'Component': 'p1'}
+            },
+            'filters': [{'tag:Foo': 'region1'}]
+        }
+        assert written[0]['mode']['tags'] == {
+            'Component': 'p1',
+            'PolicyFingerprint': policy_fingerprint(expected_p1)
+        }
+        assert written[0]['filters'] == [{'tag:Foo': 'region1'}]
+        assert written[1]['mode']['tags'] == {
+            'PolicyFingerprint': policy_fingerprint({
+                'name': 'p2',
+                'mode': {'type': 'cloudtrail', 'events': ['RunInstances']}
+            })
+        }
+        assert written[2] == {'name': 'p3', 'mode': {'type': 'pull'}}
+        assert written[3] == {'name': 'p4'}
+        # original policies are not modified
+        assert original['policies'][0]['mode']['tags'] == {'Component': 'p1'}
+        assert 'tags' not in original['policies'][1]['mode']
+
+    def test_write_sorted_by_resource_type(self):
+        original = {"policies": [
+            {'name': 'p1', 'resource': 'ec2'},
+            {'name': 'p2', 'resource': 'aws.s3'},
+            {'name': 'p3', 'resource': 'aws.ec2'},
+            {'name': 'p4', 'resource': 'ami'},
+            {'name': 'p5', 'resource': 's3'}
+        ]}
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen._write_file', autospec=True
+        ) as mock_wf:
+            self.cls._write_custodian_configs(original, 'region1')
+        written = yaml.safe_load(mock_wf.mock_calls[0][1][2])['policies']
+        assert [x['name'] for x in written] == ['p4', 'p1', 'p3', 'p2', 'p5']
+
 
 class TestCheckPolicies(PolicyGenTester):
 
@@ -0,0 +1,119 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pstats
+import threading
+
+import pytest
+
+from manheim_c7n_tools.profiling import StackSampler, StepProfiler
+
+from mock import patch, call
+
+pbm = 'manheim_c7n_tools.profiling'
+
+
+def _busy_function():
+    return sum(range(1000))
+
+
+class TestStackSampler(object):
+
+    def test_sample(self):
+        cls = StackSampler(threading.current_thread().ident)
+        cls.sample()
+        cls.sample()
+        lines = cls.collapsed().strip().split("\n")
+        assert len(lines) == 1
+        stack, count = lines[0].rsplit(' ', 1)
+        assert count == '2'
+        assert stack.split(';')[-1].startswith('sample (')
+        assert 'test_sample (' in stack
+
+    def test_sample_no_thread(self):
+        cls = StackSampler(-1)
+        cls.sample()
+        assert cls.collapsed() == ''
+
+    def test_start_stop(self):
+        cls = StackSampler(threading.current_thread().ident, interval=0.001)
+        with patch.object(cls, 'sample') as mock_sample:
+            cls.start()
+            while not mock_sample.called:
+                _busy_function()
+            cls.stop()
+        assert not cls._thread.is_alive()
+
+
+class TestStepProfiler(object):
+
+    def test_enabled_for(self):
+        cls = StepProfiler(['foo', 'bar'])
+        assert cls.enabled_for('foo') is True
+        assert cls.enabled_for('baz') is False
+        assert StepProfiler(['all']).enabled_for('baz') is True
+        assert StepProfiler([]).enabled_for('foo') is False
+
+    def test_profile_disabled(self, tmpdir):
+        outdir = tmpdir.join('profiles')
+        cls = StepProfiler(['foo'], output_dir=str(outdir))
+        with cls.profile('bar', 'r1'):
+            _busy_function()
+        assert not outdir.exists()
+
+    def test_profile(self, tmpdir):
+        outdir = tmpdir.join('profiles')
+        cls = StepProfiler(['foo'], output_dir=str(outdir))
+        with patch('%s.StackSampler' % pbm, autospec=True) as mock_sampler:
+            with cls.profile('foo', 'r1'):
+                _busy_function()
+        assert mock_sampler.mock_calls == []
+        assert outdir.listdir() == [outdir.join('foo_r1.pstats')]
+        stats = pstats.Stats(str(outdir.join('foo_r1.pstats')))
+        assert any(
+            func[2] == '_busy_function' for func in stats.stats.keys()
+        )
+
+    def test_profile_collapsed_exception(self, tmpdir):
+        outdir = tmpdir.join('profiles')
+        cls = StepProfiler(['all'], output_dir=str(outdir), collapsed=True)
+        with patch('%s.StackSampler.collapsed' % pbm, autospec=True) as m_col:
+            m_col.return_value = 'a;b 1\n'
+            with patch('%s.cProfile.Profile' % pbm) as mock_prof:
+                with pytest.raises(RuntimeError):
+                    with cls.profile('foo', 'r1'):
+                        raise RuntimeError('foo')
+        assert mock_prof.mock_calls == []
+        assert outdir.listdir() == [outdir.join('foo_r1.collapsed')]
+        assert outdir.join('foo_r1.collapsed').read() == 'a;b 1\n'
+
+    def test_profile_collapsed(self, tmpdir):
+        outdir = tmpdir.join('profiles')
+        cls = StepProfiler(['foo'], output_dir=str(outdir), collapsed=True)
+        with patch('%s.StackSampler' % pbm, autospec=True) as mock_sampler:
+            mock_sampler.return_value.collapsed.return_value = 'a;b 2\n'
+            with patch('%s.cProfile.Profile' % pbm) as mock_prof:
+                with cls.profile('foo', 'r1'):
+                    assert mock_sampler.return_value.stop.called is False
+        assert mock_prof.mock_calls == []
+        assert mock_sampler.mock_calls[1:] == [
+            call().start(),
+            call().stop(),
+            call().collapsed()
+        ]
+        assert mock_sampler.mock_calls[0] == call(
+            threading.current_thread().ident
+        )
+        assert outdir.listdir() == [outdir.join('foo_r1.collapsed')]
+        assert outdir.join('foo_r1.collapsed').read() == 'a;b 2\n'
@@ -0,0 +1,76 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from c7n import cache
+from c7n.cache import NullCache
+from c7n.config import Config
+
+from manheim_c7n_tools import resource_cache
+from manheim_c7n_tools.resource_cache import (
+    CacheStats, CountingFileCache, cache_stats, install
+)
+
+from mock import patch
+
+pbm = 'manheim_c7n_tools.resource_cache'
+
+
+class TestCacheStats(object):
+
+    def test_counts(self):
+        cls = CacheStats()
+        cls.hit('/a')
+        cls.hit('/a')
+        cls.miss('/a')
+        cls.miss('/b')
+        assert cls.counts(['/a']) == (2, 1)
+        assert cls.counts(['/a', '/b', '/c']) == (2, 2)
+        assert cls.counts([]) == (0, 0)
+        cls.add('/a', 3, 4)
+        cls.add('/c', 1, 0)
+        assert cls.counts(['/a']) == (5, 5)
+        assert cls.counts(['/c']) == (1, 0)
+
+
+class TestCountingFileCache(object):
+
+    def test_get_save(self, tmpdir):
+        path = str(tmpdir.join('c.cache'))
+        conf = Config.empty(cache=path, cache_period=5)
+        cls = CountingFileCache(conf)
+        assert cls.load() is None
+        assert cls.get({'k': 1}) is None
+        cls.save({'k': 1}, ['r1'])
+        cls2 = CountingFileCache(conf)
+        assert cls2.load() is True
+        assert cls2.get({'k': 1}) == ['r1']
+        assert cls2.get({'k': 2}) is None
+        assert cache_stats.counts([path]) == (1, 1)
+
+
+class TestInstall(object):
+
+    def test_install(self, tmpdir):
+        with patch.object(cache, 'factory', resource_cache._c7n_factory):
+            install()
+            install()
+            assert cache.factory is resource_cache._counting_factory
+            res = cache.factory(Config.empty(
+                cache=str(tmpdir.join('c.cache')), cache_period=5
+            ))
+            assert isinstance(res, CountingFileCache)
+            assert isinstance(
+                cache.factory(Config.empty(cache='x', cache_period=0)),
+                NullCache
+            )
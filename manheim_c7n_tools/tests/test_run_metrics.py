@@ -0,0 +1,129 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import pytest
+
+from manheim_c7n_tools.run_metrics import (
+    RunMetrics, UnitMetrics, peak_rss_bytes
+)
+
+from mock import patch
+
+pbm = 'manheim_c7n_tools.run_metrics'
+
+
+class TestRunMetrics(object):
+
+    def setup(self):
+        self.cls = RunMetrics('acct', 'run')
+        self.cls.units = [
+            UnitMetrics('custodian', 'us-east-1', 10.5, 2.25, 1048576 * 100),
+            UnitMetrics('validate', 'us-east-1', 1.0, 0.5, 1048576 * 50),
+            UnitMetrics(
+                'custodian', 'us-west-2', 3.0, 1.0, 1048576 * 120,
+                success=False
+            )
+        ]
+
+    def test_measure(self):
+        cls = RunMetrics('acct', 'dryrun')
+        with patch('%s.time.perf_counter' % pbm) as m_perf:
+            with patch('%s.time.process_time' % pbm) as m_proc:
+                with patch('%s.peak_rss_bytes' % pbm) as m_rss:
+                    m_perf.side_effect = [1.0, 3.5, 10.0, 11.0]
+                    m_proc.side_effect = [0.5, 1.0, 2.0, 2.25]
+                    m_rss.side_effect = [2048, 4096]
+                    with cls.measure('s1', 'r1'):
+                        pass
+                    with pytest.raises(RuntimeError):
+                        with cls.measure('s2', 'r2'):
+                            raise RuntimeError('foo')
+        assert [u.as_dict() for u in cls.units] == [
+            {
+                'step': 's1', 'region': 'r1', 'wall_seconds': 2.5,
+                'process_cpu_seconds': 0.5, 'process_peak_rss_bytes': 2048,
+                'success': True
+            },
+            {
+                'step': 's2', 'region': 'r2', 'wall_seconds': 1.0,
+                'process_cpu_seconds': 0.25, 'process_peak_rss_bytes': 4096,
+                'success': False
+            }
+        ]
+        assert cls.total_wall_time == 3.5
+
+    def test_summary_table(self):
+        res = self.cls.summary_table().split("\n")
+        assert res[0].split() == [
+            'Step', 'Region', 'Wall', '(s)', 'Process', 'CPU', '(s)',
+            'Process', 'Peak', 'RSS', '(MiB)', 'Status'
+        ]
+        assert res[2].split() == [
+            'custodian', 'us-east-1', '10.50', '2.25', '100.0', 'OK'
+        ]
+        assert res[3].split() == [
+            'custodian', 'us-west-2', '3.00', '1.00', '120.0', 'FAILED'
+        ]
+        assert res[4].split() == [
+            'validate', 'us-east-1', '1.00', '0.50', '50.0', 'OK'
+        ]
+
+    def test_write_json(self, tmpdir):
+        path = str(tmpdir.join('metrics.json'))
+        self.cls.write_json(path)
+        with open(path, 'r') as fh:
+            res = json.loads(fh.read())
+        assert res['account_name'] == 'acct'
+        assert res['action'] == 'run'
+        assert res['total_wall_seconds'] == 14.5
+        assert res['units'][0] == {
+            'step': 'custodian', 'region': 'us-east-1', 'wall_seconds': 10.5,
+            'process_cpu_seconds': 2.25, 'process_peak_rss_bytes': 104857600,
+            'success': True
+        }
+        assert len(res['units']) == 3
+        assert tmpdir.listdir() == [tmpdir.join('metrics.json')]
+
+    def test_write_prometheus(self, tmpdir):
+        path = str(tmpdir.join('runner.prom'))
+        self.cls.write_prometheus(path)
+        with open(path, 'r') as fh:
+            lines = fh.read().split("\n")
+        assert '# TYPE manheim_c7n_runner_unit_wall_seconds gauge' in lines
+        assert 'manheim_c7n_runner_unit_wall_seconds{account="acct",' \
+               'action="run",region="us-east-1",step="custodian"} ' \
+               '10.5' in lines
+        assert 'manheim_c7n_runner_unit_success{account="acct",' \
+               'action="run",region="us-west-2",step="custodian"} ' \
+               '0.0' in lines
+        assert 'manheim_c7n_runner_wall_seconds{account="acct",' \
+               'action="run"} 14.5' in lines
+        assert 'manheim_c7n_runner_unit_process_cpu_seconds{account="acct",' \
+               'action="run",region="us-east-1",step="validate"} ' \
+               '0.5' in lines
+        assert lines[-1] == ''
+
+    def test_prometheus_label_escaping(self):
+        cls = RunMetrics('a\\c"ct\nname', 'run')
+        cls.units = [UnitMetrics('s1', 'r1', 1.0, 0.5, 1024)]
+        lines = cls.prometheus_text().split("\n")
+        assert 'manheim_c7n_runner_wall_seconds{' \
+               'account="a\\\\c\\"ct\\nname",action="run"} 1.0' in lines
+
+    def test_peak_rss_bytes(self):
+        with patch('%s.resource.getrusage' % pbm) as m_gru:
+            with patch('%s.sys.platform' % pbm, 'linux'):
+                m_gru.return_value.ru_maxrss = 2
+                assert peak_rss_bytes() == 2048
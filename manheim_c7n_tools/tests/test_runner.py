@@ -12,11 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
-from mock import patch, call, DEFAULT, Mock, PropertyMock
+import json
+import operator
+from io import StringIO
+from datetime import date
+from mock import patch, call, DEFAULT, Mock, MagicMock, PropertyMock
 import pytest
+import yaml
 from functools import partial
 
+from botocore.exceptions import ClientError
 from c7n.config import Config
 from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
 
@@ -25,6 +32,13 @@ import manheim_c7n_tools.runner as runner
 from manheim_c7n_tools.runner import BaseStep
 from manheim_c7n_tools.utils import bold
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.profiling import StepProfiler
+from manheim_c7n_tools.run_metrics import UnitMetrics
+from manheim_c7n_tools.events import EventSink
+from manheim_c7n_tools.history import RunHistory
+from manheim_c7n_tools.manifest import RunManifest, inputs_digest, files_hash
+from manheim_c7n_tools.utils import policy_fingerprint
+from manheim_c7n_tools import resource_cache, policy_costs
 from c7n_mailer.deploy import get_archive
 from c7n.mu import PythonPackageArchive
 
@@ -62,6 +76,9 @@ class StepTester(object):
         # in order to supplant __getattr__ calls
         self.m_conf = Mock(spec=ManheimConfig)
         self.m_conf.account_id = '01234567890'
+        self.m_conf.custodian_cache_dir = '/tmp/.cache'
+        self.m_conf.custodian_cache_ttl = 0
+        self.m_conf.docs_cache_dir = None
 
 
 class TestPolicygenStep(StepTester):
@@ -90,34 +107,106 @@ class TestPolicygenStep(StepTester):
             else:
                 assert runner.PolicygenStep.run_in_region(rname, conf) is False
 
+    def test_manifest_inputs(self):
+        assert runner.PolicygenStep(
+            'rName', self.m_conf
+        ).manifest_inputs() is None
+
 
 class TestValidateStep(StepTester):
 
+    def setup(self):
+        super(TestValidateStep, self).setup()
+        self.m_conf.regions = ['r1', 'r2']
+
     def test_run(self):
-        mock_conf = Mock(spec_set=ManheimConfig)
-        with patch('%s.validate' % pbm, autospec=True) as mock_validate:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.ValidateStep('rName', self.m_conf).run()
-        assert mock_validate.mock_calls == [call(mock_conf)]
-        assert mock_empty.mock_calls == [
-            call(configs=['custodian_rName.yml'], region='rName')
+        with patch('%s.PolicyValidator' % pbm, autospec=True) as mock_pv:
+            mock_pv.return_value.validate_files.return_value = {
+                'custodian_r1.yml': [], 'custodian_r2.yml': []
+            }
+            runner.ValidateStep('r1', self.m_conf).run()
+        assert mock_pv.mock_calls == [
+            call('/tmp/.cache/c7n-validation.json'),
+            call().validate_files(['custodian_r1.yml', 'custodian_r2.yml'])
         ]
 
     def test_dryrun(self):
-        mock_conf = Mock(spec_set=ManheimConfig)
-        with patch('%s.validate' % pbm, autospec=True) as mock_validate:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.ValidateStep('rName', self.m_conf).dryrun()
-        assert mock_validate.mock_calls == [call(mock_conf)]
-        assert mock_empty.mock_calls == [
-            call(configs=['custodian_rName.yml'], region='rName')
+        with patch('%s.PolicyValidator' % pbm, autospec=True) as mock_pv:
+            mock_pv.return_value.validate_files.return_value = {
+                'custodian_r1.yml': [], 'custodian_r2.yml': []
+            }
+            runner.ValidateStep('r1', self.m_conf).dryrun()
+        assert mock_pv.mock_calls == [
+            call('/tmp/.cache/c7n-validation.json'),
+            call().validate_files(['custodian_r1.yml', 'custodian_r2.yml'])
         ]
 
+    def test_run_invalid(self):
+        with patch('%s.PolicyValidator' % pbm, autospec=True) as mock_pv:
+            mock_pv.return_value.validate_files.return_value = {
+                'custodian_r1.yml': [], 'custodian_r2.yml': ['bad policy']
+            }
+            with pytest.raises(SystemExit) as exc:
+                runner.ValidateStep('r1', self.m_conf).run()
+        assert exc.value.code == 1
+
     def test_run_in_region(self):
+        conf = FakeConfig(ALL_REGIONS)
+        for rname in ALL_REGIONS:
+            if rname == ALL_REGIONS[0]:
+                assert runner.ValidateStep.run_in_region(rname, conf) is True
+            else:
+                assert runner.ValidateStep.run_in_region(rname, conf) is False
+
+    def test_run_selected_regions(self):
+        with patch('%s.PolicyValidator' % pbm, autospec=True) as mock_pv:
+            mock_pv.return_value.validate_files.return_value = {
+                'custodian_r2.yml': []
+            }
+            runner.ValidateStep(
+                'r2', self.m_conf, options={'regions': ['r2']}
+            ).run()
+        assert mock_pv.mock_calls == [
+            call('/tmp/.cache/c7n-validation.json'),
+            call().validate_files(['custodian_r2.yml'])
+        ]
+
+    def test_run_in_region_selected(self):
+        conf = FakeConfig(ALL_REGIONS)
+        options = {'regions': ALL_REGIONS[2:4]}
         for rname in ALL_REGIONS:
-            assert runner.ValidateStep.run_in_region(rname, None) is True
+            assert runner.ValidateStep.run_in_region(
+                rname, conf, options=options
+            ) is (rname == ALL_REGIONS[2])
+        # all regions are selected if not known
+        assert runner.ValidateStep.run_in_region(
+            ALL_REGIONS[0], conf, options={}
+        ) is True
+
+    def test_manifest_inputs(self):
+        with patch('%s.region_policy_fingerprints' % pbm) as m_rpf:
+            m_rpf.side_effect = [{'p1': 'aaa'}, {'p2': 'bbb'}]
+            res = runner.ValidateStep('r1', self.m_conf).manifest_inputs()
+        assert res == {
+            'policies': {'r1': {'p1': 'aaa'}, 'r2': {'p2': 'bbb'}}
+        }
+        assert m_rpf.mock_calls == [call('r1'), call('r2')]
+
+    def test_manifest_inputs_selected_regions(self):
+        with patch('%s.region_policy_fingerprints' % pbm) as m_rpf:
+            m_rpf.return_value = {'p2': 'bbb'}
+            res = runner.ValidateStep(
+                'r2', self.m_conf, options={'regions': ['r2']}
+            ).manifest_inputs()
+        assert res == {'policies': {'r2': {'p2': 'bbb'}}}
+        assert m_rpf.mock_calls == [call('r2')]
+
+    def test_manifest_inputs_no_config(self):
+        with patch('%s.region_policy_fingerprints' % pbm) as m_rpf:
+            m_rpf.side_effect = [{'p1': 'aaa'}, None]
+            assert runner.ValidateStep(
+                'r1', self.m_conf
+            ).manifest_inputs() is None
 
 
 class TestMugcStep(StepTester):
@@ -237,6 +326,17 @@ class TestMugcStep(StepTester):
         for rname in ALL_REGIONS:
             assert runner.MugcStep.run_in_region(rname, None) is True
 
+    def test_manifest_inputs(self):
+        type(self.m_conf).function_prefix = PropertyMock(return_value='c7n-')
+        with patch('%s.region_policy_fingerprints' % pbm) as m_rpf:
+            m_rpf.return_value = {'p1': 'aaa'}
+            res = runner.MugcStep('rName', self.m_conf).manifest_inputs()
+            m_rpf.return_value = None
+            assert runner.MugcStep(
+                'rName', self.m_conf
+            ).manifest_inputs() is None
+        assert res == {'policies': {'p1': 'aaa'}, 'function_prefix': 'c7n-'}
+
 
 class TestCustodianStep(StepTester):
 
@@ -250,8 +350,12 @@ class TestCustodianStep(StepTester):
         mock_conf = Mock(spec_set=Config)
         with patch('%s.run' % pbm) as mock_run:
             with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.CustodianStep('rName', self.m_conf).run()
+                with patch(
+                    '%s.CustodianStep._policies_to_provision' % pbm
+                ) as mock_ptp:
+                    mock_ptp.return_value = None
+                    mock_empty.return_value = mock_conf
+                    runner.CustodianStep('rName', self.m_conf).run()
         assert mock_run.mock_calls == [call(mock_conf)]
         assert mock_empty.mock_calls == [
             call(
@@ -262,14 +366,171 @@ class TestCustodianStep(StepTester):
                 verbose=1,
                 metrics_enabled=True,
                 subparser='run',
-                cache='/tmp/.cache/cloud-custodian.cache',
+                cache='/tmp/.cache/cloud-custodian-01234567890-rName-run.cache',
+                cache_period=0,
                 command='c7n.commands.run',
                 output_dir='cloud-custodian-ACCT-REGION/logs',
                 vars=None,
-                dryrun=False
+                dryrun=False,
+                policy_filters=[],
+                resource_types=[]
             )
         ]
 
+    def test_run_changed_policies(self):
+        type(self.m_conf).output_s3_bucket_name = PropertyMock(
+            return_value='cloud-custodian-ACCT-REGION'
+        )
+        type(self.m_conf).custodian_log_group = PropertyMock(
+            return_value='/cloud-custodian/ACCT/REGION'
+        )
+        mock_conf = Mock(spec_set=Config)
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.Config.empty' % pbm) as mock_empty:
+                with patch(
+                    '%s.CustodianStep._policies_to_provision' % pbm
+                ) as mock_ptp:
+                    mock_ptp.return_value = ['p1', 'p3']
+                    mock_empty.return_value = mock_conf
+                    runner.CustodianStep('rName', self.m_conf).run()
+        assert mock_run.mock_calls == [call(mock_conf)]
+        assert mock_empty.mock_calls[0][2]['policy_filters'] == ['p1', 'p3']
+
+    def test_run_nothing_changed(self):
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.Config.empty' % pbm) as mock_empty:
+                with patch(
+                    '%s.CustodianStep._policies_to_provision' % pbm
+                ) as mock_ptp:
+                    with patch('%s.logger' % pbm) as mock_logger:
+                        mock_ptp.return_value = []
+                        runner.CustodianStep('rName', self.m_conf).run()
+        assert mock_run.mock_calls == []
+        assert mock_empty.mock_calls == []
+        assert mock_logger.mock_calls == [
+            call.info(
+                'All policies in %s are deployed and unchanged; skipping '
+                'custodian run', 'rName'
+            )
+        ]
+
+    def test_policies_to_provision(self):
+        conf = {'policies': [
+            {'name': 'pull1', 'resource': 'ec2'},
+            {'name': 'pull2', 'mode': {'type': 'pull'}},
+            {'name': 'same', 'mode': {
+                'type': 'periodic', 'tags': {'PolicyFingerprint': 'aaa'}
+            }},
+            {'name': 'changed', 'mode': {
+                'type': 'periodic', 'tags': {'PolicyFingerprint': 'bbb'}
+            }},
+            {'name': 'new', 'mode': {
+                'type': 'cloudtrail', 'function-prefix': 'foo-',
+                'tags': {'PolicyFingerprint': 'ccc'}
+            }},
+            {'name': 'prefixed', 'mode': {
+                'type': 'cloudtrail', 'function-prefix': 'foo-',
+                'tags': {'PolicyFingerprint': 'ddd'}
+            }},
+            {'name': 'nofp', 'mode': {'type': 'periodic'}}
+        ]}
+        with patch('%s.load_region_policies' % pbm) as m_lrp:
+            m_lrp.return_value = conf['policies']
+            with patch(
+                '%s.CustodianStep._deployed_fingerprints' % pbm
+            ) as mock_df:
+                mock_df.return_value = {
+                    'custodian-same': 'aaa',
+                    'custodian-changed': 'xxx',
+                    'custodian-new': 'ccc',
+                    'foo-prefixed': 'ddd'
+                }
+                res = runner.CustodianStep(
+                    'rName', self.m_conf
+                )._policies_to_provision()
+        assert res == ['pull1', 'pull2', 'changed', 'new', 'nofp']
+        assert m_lrp.mock_calls == [call('rName')]
+
+    def test_policies_to_provision_all_or_unknown(self):
+        conf = {'policies': [
+            {'name': 'pull1', 'resource': 'ec2'},
+            {'name': 'new', 'mode': {
+                'type': 'periodic', 'tags': {'PolicyFingerprint': 'aaa'}
+            }}
+        ]}
+        with patch('%s.load_region_policies' % pbm) as m_lrp:
+            m_lrp.return_value = conf['policies']
+            with patch(
+                '%s.CustodianStep._deployed_fingerprints' % pbm
+            ) as mock_df:
+                mock_df.return_value = {}
+                cls = runner.CustodianStep('rName', self.m_conf)
+                assert cls._policies_to_provision() is None
+                mock_df.return_value = None
+                assert cls._policies_to_provision() is None
+
+    def test_policies_to_provision_no_policies(self):
+        with patch('%s.load_region_policies' % pbm) as m_lrp:
+            with patch(
+                '%s.CustodianStep._deployed_fingerprints' % pbm
+            ) as mock_df:
+                with patch('%s.logger' % pbm, autospec=True):
+                    mock_df.return_value = {'custodian-p1': 'aaa'}
+                    cls = runner.CustodianStep('rName', self.m_conf)
+                    m_lrp.return_value = None
+                    assert cls._policies_to_provision() is None
+                    m_lrp.return_value = []
+                    assert cls._policies_to_provision() is None
+
+    def test_deployed_fingerprints(self):
+        type(self.m_conf).account_id = PropertyMock(return_value='1234')
+        m_client = Mock()
+        m_client.get_paginator.return_value.paginate.return_value = [
+            {'ResourceTagMappingList': [
+                {
+                    'ResourceARN': 'arn:aws:lambda:rName:1234:function:f1',
+                    'Tags': [
+                        {'Key': 'Component', 'Value': 'f1'},
+                        {'Key': 'PolicyFingerprint', 'Value': 'aaa'}
+                    ]
+                }
+            ]},
+            {'ResourceTagMappingList': [
+                {
+                    'ResourceARN': 'arn:aws:lambda:rName:1234:function:f2',
+                    'Tags': [{'Key': 'PolicyFingerprint', 'Value': 'bbb'}]
+                }
+            ]}
+        ]
+        with patch('%s.aws_client' % pbm) as mock_client:
+            mock_client.return_value = m_client
+            res = runner.CustodianStep(
+                'rName', self.m_conf
+            )._deployed_fingerprints()
+        assert res == {'f1': 'aaa', 'f2': 'bbb'}
+        assert mock_client.mock_calls[0] == call(
+            'resourcegroupstaggingapi', 'rName'
+        )
+        assert m_client.mock_calls == [
+            call.get_paginator('get_resources'),
+            call.get_paginator().paginate(
+                ResourceTypeFilters=['lambda:function'],
+                TagFilters=[{'Key': 'PolicyFingerprint'}]
+            )
+        ]
+
+    def test_deployed_fingerprints_error(self):
+        m_client = Mock()
+        m_client.get_paginator.return_value.paginate.side_effect = \
+            ClientError({'Error': {'Code': 'AccessDenied'}}, 'GetResources')
+        with patch('%s.aws_client' % pbm) as mock_client:
+            mock_client.return_value = m_client
+            with patch('%s.logger' % pbm):
+                res = runner.CustodianStep(
+                    'rName', self.m_conf
+                )._deployed_fingerprints()
+        assert res is None
+
     def test_dryrun(self):
         type(self.m_conf).output_s3_bucket_name = PropertyMock(
             return_value='cloud-custodian-ACCT-REGION'
@@ -291,18 +552,314 @@ class TestCustodianStep(StepTester):
                 verbose=1,
                 metrics_enabled=False,
                 subparser='run',
-                cache='/tmp/.cache/cloud-custodian.cache',
+                cache='/tmp/.cache/'
+                      'cloud-custodian-01234567890-rName-dryrun.cache',
+                cache_period=0,
                 command='c7n.commands.run',
                 output_dir='dryrun/rName',
                 vars=None,
-                dryrun=True
+                dryrun=True,
+                policy_filters=[],
+                resource_types=[]
+            )
+        ]
+
+    def test_dryrun_targeted(self):
+        mock_conf = Mock(spec_set=Config)
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.Config.empty' % pbm) as mock_empty:
+                with patch('%s.load_region_policies' % pbm) as m_lrp:
+                    mock_empty.return_value = mock_conf
+                    m_lrp.return_value = [
+                        {'name': 'p1'}, {'name': 'p2'}, {'name': 'p3'}
+                    ]
+                    runner.CustodianStep(
+                        'rName', self.m_conf,
+                        options={'dryrun_policies': ['p3', 'p1', 'p4']}
+                    ).dryrun()
+        assert m_lrp.mock_calls == [call('rName')]
+        assert mock_run.mock_calls == [call(mock_conf)]
+        assert mock_empty.mock_calls[0][2]['policy_filters'] == ['p3', 'p1']
+        assert mock_empty.mock_calls[0][2]['dryrun'] is True
+
+    def test_dryrun_targeted_none_in_region(self):
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.Config.empty' % pbm) as mock_empty:
+                with patch('%s.load_region_policies' % pbm) as m_lrp:
+                    m_lrp.return_value = [{'name': 'p1'}]
+                    runner.CustodianStep(
+                        'rName', self.m_conf,
+                        options={'dryrun_policies': ['p4']}
+                    ).dryrun()
+                    m_lrp.return_value = None
+                    runner.CustodianStep(
+                        'rName', self.m_conf,
+                        options={'dryrun_policies': []}
+                    ).dryrun()
+        assert mock_run.mock_calls == []
+        assert mock_empty.mock_calls == []
+
+    def test_policy_groups(self):
+        pols = [
+            {'name': 'p1', 'resource': 'ec2'},
+            {'name': 'p2', 'resource': 'aws.s3'},
+            {'name': 'p3', 'resource': 'aws.ec2'},
+            {'name': 'p4', 'resource': 's3'}
+        ]
+        with patch('%s.load_region_policies' % pbm) as m_lrp:
+            m_lrp.return_value = pols
+            cls = runner.CustodianStep('rName', self.m_conf)
+            assert cls._policy_groups(None) == {
+                'aws.ec2': [pols[0], pols[2]],
+                'aws.s3': [pols[1], pols[3]]
+            }
+            assert cls._policy_groups(['p2', 'p3']) == {
+                'aws.ec2': [pols[2]],
+                'aws.s3': [pols[1]]
+            }
+            m_lrp.return_value = None
+            assert cls._policy_groups(None) is None
+
+    def test_run_policies_concurrent(self, tmpdir):
+        self.m_conf.custodian_cache_dir = str(tmpdir)
+        self.m_conf.custodian_cache_ttl = 60
+        groups = {
+            'aws.s3': [{'name': 'p2', 'resource': 's3'}],
+            'aws.ec2': [
+                {'name': 'p1', 'resource': 'ec2'},
+                {'name': 'p3', 'resource': 'ec2'}
+            ],
+            'aws.iam-role': [{'name': 'p4', 'resource': 'iam-role'}]
+        }
+
+        def se_cip(func, policies, kwargs):
+            assert func == runner.CustodianStep._run_policy_group
+            name = policies[0]['name']
+            return (
+                2 if name == 'p2' else 0, 1, 2, {('rName', name): 5}
             )
+
+        with patch('%s._call_in_process' % pbm) as mock_cip:
+            with patch(
+                '%s.CustodianStep._policy_groups' % pbm, autospec=True
+            ) as mock_pg:
+                with patch('%s.logger' % pbm, autospec=True) as m_log:
+                    mock_cip.side_effect = se_cip
+                    mock_pg.return_value = groups
+                    cls = runner.CustodianStep(
+                        'rName', self.m_conf, options={'policy_jobs': 2}
+                    )
+                    with patch(
+                        '%s.CustodianStep._report_policy_costs' % pbm,
+                        autospec=True
+                    ) as mock_rpc:
+                        with pytest.raises(SystemExit) as exc:
+                            cls._run_policies(
+                                ['p1'], dryrun=True, output_dir='out'
+                            )
+        assert exc.value.code == 2
+        assert len(mock_rpc.mock_calls) == 1
+        assert mock_rpc.mock_calls[0][1][:3] == (cls, 'out', ['p1'])
+        assert mock_pg.mock_calls == [call(cls, ['p1'])]
+        calls = sorted(
+            mock_cip.mock_calls, key=lambda c: c[1][1][0]['name']
+        )
+        assert [c[1][1] for c in calls] == [
+            groups['aws.ec2'], groups['aws.s3'], groups['aws.iam-role']
+        ]
+        assert [c[1][2] for c in calls] == [
+            {
+                'dryrun': True, 'output_dir': 'out', 'cache_period': 60,
+                'cache': str(tmpdir.join(
+                    'cloud-custodian-01234567890-rName-dryrun-%s.cache' % x
+                ))
+            }
+            for x in ['aws.ec2', 'aws.s3', 'aws.iam-role']
         ]
+        assert m_log.mock_calls == [
+            call.info(
+                'Running %d resource type groups of policies in %s with %d '
+                'workers', 3, 'rName', 2
+            ),
+            call.error(
+                'Custodian exited %s for policies in %s: %s',
+                2, 'rName', 'p2'
+            ),
+            call.info(
+                'Resource cache for %s: %d hits, %d misses', 'rName', 3, 6
+            )
+        ]
+        assert policy_costs.pop_fetched('rName', 'p1') == 5
+        assert policy_costs.pop_fetched('rName', 'p2') == 5
+        assert policy_costs.pop_fetched('rName', 'p4') == 5
+
+    def test_run_policies_single_group(self):
+        mock_conf = Mock(spec_set=Config)
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.Config.empty' % pbm) as mock_empty:
+                with patch(
+                    '%s.CustodianStep._policy_groups' % pbm, autospec=True
+                ) as mock_pg:
+                    mock_empty.return_value = mock_conf
+                    mock_pg.return_value = {'aws.ec2': ['p1', 'p3']}
+                    with patch(
+                        '%s.CustodianStep._report_policy_costs' % pbm
+                    ):
+                        runner.CustodianStep(
+                            'rName', self.m_conf, options={'policy_jobs': 4}
+                        )._run_policies(None, dryrun=False, output_dir='o')
+        assert mock_run.mock_calls == [call(mock_conf)]
+        assert mock_empty.mock_calls == [
+            call(
+                policy_filters=[], resource_types=[],
+                cache='/tmp/.cache/cloud-custodian-01234567890-rName-run.cache',
+                cache_period=0, dryrun=False, output_dir='o'
+            )
+        ]
+
+    def test_report_policy_costs(self):
+        with patch('%s.policy_costs' % pbm, autospec=True) as mock_pc:
+            with patch('%s.load_region_policies' % pbm) as m_lrp:
+                m_lrp.return_value = [{'name': 'p1'}, {'name': 'p2'}]
+                cls = runner.CustodianStep('rName', self.m_conf)
+                cls._report_policy_costs('out', None, 12.5)
+                cls._report_policy_costs('out', ['p3'], 13.5)
+        assert mock_pc.mock_calls == [
+            call.policy_costs('out', 'rName', ['p1', 'p2'], 12.5),
+            call.write_report(
+                'out', 'rName', mock_pc.policy_costs.return_value, top=10
+            ),
+            call.policy_costs('out', 'rName', ['p3'], 13.5),
+            call.write_report(
+                'out', 'rName', mock_pc.policy_costs.return_value, top=10
+            )
+        ]
+
+    def test_report_policy_costs_error(self):
+        with patch('%s.policy_costs' % pbm, autospec=True) as mock_pc:
+            with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                mock_pc.policy_costs.side_effect = ValueError('foo')
+                runner.CustodianStep(
+                    'rName', self.m_conf
+                )._report_policy_costs('out', ['p1'], 12.5)
+        assert mock_logger.mock_calls == [
+            call.warning(
+                'Unable to write policy cost report for %s', 'rName',
+                exc_info=True
+            )
+        ]
+
+    def test_cache_path(self):
+        cls = runner.CustodianStep('rName', self.m_conf)
+        assert cls._cache_path(False) == \
+            '/tmp/.cache/cloud-custodian-01234567890-rName-run.cache'
+        assert cls._cache_path(True) == \
+            '/tmp/.cache/cloud-custodian-01234567890-rName-dryrun.cache'
+        assert cls._cache_path(True, 'aws.ec2') == \
+            '/tmp/.cache/cloud-custodian-01234567890-rName-dryrun-aws.ec2.cache'
+
+    def test_run_policies_cache_stats(self, tmpdir):
+        self.m_conf.custodian_cache_dir = str(tmpdir)
+        self.m_conf.custodian_cache_ttl = 60
+        path = str(
+            tmpdir.join('cloud-custodian-01234567890-rName-dryrun.cache')
+        )
+
+        def se_run(conf):
+            assert conf.cache == path
+            assert conf.cache_period == 60
+            resource_cache.cache_stats.hit(path)
+            resource_cache.cache_stats.miss(path)
+            resource_cache.cache_stats.miss(path)
+            resource_cache.cache_stats.miss('/other')
+
+        resource_cache.cache_stats.hit(path)
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.logger' % pbm, autospec=True) as m_log:
+                mock_run.side_effect = se_run
+                with patch('%s.CustodianStep._report_policy_costs' % pbm):
+                    runner.CustodianStep(
+                        'rName', self.m_conf
+                    )._run_policies(None, dryrun=True, output_dir='o')
+        assert len(mock_run.mock_calls) == 1
+        assert m_log.mock_calls == [
+            call.info(
+                'Resource cache for %s: %d hits, %d misses', 'rName', 1, 2
+            )
+        ]
+
+    def test_run_policy_group(self, tmpdir):
+        pols = [
+            {'name': 'p1', 'resource': 'ec2', 'filters': [
+                {'LaunchTime': date(2020, 1, 1)}
+            ]},
+            {'name': 'p3', 'resource': 'ec2'}
+        ]
+        cache = str(tmpdir.join('c.cache'))
+        loaded = []
+
+        def se_run(conf):
+            assert conf.policy_filters == []
+            assert conf.resource_types == []
+            assert conf.dryrun is True
+            assert conf.cache == cache
+            with open(conf.configs[0], 'r') as fh:
+                loaded.append((conf.configs[0], yaml.safe_load(fh.read())))
+            resource_cache.cache_stats.hit(cache)
+            policy_costs.add_fetched({('rName', 'p1'): 4})
+            if len(loaded) == 2:
+                raise SystemExit(1)
+            if len(loaded) == 3:
+                raise SystemExit(None)
+
+        with patch('%s.run' % pbm) as mock_run:
+            with patch('%s.resource_cache.install' % pbm) as mock_rci:
+                with patch('%s.policy_costs.install' % pbm) as mock_pci:
+                    mock_run.side_effect = se_run
+                    kwargs = {
+                        'dryrun': True, 'cache': cache,
+                        'configs': ['custodian_rName.yml']
+                    }
+                    assert runner.CustodianStep._run_policy_group(
+                        pols, kwargs
+                    ) == (0, 1, 0, {('rName', 'p1'): 4})
+                    assert runner.CustodianStep._run_policy_group(
+                        pols, kwargs
+                    ) == (1, 2, 0, {('rName', 'p1'): 4})
+                    assert runner.CustodianStep._run_policy_group(
+                        pols, kwargs
+                    ) == (0, 3, 0, {('rName', 'p1'): 4})
+        assert len(mock_rci.mock_calls) == 3
+        assert len(mock_pci.mock_calls) == 3
+        assert [x[1] for x in loaded] == [{'policies': pols}] * 3
+        assert loaded[0][0] != 'custodian_rName.yml'
+        assert not any(os.path.exists(x[0]) for x in loaded)
 
     def test_run_in_region(self):
         for rname in ALL_REGIONS:
             assert runner.CustodianStep.run_in_region(rname, None) is True
 
+    def test_manifest_inputs(self):
+        lambda_pols = [
+            {'name': 'p1', 'mode': {'type': 'periodic'}},
+            {'name': 'p2', 'mode': {'type': 'cloudtrail'}}
+        ]
+        with patch('%s.load_region_policies' % pbm) as m_lrp:
+            m_lrp.return_value = lambda_pols
+            res = runner.CustodianStep('rName', self.m_conf).manifest_inputs()
+            m_lrp.return_value = lambda_pols + [{'name': 'p3'}]
+            assert runner.CustodianStep(
+                'rName', self.m_conf
+            ).manifest_inputs() is None
+            m_lrp.return_value = None
+            assert runner.CustodianStep(
+                'rName', self.m_conf
+            ).manifest_inputs() is None
+        assert res == {'policies': {
+            'p1': policy_fingerprint(lambda_pols[0]),
+            'p2': policy_fingerprint(lambda_pols[1])
+        }}
+
 
 class TestMailerStep(StepTester):
 
@@ -616,7 +1173,7 @@ class TestMailerStep(StepTester):
 
     def test_run(self):
         m_partial = Mock(spec_set=partial)
-        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf = {'mailer': 'config'}
         with patch(
             '%s.MailerStep.mailer_config' % pbm, new_callable=PropertyMock
         ) as mock_config:
@@ -629,13 +1186,44 @@ class TestMailerStep(StepTester):
                     with patch(
                         '%s.session_factory' % pbm, autospec=True
                     ) as mock_sf:
-                        mock_config.return_value = m_conf
-                        mock_partial.return_value = m_partial
-                        runner.MailerStep('rName', self.m_conf).run()
-        assert mock_partial.mock_calls == [call(mock_sf, m_conf)]
-        assert mock_prov.mock_calls == [call(m_conf, m_partial)]
+                        with patch.multiple(
+                            '%s.MailerStep' % pbm,
+                            _fingerprint=DEFAULT,
+                            _deployed_fingerprint=DEFAULT
+                        ) as mocks:
+                            mocks['_fingerprint'].return_value = 'new'
+                            mocks['_deployed_fingerprint'].return_value = 'old'
+                            mock_config.return_value = m_conf
+                            mock_partial.return_value = m_partial
+                            runner.MailerStep('rName', self.m_conf).run()
+        expected = {
+            'mailer': 'config', 'lambda_tags': {'PolicyFingerprint': 'new'}
+        }
+        assert mock_partial.mock_calls == [call(mock_sf, expected)]
+        assert mock_prov.mock_calls == [call(expected, m_partial)]
         assert mock_config.mock_calls == [call()]
 
+    def test_run_unchanged(self):
+        m_conf = {'mailer': 'config'}
+        with patch(
+            '%s.MailerStep.mailer_config' % pbm, new_callable=PropertyMock
+        ) as mock_config:
+            with patch(
+                '%s.mailer_deploy.provision' % pbm, autospec=True
+            ) as mock_prov:
+                with patch.multiple(
+                    '%s.MailerStep' % pbm,
+                    _fingerprint=DEFAULT,
+                    _deployed_fingerprint=DEFAULT
+                ) as mocks:
+                    mocks['_fingerprint'].return_value = 'same'
+                    mocks['_deployed_fingerprint'].return_value = 'same'
+                    mock_config.return_value = m_conf
+                    runner.MailerStep('rName', self.m_conf).run()
+        assert mock_prov.mock_calls == []
+        assert mocks['_fingerprint'].mock_calls == [call(m_conf)]
+        assert mocks['_deployed_fingerprint'].mock_calls == [call(m_conf)]
+
     def test_dryrun(self):
         m_partial = Mock(spec_set=partial)
         m_conf = Mock(spec_set=ManheimConfig)
@@ -681,6 +1269,88 @@ class TestMailerStep(StepTester):
         assert arch.size > 0
         assert len(arch.get_filenames()) > 0
 
+    def test_fingerprint(self):
+        conf = {'queue_url': 'foo', 'templates_folders': ['/a', '/b']}
+        with patch('%s.files_hash' % pbm) as m_fh:
+            with patch('%s.c7n_version' % pbm, '1.2.3'):
+                m_fh.return_value = 'tmplhash'
+                res = runner.MailerStep._fingerprint(conf)
+        assert m_fh.mock_calls == [call(['/a', '/b'])]
+        assert res == inputs_digest({
+            'config': {'queue_url': 'foo'}, 'templates': 'tmplhash',
+            'c7n': '1.2.3'
+        })
+        assert conf == {'queue_url': 'foo', 'templates_folders': ['/a', '/b']}
+
+    def test_deployed_fingerprint(self):
+        conf = {'lambda_name': 'mymailer'}
+        with patch('%s.session_factory' % pbm, autospec=True) as mock_sf:
+            m_client = mock_sf.return_value.client.return_value
+            m_client.get_function.return_value = {
+                'Configuration': {}, 'Tags': {'PolicyFingerprint': 'abc'}
+            }
+            res = runner.MailerStep(
+                'rName', self.m_conf
+            )._deployed_fingerprint(conf)
+        assert res == 'abc'
+        assert mock_sf.mock_calls == [
+            call(conf),
+            call().client('lambda'),
+            call().client().get_function(FunctionName='mymailer')
+        ]
+
+    def test_deployed_fingerprint_untagged(self):
+        with patch('%s.session_factory' % pbm, autospec=True) as mock_sf:
+            m_client = mock_sf.return_value.client.return_value
+            m_client.get_function.return_value = {'Configuration': {}}
+            res = runner.MailerStep(
+                'rName', self.m_conf
+            )._deployed_fingerprint({})
+        assert res is None
+        assert m_client.get_function.mock_calls == [
+            call(FunctionName='cloud-custodian-mailer')
+        ]
+
+    def test_deployed_fingerprint_not_found(self):
+        with patch('%s.session_factory' % pbm, autospec=True) as mock_sf:
+            m_client = mock_sf.return_value.client.return_value
+            m_client.get_function.side_effect = ClientError(
+                {'Error': {'Code': 'ResourceNotFoundException'}},
+                'GetFunction'
+            )
+            with patch('%s.logger' % pbm, autospec=True) as m_log:
+                res = runner.MailerStep(
+                    'rName', self.m_conf
+                )._deployed_fingerprint({})
+        assert res is None
+        assert m_log.warning.mock_calls == []
+
+    def test_deployed_fingerprint_error(self):
+        with patch('%s.session_factory' % pbm, autospec=True) as mock_sf:
+            m_client = mock_sf.return_value.client.return_value
+            m_client.get_function.side_effect = ClientError(
+                {'Error': {'Code': 'AccessDenied'}}, 'GetFunction'
+            )
+            with patch('%s.logger' % pbm, autospec=True) as m_log:
+                res = runner.MailerStep(
+                    'rName', self.m_conf
+                )._deployed_fingerprint({})
+        assert res is None
+        assert len(m_log.warning.mock_calls) == 1
+
+    def test_manifest_inputs(self):
+        with patch(
+            '%s.MailerStep.mailer_config' % pbm, new_callable=PropertyMock
+        ) as m_mc:
+            with patch(
+                '%s.MailerStep._fingerprint' % pbm
+            ) as m_fp:
+                m_mc.return_value = {'queue_url': 'foo'}
+                m_fp.return_value = 'fp'
+                res = runner.MailerStep('rName', self.m_conf).manifest_inputs()
+        assert m_fp.mock_calls == [call({'queue_url': 'foo'})]
+        assert res == {'mailer_config_hash': 'fp'}
+
 
 class TestDryRunDiffStep(StepTester):
 
@@ -749,6 +1419,18 @@ class TestS3ArchiverStep(StepTester):
         for rname in ALL_REGIONS:
             assert runner.S3ArchiverStep.run_in_region(rname, None) is True
 
+    def test_manifest_inputs(self):
+        with patch('%s.region_policy_fingerprints' % pbm) as m_rpf:
+            m_rpf.return_value = {'p2': 'bbb', 'p1': 'aaa'}
+            res = runner.S3ArchiverStep(
+                'rName', self.m_conf
+            ).manifest_inputs()
+            m_rpf.return_value = None
+            assert runner.S3ArchiverStep(
+                'rName', self.m_conf
+            ).manifest_inputs() is None
+        assert res == {'policy_names': ['p1', 'p2']}
+
 
 class TestDocsBuildStep(StepTester):
 
@@ -782,7 +1464,10 @@ class TestDocsBuildStep(StepTester):
         assert mock_ope.mock_calls == [call('docs/_build')]
         assert mock_rmtree.mock_calls == []
         assert mock_sphinx.mock_calls == [
-            call(['-W', 'docs/source', 'docs/_build', '-b', 'dirhtml'])
+            call([
+                '-W', '-j', 'auto', 'docs/source', 'docs/_build', '-b',
+                'dirhtml'
+            ])
         ]
 
     def test_run_sphinx_build_failure(self):
@@ -801,9 +1486,69 @@ class TestDocsBuildStep(StepTester):
         assert mock_ope.mock_calls == [call('docs/_build')]
         assert mock_rmtree.mock_calls == [call('docs/_build')]
         assert mock_sphinx.mock_calls == [
-            call(['-W', 'docs/source', 'docs/_build', '-b', 'dirhtml'])
+            call([
+                '-W', '-j', 'auto', 'docs/source', 'docs/_build', '-b',
+                'dirhtml'
+            ])
         ]
 
+    def test_run_sphinx_build_cached(self, tmpdir):
+        self.m_conf.docs_cache_dir = str(tmpdir.join('cache'))
+        tmpdir.join('policies.rst').write('policies')
+        tmpdir.join('regions.rst').write('regions')
+        tmpdir.mkdir('docs').mkdir('source').join('index.rst').write('idx')
+        doctrees = str(tmpdir.join('cache', 'doctrees'))
+
+        def se_sphinx(argv):
+            tmpdir.join('cache').ensure(dir=True)
+            tmpdir.join('docs').ensure('_build', dir=True)
+            return 0
+
+        with tmpdir.as_cwd():
+            with patch('%s.sphinx_main' % pbm, autospec=True) as mock_sphinx:
+                with patch('%s.rmtree' % pbm, autospec=True) as mock_rmtree:
+                    mock_sphinx.side_effect = se_sphinx
+                    cls = runner.DocsBuildStep('rName', self.m_conf)
+                    # first build
+                    cls._run_sphinx_build()
+                    # unchanged; skipped
+                    cls._run_sphinx_build()
+                    # changed; incremental build
+                    tmpdir.join('policies.rst').write('changed')
+                    cls._run_sphinx_build()
+            stored = tmpdir.join('cache', 'docs-inputs.sha256').read()
+            assert stored == files_hash(
+                ['policies.rst', 'regions.rst', 'docs/source']
+            )
+        argv = [
+            '-d', doctrees, '-W', '-j', 'auto', 'docs/source', 'docs/_build',
+            '-b', 'dirhtml'
+        ]
+        assert mock_sphinx.mock_calls == [call(argv), call(argv)]
+        assert mock_rmtree.mock_calls == []
+
+    def test_run_sphinx_build_cached_no_output(self, tmpdir):
+        self.m_conf.docs_cache_dir = str(tmpdir)
+        tmpdir.join('docs-inputs.sha256').write(files_hash(
+            ['policies.rst', 'regions.rst', 'docs/source']
+        ))
+        with tmpdir.as_cwd():
+            with patch('%s.sphinx_main' % pbm, autospec=True) as mock_sphinx:
+                mock_sphinx.return_value = 0
+                runner.DocsBuildStep('rName', self.m_conf)._run_sphinx_build()
+        assert len(mock_sphinx.mock_calls) == 1
+
+    def test_run_sphinx_build_cached_failure(self, tmpdir):
+        self.m_conf.docs_cache_dir = str(tmpdir)
+        with tmpdir.as_cwd():
+            with patch('%s.sphinx_main' % pbm, autospec=True) as mock_sphinx:
+                mock_sphinx.return_value = 1
+                with pytest.raises(RuntimeError):
+                    runner.DocsBuildStep(
+                        'rName', self.m_conf
+                    )._run_sphinx_build()
+        assert not tmpdir.join('docs-inputs.sha256').exists()
+
     def test_run_in_region(self):
         conf = FakeConfig(ALL_REGIONS)
         for rname in ALL_REGIONS:
@@ -812,6 +1557,15 @@ class TestDocsBuildStep(StepTester):
             else:
                 assert runner.DocsBuildStep.run_in_region(rname, conf) is False
 
+    def test_manifest_inputs(self):
+        with patch('%s.files_hash' % pbm) as m_fh:
+            m_fh.return_value = 'dochash'
+            res = runner.DocsBuildStep('rName', self.m_conf).manifest_inputs()
+        assert res == {'docs_hash': 'dochash'}
+        assert m_fh.mock_calls == [
+            call(['policies.rst', 'regions.rst', 'docs/source'])
+        ]
+
 
 class TestStepClasses(object):
 
@@ -833,10 +1587,10 @@ class TestCustodianRunner(object):
 
     def setup(self):
 
-        def se_cls2(rname, r_conf):
+        def se_cls2(rname, r_conf, options=None):
             return rname in ['r1', 'r3']
 
-        def se_cls3(rname, r_conf):
+        def se_cls3(rname, r_conf, options=None):
             return rname == 'r1'
 
         self.cls1 = Mock(spec_set=BaseStep)
@@ -955,6 +1709,121 @@ class TestCustodianRunner(object):
         assert mock_cff.mock_calls == [call('manheim-c7n-tools.yml', 'aName')]
         assert mocks['_validate_account'].mock_calls == [call(cls)]
 
+    def test_run_targeted_dryrun(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1'])
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch.multiple(
+                '%s.CustodianRunner' % pbm,
+                autospec=True,
+                _run_step_in_regions=DEFAULT,
+                _validate_account=DEFAULT
+            ):
+                with patch('%s.DryRunDiffer' % pbm, autospec=True) as m_drd:
+                    m_drd.return_value.policies_to_dryrun.return_value = [
+                        'p1'
+                    ]
+                    with patch('%s.logger' % pbm, autospec=True):
+                        with patch(
+                            '%s.ManheimConfig.from_file' % pbm
+                        ) as mock_cff:
+                            mock_cff.return_value = m_conf
+                            cls = runner.CustodianRunner('acctName')
+                            cls.run('run', targeted_dryrun=True)
+                            assert cls.step_options == {
+                                'regions': ['r1'], 'policy_jobs': 1
+                            }
+                            assert m_drd.mock_calls == []
+                            cls.run('dryrun', targeted_dryrun=True)
+        assert cls.step_options == {
+            'regions': ['r1'], 'policy_jobs': 1, 'dryrun_policies': ['p1']
+        }
+        assert m_drd.mock_calls == [
+            call(m_conf),
+            call().policies_to_dryrun(diff_against='origin/master')
+        ]
+
+    def test_run_events(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        m_conf.config_for_region.return_value = m_conf
+        self.cls1.return_value.run.side_effect = [None, RuntimeError('foo')]
+        stream = StringIO()
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch('%s.CustodianRunner._validate_account' % pbm):
+                with patch('%s.logger' % pbm, autospec=True):
+                    with patch(
+                        '%s.ManheimConfig.from_file' % pbm
+                    ) as mock_cff:
+                        mock_cff.return_value = m_conf
+                        cls = runner.CustodianRunner('acctName')
+                        with pytest.raises(RuntimeError):
+                            cls.run(
+                                'run', step_names=['cls3', 'cls1'],
+                                events=EventSink(stream)
+                            )
+        events = [json.loads(x) for x in stream.getvalue().splitlines()]
+        for e in events:
+            assert e['account'] == 'acctName'
+            assert e['action'] == 'run'
+            assert isinstance(e['timestamp'], float)
+        assert [
+            (e['event'], e.get('step'), e.get('region'), e.get('success'))
+            for e in events
+        ] == [
+            ('run_start', None, None, None),
+            ('step_start', 'cls1', None, None),
+            ('region_start', 'cls1', 'r1', None),
+            ('region_end', 'cls1', 'r1', True),
+            ('region_start', 'cls1', 'r2', None),
+            ('error', 'cls1', 'r2', None),
+            ('region_end', 'cls1', 'r2', False),
+            ('step_end', 'cls1', None, False),
+            ('summary', None, None, False)
+        ]
+        assert events[0]['steps'] == ['cls1', 'cls3']
+        assert events[0]['regions'] == ['r1', 'r2']
+        assert events[5]['error'] == 'RuntimeError: foo'
+        assert events[5]['region_number'] == 2
+        assert events[5]['region_count'] == 2
+        assert events[7]['step_number'] == 1
+        assert events[7]['step_count'] == 2
+        assert events[8]['steps'] == 2
+        assert events[8]['units'] == 2
+        assert events[8]['failed_units'] == 1
+        assert 'duration' in events[8]
+
+    def test_run_events_skip(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        m_conf.config_for_region.return_value = m_conf
+        stream = StringIO()
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch('%s.CustodianRunner._validate_account' % pbm):
+                with patch('%s.logger' % pbm, autospec=True):
+                    with patch(
+                        '%s.ManheimConfig.from_file' % pbm
+                    ) as mock_cff:
+                        mock_cff.return_value = m_conf
+                        cls = runner.CustodianRunner('acctName')
+                        cls.run(
+                            'dryrun', step_names=['cls3'],
+                            events=EventSink(stream)
+                        )
+        events = [json.loads(x) for x in stream.getvalue().splitlines()]
+        assert [
+            (e['event'], e.get('step'), e.get('region'), e.get('success'))
+            for e in events
+        ] == [
+            ('run_start', None, None, None),
+            ('step_start', 'cls3', None, None),
+            ('region_start', 'cls3', 'r1', None),
+            ('region_end', 'cls3', 'r1', True),
+            ('skip', 'cls3', 'r2', None),
+            ('step_end', 'cls3', None, True),
+            ('summary', None, None, True)
+        ]
+
     def test_run_invalid_region_name(self):
         m_conf = Mock(spec_set=ManheimConfig)
         type(m_conf).regions = PropertyMock(
@@ -1005,7 +1874,7 @@ class TestCustodianRunner(object):
         )
         type(m_conf).account_id = PropertyMock(return_value='0234567890')
 
-        with patch('%s.boto3.client' % pbm) as mock_client:
+        with patch('%s.aws_client' % pbm) as mock_client:
             mock_client.return_value.get_caller_identity.return_value = {
                 'UserId': 'MyUID',
                 'Arn': 'myARN',
@@ -1019,7 +1888,7 @@ class TestCustodianRunner(object):
             call('manheim-c7n-tools.yml', 'acctName')
         ]
         assert mock_client.mock_calls == [
-            call('sts', region_name='us-east-1'),
+            call('sts', 'us-east-1'),
             call().get_caller_identity()
         ]
 
@@ -1030,7 +1899,7 @@ class TestCustodianRunner(object):
         )
         type(m_conf).account_id = PropertyMock(return_value='1234567890')
 
-        with patch('%s.boto3.client' % pbm) as mock_client:
+        with patch('%s.aws_client' % pbm) as mock_client:
             mock_client.return_value.get_caller_identity.return_value = {
                 'UserId': 'MyUID',
                 'Arn': 'myARN',
@@ -1049,7 +1918,7 @@ class TestCustodianRunner(object):
             call('manheim-c7n-tools.yml', 'acctName')
         ]
         assert mock_client.mock_calls == [
-            call('sts', region_name='us-east-1'),
+            call('sts', 'us-east-1'),
             call().get_caller_identity()
         ]
 
@@ -1118,18 +1987,19 @@ class TestCustodianRunner(object):
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
                 mock_cff.return_value = m_conf
-                runner.CustodianRunner('acctName')._run_step_in_regions(
+                cls = runner.CustodianRunner('acctName')
+                cls._run_step_in_regions(
                     'run', self.cls1, ['r1', 'r2', 'r3']
                 )
         assert self.cls1.mock_calls == [
-            call.run_in_region('r1', m_conf_r1),
-            call('r1', m_conf_r1),
+            call.run_in_region('r1', m_conf_r1, options={}),
+            call('r1', m_conf_r1, options={}),
             call().run(),
-            call.run_in_region('r2', m_conf_r2),
-            call('r2', m_conf_r2),
+            call.run_in_region('r2', m_conf_r2, options={}),
+            call('r2', m_conf_r2, options={}),
             call().run(),
-            call.run_in_region('r3', m_conf_r3),
-            call('r3', m_conf_r3),
+            call.run_in_region('r3', m_conf_r3, options={}),
+            call('r3', m_conf_r3, options={}),
             call().run()
         ]
         assert m_conf.config_for_region.mock_calls == [
@@ -1142,6 +2012,420 @@ class TestCustodianRunner(object):
             call.info(bold('Step cls1 in REGION 2 of 3 (r2)')),
             call.info(bold('Step cls1 in REGION 3 of 3 (r3)'))
         ]
+        assert [
+            (u.step_name, u.region_name, u.success) for u in cls.metrics.units
+        ] == [
+            ('cls1', 'r1', True),
+            ('cls1', 'r2', True),
+            ('cls1', 'r3', True)
+        ]
+
+    def test_run_in_regions_profiler(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.return_value = m_conf
+        m_prof = MagicMock(spec_set=StepProfiler)
+
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.profiler = m_prof
+                cls._run_step_in_regions('dryrun', self.cls1, ['r1', 'r2'])
+        assert m_prof.mock_calls == [
+            call.profile('cls1', 'r1'),
+            call.profile().__enter__(),
+            call.profile().__exit__(None, None, None),
+            call.profile('cls1', 'r2'),
+            call.profile().__enter__(),
+            call.profile().__exit__(None, None, None)
+        ]
+
+    def test_run_in_regions_parallel(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.return_value = m_conf
+        m_hist = Mock(spec_set=RunHistory)
+        m_hist.expected.side_effect = lambda a, s, r: {
+            'r1': 1.0, 'r3': 5.0
+        }.get(r)
+
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.jobs = 2
+                cls.history = m_hist
+                with patch.object(cls, '_run_unit') as mock_run_unit:
+                    cls._run_step_in_regions(
+                        'run', self.cls1, ['r1', 'r2', 'r3']
+                    )
+        assert m_hist.mock_calls == [
+            call.expected('acctName', 'cls1', 'r1'),
+            call.expected('acctName', 'cls1', 'r2'),
+            call.expected('acctName', 'cls1', 'r3')
+        ]
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Running step %s in %d region(s) with up to %d jobs: %s',
+                'cls1', 3, 2, 'r2, r3, r1'
+            )
+        ]
+        assert sorted(
+            mock_run_unit.mock_calls, key=lambda x: x[1][2]
+        ) == [
+            call('run', self.cls1, 'r1', m_conf, {
+                'step': 'cls1', 'region': 'r1', 'region_number': 1,
+                'region_count': 3
+            }, in_process=True),
+            call('run', self.cls1, 'r2', m_conf, {
+                'step': 'cls1', 'region': 'r2', 'region_number': 2,
+                'region_count': 3
+            }, in_process=True),
+            call('run', self.cls1, 'r3', m_conf, {
+                'step': 'cls1', 'region': 'r3', 'region_number': 3,
+                'region_count': 3
+            }, in_process=True)
+        ]
+
+    def test_run_in_regions_parallel_no_history_failure(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.return_value = m_conf
+
+        def se_run_unit(action, step, region_name, conf, fields,
+                        in_process=False):
+            # r1 is dequeued first, so it always runs before r3 fails
+            if region_name == 'r3':
+                raise RuntimeError('r3 failed')
+
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.jobs = 4
+                with patch.object(cls, '_run_unit') as mock_run_unit:
+                    mock_run_unit.side_effect = se_run_unit
+                    with pytest.raises(RuntimeError) as exc:
+                        cls._run_step_in_regions(
+                            'dryrun', self.cls2, ['r1', 'r2', 'r3']
+                        )
+        assert str(exc.value) == 'r3 failed'
+        assert mock_logger.mock_calls == [
+            call.info(bold('SKIPPING Step cls2 in REGION 2 of 3 (r2)')),
+            call.info(
+                'Running step %s in %d region(s) with up to %d jobs: %s',
+                'cls2', 2, 4, 'r1, r3'
+            )
+        ]
+        assert len(mock_run_unit.mock_calls) == 2
+
+    def test_run_unit_in_process(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_events = MagicMock(spec_set=EventSink)
+        m_prof = MagicMock(spec_set=StepProfiler)
+        unit = UnitMetrics('cls1', 'r1', 2.0, 1.5, 1024)
+        fields = {
+            'step': 'cls1', 'region': 'r1', 'region_number': 1,
+            'region_count': 2
+        }
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.events = m_events
+                cls.profiler = m_prof
+                cls.step_options = {'policy_jobs': 2}
+                with patch(
+                    '%s._call_in_process' % pbm, autospec=True
+                ) as mock_cip:
+                    mock_cip.return_value = (unit, None, None)
+                    cls._run_unit(
+                        'dryrun', self.cls1, 'r1', m_conf, fields,
+                        in_process=True
+                    )
+        assert mock_cip.mock_calls == [
+            call(
+                runner._run_step_process, 'dryrun', self.cls1, 'r1', m_conf,
+                {'policy_jobs': 2}
+            )
+        ]
+        assert cls.metrics.units == [unit]
+        assert m_prof.mock_calls == []
+        assert self.cls1.mock_calls == [
+            call('r1', m_conf, options={'policy_jobs': 2})
+        ]
+        assert m_events.mock_calls[0] == call.span(
+            'region', emit_error=True, **fields
+        )
+
+    def test_run_unit_in_process_failure(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        unit = UnitMetrics('cls1', 'r1', 2.0, 1.5, 1024, success=False)
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                with patch(
+                    '%s._call_in_process' % pbm, autospec=True
+                ) as mock_cip:
+                    mock_cip.return_value = (
+                        unit, RuntimeError('foo'), 'Traceback: foo'
+                    )
+                    with pytest.raises(RuntimeError) as exc:
+                        cls._run_unit(
+                            'run', self.cls1, 'r1', m_conf, {
+                                'step': 'cls1', 'region': 'r1',
+                                'region_number': 1, 'region_count': 1
+                            }, in_process=True
+                        )
+        assert str(exc.value) == 'foo'
+        assert isinstance(exc.value.__cause__, runner._ProcessTraceback)
+        assert 'Traceback: foo' in str(exc.value.__cause__)
+        assert cls.metrics.units == [unit]
+
+    def test_run_step_process(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        unit, error, tb = runner._run_step_process(
+            'run', self.cls1, 'r1', m_conf, {'policy_jobs': 1}
+        )
+        assert (error, tb) == (None, None)
+        assert (unit.step_name, unit.region_name, unit.success) == (
+            'cls1', 'r1', True
+        )
+        assert self.cls1.mock_calls == [
+            call('r1', m_conf, options={'policy_jobs': 1}),
+            call().run()
+        ]
+        self.cls2.return_value.dryrun.side_effect = SystemExit(2)
+        unit, error, tb = runner._run_step_process(
+            'dryrun', self.cls2, 'r2', m_conf, {}
+        )
+        assert isinstance(error, SystemExit)
+        assert error.code == 2
+        assert 'SystemExit: 2' in tb
+        assert (unit.step_name, unit.region_name, unit.success) == (
+            'cls2', 'r2', False
+        )
+
+    def test_call_in_process(self):
+        assert runner._call_in_process(operator.add, 1, 2) == 3
+
+    def test_call_in_process_error(self):
+        with pytest.raises(ValueError) as exc:
+            runner._call_in_process(int, 'x')
+        assert isinstance(exc.value.__cause__, runner._ProcessTraceback)
+        assert 'invalid literal for int()' in str(exc.value.__cause__)
+
+    def test_call_in_process_no_result(self):
+        with pytest.raises(RuntimeError) as exc:
+            runner._call_in_process(os._exit, 3)
+        assert str(exc.value) == 'ERROR: process running _exit exited ' \
+            'with code 3 without a result'
+
+    def test_run_profile_jobs(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+            mock_cff.return_value = m_conf
+            with patch(
+                '%s.CustodianRunner._validate_account' % pbm
+            ) as mock_va:
+                cls = runner.CustodianRunner('acctName')
+                with pytest.raises(RuntimeError) as exc:
+                    cls.run('run', jobs=2, profiler=StepProfiler(['all']))
+        assert str(exc.value) == 'ERROR: steps cannot be profiled when ' \
+            'running with more than one job'
+        assert mock_va.mock_calls == []
+
+    def test_run_history(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        m_hist = Mock(spec_set=RunHistory)
+        m_hist.expected.side_effect = lambda a, s, r: {
+            ('cls1', 'r1'): 4.0, ('cls1', 'r2'): 3.0, ('cls2', 'r1'): 2.0
+        }.get((s, r))
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch.multiple(
+                '%s.CustodianRunner' % pbm,
+                autospec=True,
+                _run_step_in_regions=DEFAULT,
+                _validate_account=DEFAULT
+            ):
+                with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                    with patch(
+                        '%s.ManheimConfig.from_file' % pbm
+                    ) as mock_cff:
+                        mock_cff.return_value = m_conf
+                        cls = runner.CustodianRunner('acctName')
+                        cls.run(
+                            'run', step_names=['cls1', 'cls2'], jobs=2,
+                            history=m_hist
+                        )
+        assert cls.jobs == 2
+        assert cls.history == m_hist
+        assert call.info(
+            'Predicted completion time with %d job(s): %.1fs (%d of %d '
+            '(step, region) units have no history)', 2, 6.0, 1, 4
+        ) in mock_logger.mock_calls
+        assert mock_logger.mock_calls[-1][0] == 'info'
+        assert mock_logger.mock_calls[-1][1][0] == \
+            'Predicted completion time %.1fs; actual %.1fs'
+        assert mock_logger.mock_calls[-1][1][1] == 6.0
+        assert m_hist.mock_calls[-2:] == [
+            call.record('acctName', cls.metrics.units),
+            call.save()
+        ]
+
+    def test_run_in_regions_manifest(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.return_value = m_conf
+        m_manifest = Mock(spec_set=RunManifest)
+        m_manifest.is_noop.side_effect = lambda s, r, i: r == 'r2'
+        self.cls1.return_value.manifest_inputs.side_effect = [
+            {'r': 1}, {'r': 2}
+        ]
+
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.manifest = m_manifest
+                cls._run_step_in_regions('run', self.cls1, ['r1', 'r2'])
+        assert self.cls1.mock_calls == [
+            call.run_in_region('r1', m_conf, options={}),
+            call('r1', m_conf, options={}),
+            call().manifest_inputs(),
+            call().run(),
+            call.run_in_region('r2', m_conf, options={}),
+            call('r2', m_conf, options={}),
+            call().manifest_inputs()
+        ]
+        assert m_manifest.mock_calls == [
+            call.is_noop('cls1', 'r1', {'r': 1}),
+            call.record('cls1', 'r1', {'r': 1}),
+            call.is_noop('cls1', 'r2', {'r': 2}),
+            call.record('cls1', 'r2', {'r': 2})
+        ]
+        assert mock_logger.mock_calls == [
+            call.info(bold('Step cls1 in REGION 1 of 2 (r1)')),
+            call.info(bold(
+                'SKIPPING Step cls1 in REGION 2 of 2 (r2) - unchanged since '
+                'last run'
+            ))
+        ]
+        assert [u.region_name for u in cls.metrics.units] == ['r1']
+
+    def test_run_in_regions_manifest_dryrun(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.return_value = m_conf
+        m_manifest = Mock(spec_set=RunManifest)
+
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.manifest = m_manifest
+                cls._run_step_in_regions('dryrun', self.cls1, ['r1'])
+        assert self.cls1.mock_calls == [
+            call.run_in_region('r1', m_conf, options={}),
+            call('r1', m_conf, options={}),
+            call().dryrun()
+        ]
+        assert m_manifest.mock_calls == []
+
+    def test_run_manifest(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        type(m_conf).account_name = PropertyMock(return_value='acctName')
+        type(m_conf).account_id = PropertyMock(return_value='1234')
+        m_manifest = Mock(spec_set=RunManifest)
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch.multiple(
+                '%s.CustodianRunner' % pbm,
+                autospec=True,
+                _run_step_in_regions=DEFAULT,
+                _validate_account=DEFAULT
+            ) as mocks:
+                with patch('%s.logger' % pbm, autospec=True):
+                    with patch(
+                        '%s.ManheimConfig.from_file' % pbm
+                    ) as mock_cff:
+                        mock_cff.return_value = m_conf
+                        cls = runner.CustodianRunner('acctName')
+                        cls.run('dryrun', manifest=m_manifest)
+                        assert m_manifest.mock_calls == []
+                        cls.run('run', manifest=m_manifest)
+                        assert m_manifest.mock_calls == [
+                            call.save('acctName', '1234')
+                        ]
+                        mocks['_run_step_in_regions'].side_effect = \
+                            RuntimeError('foo')
+                        with pytest.raises(RuntimeError):
+                            cls.run('run', manifest=m_manifest)
+        assert cls.manifest == m_manifest
+        assert m_manifest.mock_calls == [call.save('acctName', '1234')]
+
+    def test_plan(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2', 'r3'])
+        m_conf.config_for_region.return_value = m_conf
+        m_manifest = Mock(spec_set=RunManifest)
+        m_manifest.is_noop.side_effect = lambda s, r, i: r == 'r3'
+        self.cls1.return_value.manifest_inputs.return_value = None
+        self.cls2.return_value.manifest_inputs.return_value = {'foo': 'bar'}
+        with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                res = cls.plan(m_manifest, step_names=['cls1', 'cls2'])
+        assert res == [
+            ('cls1', 'r1', 'always'),
+            ('cls1', 'r2', 'always'),
+            ('cls1', 'r3', 'always'),
+            ('cls2', 'r1', 'changed'),
+            ('cls2', 'r3', 'no-op')
+        ]
+        assert m_manifest.mock_calls == [
+            call.is_noop('cls2', 'r1', {'foo': 'bar'}),
+            call.is_noop('cls2', 'r3', {'foo': 'bar'})
+        ]
+
+    def test_plan_invalid_region(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1'])
+        with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+            mock_cff.return_value = m_conf
+            cls = runner.CustodianRunner('acctName')
+            with pytest.raises(RuntimeError):
+                cls.plan(Mock(), regions=['r4'])
+
+    def test_report_metrics(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.metrics = Mock()
+                cls.metrics.units = ['foo']
+                cls.metrics.summary_table.return_value = 'TABLE'
+                cls._report_metrics('m.json', 'm.prom')
+        assert mock_logger.mock_calls == [
+            call.info('Run timing by step and region:\n%s', 'TABLE')
+        ]
+        assert cls.metrics.mock_calls == [
+            call.summary_table(),
+            call.write_json('m.json'),
+            call.write_prometheus('m.prom')
+        ]
+
+    def test_report_metrics_no_units(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName')
+                cls.metrics = Mock()
+                cls.metrics.units = []
+                cls._report_metrics(None, None)
+        assert mock_logger.mock_calls == []
+        assert cls.metrics.mock_calls == []
 
     def test_run_in_regions_policygen_run(self):
         m_conf = Mock(spec_set=ManheimConfig)
@@ -1169,14 +2453,14 @@ class TestCustodianRunner(object):
                         'run', mock_pgs, ['r1', 'r2', 'r3']
                     )
         assert mock_pgs.mock_calls == [
-            call.run_in_region('r1', m_conf),
-            call('r1', m_conf),
+            call.run_in_region('r1', m_conf, options={}),
+            call('r1', m_conf, options={}),
             call().run(),
-            call.run_in_region('r2', m_conf),
-            call('r2', m_conf),
+            call.run_in_region('r2', m_conf, options={}),
+            call('r2', m_conf, options={}),
             call().run(),
-            call.run_in_region('r3', m_conf),
-            call('r3', m_conf),
+            call.run_in_region('r3', m_conf, options={}),
+            call('r3', m_conf, options={}),
             call().run()
         ]
         assert m_conf.config_for_region.mock_calls == []
@@ -1186,6 +2470,35 @@ class TestCustodianRunner(object):
             call.info(bold('Step policygen in REGION 3 of 3 (r3)'))
         ]
 
+    def test_run_validate_non_first_region(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2', 'r3'])
+        type(m_conf).custodian_cache_dir = PropertyMock(return_value='/tmp/c')
+        m_conf.config_for_region.return_value = m_conf
+        with patch(
+            '%s.CustodianRunner.ordered_step_classes' % pbm,
+            [runner.ValidateStep]
+        ):
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                with patch('%s.logger' % pbm, autospec=True):
+                    with patch(
+                        '%s.PolicyValidator' % pbm, autospec=True
+                    ) as mock_pv:
+                        mock_pv.return_value.validate_files.return_value = {
+                            'custodian_r2.yml': []
+                        }
+                        with patch(
+                            '%s.CustodianRunner._validate_account' % pbm
+                        ):
+                            runner.CustodianRunner('acctName').run(
+                                'run', regions=['r2']
+                            )
+        assert mock_pv.mock_calls == [
+            call('/tmp/c/c7n-validation.json'),
+            call().validate_files(['custodian_r2.yml'])
+        ]
+
     def test_run_in_regions_dryrun_skip_some(self):
         m_conf = Mock(spec_set=ManheimConfig)
         m_conf_r1 = Mock(spec_set=ManheimConfig)
@@ -1209,9 +2522,9 @@ class TestCustodianRunner(object):
                     'dryrun', self.cls2, ['r2', 'r3']
                 )
         assert self.cls2.mock_calls == [
-            call.run_in_region('r2', m_conf_r2),
-            call.run_in_region('r3', m_conf_r3),
-            call('r3', m_conf_r3),
+            call.run_in_region('r2', m_conf_r2, options={}),
+            call.run_in_region('r3', m_conf_r3, options={}),
+            call('r3', m_conf_r3, options={}),
             call().dryrun()
         ]
         assert m_conf.config_for_region.mock_calls == [
@@ -1281,6 +2594,99 @@ class TestParseArgs(object):
         assert p.config == 'manheim-c7n-tools.yml'
         assert p.assume_role is True
 
+    def test_run_metrics(self):
+        p = runner.parse_args([
+            '--metrics-json', 'm.json', '--metrics-prom=m.prom', 'run', 'aName'
+        ])
+        assert p.ACTION == 'run'
+        assert p.metrics_json == 'm.json'
+        assert p.metrics_prom == 'm.prom'
+        assert p.profile_steps == []
+        assert p.profile_dir == 'profiles'
+        assert p.profile_collapsed is False
+        assert p.events_file is None
+        assert p.events_fd is None
+        assert p.jobs == 1
+        assert p.history_file is None
+        assert p.manifest is None
+
+    def test_run_profile(self):
+        p = runner.parse_args([
+            '--profile-step', 'custodian', '--profile-step=policygen',
+            '--profile-dir', 'prof', '--profile-collapsed', 'run', 'aName'
+        ])
+        assert p.ACTION == 'run'
+        assert p.profile_steps == ['custodian', 'policygen']
+        assert p.profile_dir == 'prof'
+        assert p.profile_collapsed is True
+        p = runner.parse_args(['--profile-step', 'all', 'run', 'aName'])
+        assert p.profile_steps == ['all']
+
+    def test_run_profile_invalid_step(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            runner.parse_args(['--profile-step', 'foo', 'run', 'aName'])
+        assert exc.value.code == 2
+        assert "argument --profile-step: invalid choice: 'foo'" in \
+            capsys.readouterr().err
+
+    def test_run_profile_jobs(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            runner.parse_args([
+                '--profile-step', 'custodian', '-j', '2', 'run', 'aName'
+            ])
+        assert exc.value.code == 2
+        assert '--profile-step cannot be used with --jobs greater than 1' in \
+            capsys.readouterr().err
+        p = runner.parse_args([
+            '--profile-step', 'custodian', '-j', '1', 'run', 'aName'
+        ])
+        assert p.profile_steps == ['custodian']
+
+    def test_run_events(self):
+        p = runner.parse_args(['--events-file', 'ev.jsonl', 'run', 'aName'])
+        assert p.events_file == 'ev.jsonl'
+        assert p.events_fd is None
+        p = runner.parse_args(['--events-fd', '3', 'run', 'aName'])
+        assert p.events_file is None
+        assert p.events_fd == 3
+
+    def test_run_events_exclusive(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            runner.parse_args([
+                '--events-file', 'ev.jsonl', '--events-fd', '3', 'run', 'aName'
+            ])
+        assert exc.value.code == 2
+        assert 'argument --events-fd: not allowed with argument ' \
+            '--events-file' in capsys.readouterr().err
+
+    def test_run_jobs_history(self):
+        p = runner.parse_args([
+            '-j', '4', '--history-file', 'hist.json', 'run', 'aName'
+        ])
+        assert p.jobs == 4
+        assert p.history_file == 'hist.json'
+
+    def test_run_policy_jobs(self):
+        p = runner.parse_args(['-J', '4', 'run', 'aName'])
+        assert p.policy_jobs == 4
+        p = runner.parse_args(['run', 'aName'])
+        assert p.policy_jobs == 1
+
+    def test_dryrun_targeted(self):
+        p = runner.parse_args(['dryrun', '-t', 'aName'])
+        assert p.ACTION == 'dryrun'
+        assert p.targeted is True
+        p = runner.parse_args(['dryrun', 'aName'])
+        assert p.targeted is False
+        p = runner.parse_args(['run', 'aName'])
+        assert p.targeted is False
+
+    def test_plan(self):
+        p = runner.parse_args(['--manifest', 'm.json', 'plan', 'aName'])
+        assert p.ACTION == 'plan'
+        assert p.ACCT_NAME == 'aName'
+        assert p.manifest == 'm.json'
+
     def test_run_debug_steps_assume_role(self):
         p = runner.parse_args(
             ['-vv', '-A', '-s', 'foo', '--step=bar', 'run', 'aName']
@@ -1305,6 +2711,18 @@ class FakeArgs(object):
     config = 'manheim-c7n-tools.yml'
     ACCT_NAME = 'acctName'
     assume_role = True
+    metrics_json = None
+    metrics_prom = None
+    profile_steps = []
+    profile_dir = 'profiles'
+    profile_collapsed = False
+    events_file = None
+    events_fd = None
+    jobs = 1
+    history_file = None
+    manifest = None
+    targeted = False
+    policy_jobs = 1
 
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
@@ -1341,7 +2759,11 @@ class TestMain(object):
         assert mocks['CustodianRunner'].mock_calls == [
             call('acctName', 'manheim-c7n-tools.yml'),
             call().run(
-                'run', ['foo2'], step_names=[], skip_steps=[]
+                'run', ['foo2'], step_names=[], skip_steps=[],
+                metrics_json=None, metrics_prom=None, profiler=None,
+                events=None, jobs=1, history=None,
+                manifest=None, targeted_dryrun=False,
+                policy_jobs=1
             )
         ]
         assert mocks['ManheimConfig'].mock_calls == []
@@ -1349,6 +2771,239 @@ class TestMain(object):
         assert captured.err == ''
         assert mocks['assume_role'].mock_calls == []
 
+    def test_run_profile(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_cr).config = m_conf
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            StepProfiler=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', assume_role=False, profile_steps=['all'],
+                profile_dir='prof', profile_collapsed=True
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            runner.main()
+        assert mocks['StepProfiler'].mock_calls == [
+            call(['all'], output_dir='prof', collapsed=True)
+        ]
+        assert mocks['CustodianRunner'].mock_calls == [
+            call('acctName', 'manheim-c7n-tools.yml'),
+            call().run(
+                'run', [], step_names=[], skip_steps=[],
+                metrics_json=None, metrics_prom=None,
+                profiler=mocks['StepProfiler'].return_value, events=None,
+                jobs=1, history=None,
+                manifest=None, targeted_dryrun=False,
+                policy_jobs=1
+            )
+        ]
+
+    def test_run_events_file(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_cr).config = m_conf
+        m_cr.run.side_effect = RuntimeError('foo')
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            EventSink=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', assume_role=False, events_file='ev.jsonl'
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            with pytest.raises(RuntimeError):
+                runner.main()
+        m_sink = mocks['EventSink'].from_path.return_value
+        assert mocks['EventSink'].mock_calls == [
+            call.from_path('ev.jsonl'),
+            call.from_path().close()
+        ]
+        assert m_cr.mock_calls == [
+            call.run(
+                'run', [], step_names=[], skip_steps=[],
+                metrics_json=None, metrics_prom=None, profiler=None,
+                events=m_sink, jobs=1, history=None,
+                manifest=None, targeted_dryrun=False,
+                policy_jobs=1
+            )
+        ]
+
+    def test_run_events_fd(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_cr).config = m_conf
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            EventSink=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='dryrun', assume_role=False, events_fd=3
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            runner.main()
+        assert mocks['EventSink'].mock_calls == [
+            call.from_fd(3),
+            call.from_fd().close()
+        ]
+
+    def test_run_jobs_history(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_cr).config = m_conf
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            RunHistory=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', assume_role=False, jobs=3,
+                history_file='hist.json'
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            runner.main()
+        assert mocks['RunHistory'].mock_calls == [call('hist.json')]
+        assert m_cr.mock_calls == [
+            call.run(
+                'run', [], step_names=[], skip_steps=[],
+                metrics_json=None, metrics_prom=None, profiler=None,
+                events=None, jobs=3,
+                history=mocks['RunHistory'].return_value,
+                manifest=None, targeted_dryrun=False,
+                policy_jobs=1
+            )
+        ]
+
+    def test_run_manifest(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        type(m_conf).account_id = PropertyMock(return_value='1234')
+        type(m_cr).config = m_conf
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            RunManifest=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', assume_role=False, manifest='s3://bkt/m.json'
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            runner.main()
+        assert mocks['RunManifest'].mock_calls == [
+            call('s3://bkt/m.json', region_name='r1', account_id='1234')
+        ]
+        assert m_cr.mock_calls == [
+            call.run(
+                'run', [], step_names=[], skip_steps=[],
+                metrics_json=None, metrics_prom=None, profiler=None,
+                events=None, jobs=1, history=None,
+                manifest=mocks['RunManifest'].return_value,
+                targeted_dryrun=False,
+                policy_jobs=1
+            )
+        ]
+
+    def test_plan(self, capsys):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).regions = PropertyMock(return_value=['r1', 'r2'])
+        type(m_conf).account_id = PropertyMock(return_value='1234')
+        type(m_cr).config = m_conf
+        m_cr.plan.return_value = [
+            ('s1', 'r1', 'always'),
+            ('s2', 'r1', 'no-op'),
+            ('s2', 'r2', 'changed')
+        ]
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT,
+            RunManifest=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='plan', manifest='m.json', steps=['s1', 's2'],
+                regions=['r1', 'r2']
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            with pytest.raises(SystemExit) as exc:
+                runner.main()
+        assert exc.value.code == 0
+        assert m_cr.mock_calls == [
+            call.plan(
+                mocks['RunManifest'].return_value, ['r1', 'r2'],
+                step_names=['s1', 's2'], skip_steps=[]
+            )
+        ]
+        assert mocks['assume_role'].mock_calls == [call(m_conf)]
+        out = capsys.readouterr().out.split("\n")
+        assert out[0].split() == ['Step', 'Region', 'Status']
+        assert out[2].split() == ['s1', 'r1', 'always']
+        assert out[3].split() == ['s2', 'r1', 'no-op']
+        assert out[4].split() == ['s2', 'r2', 'changed']
+        assert out[5] == '2 of 3 units would do work'
+
+    def test_plan_no_manifest(self):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        type(m_cr).config = Mock(spec_set=ManheimConfig)
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='plan', assume_role=False
+            )
+            mocks['CustodianRunner'].return_value = m_cr
+            with pytest.raises(SystemExit) as exc:
+                runner.main()
+        assert exc.value.code == 'ERROR: the plan action requires --manifest'
+        assert m_cr.mock_calls == []
+
     def test_info_list(self, capsys):
         osc = runner.CustodianRunner.ordered_step_classes
         m_cr = Mock(spec_set=runner.CustodianRunner)
@@ -1455,7 +3110,11 @@ class TestMain(object):
         assert mocks['CustodianRunner'].mock_calls == [
             call('aName', 'foo.yml'),
             call().run(
-                'dryrun', [], step_names=['foo'], skip_steps=['bar']
+                'dryrun', [], step_names=['foo'], skip_steps=['bar'],
+                metrics_json=None, metrics_prom=None, profiler=None,
+                events=None, jobs=1, history=None,
+                manifest=None, targeted_dryrun=False,
+                policy_jobs=1
             )
         ]
         assert mocks['ManheimConfig'].mock_calls == []
@@ -19,7 +19,9 @@ from datetime import datetime
 
 from manheim_c7n_tools.utils import (
     set_log_debug, set_log_info, set_log_level_format, red, green, bold,
-    git_html_url, assume_role
+    git_html_url, assume_role, AwsClientRegistry, BOTOCORE_CONFIG,
+    aws_client, aws_resource, clear_aws_clients, substitute_macros,
+    policy_fingerprint, policy_resource_type, load_resource_types
 )
 from manheim_c7n_tools.config import ManheimConfig
 
@@ -273,3 +275,158 @@ class TestAssumeRole(object):
         assert mock_logger.mock_calls == [
             call.debug('No assume_role configuration; not assuming a role.')
         ]
+
+
+class TestAwsClientRegistry(object):
+
+    def test_client_cached_per_key(self):
+
+        def se_session(region_name=None):
+            sess = Mock(name=region_name)
+            sess.client.side_effect = lambda *args, **kwargs: Mock()
+            return sess
+
+        with patch('%s.boto3.session.Session' % pbm) as mock_sess:
+            mock_sess.side_effect = se_session
+            reg = AwsClientRegistry()
+            c1 = reg.client('logs', 'r1')
+            c2 = reg.client('logs', 'r1')
+            c3 = reg.client('logs', 'r2')
+            c4 = reg.client('sqs', 'r1')
+        assert c1 is c2
+        assert c1 is not c3
+        assert c1 is not c4
+        assert mock_sess.mock_calls == [
+            call(region_name='r1'),
+            call(region_name='r2')
+        ]
+        sess_r1 = reg.session('r1')
+        assert sess_r1.client.mock_calls == [
+            call('logs', config=BOTOCORE_CONFIG),
+            call('sqs', config=BOTOCORE_CONFIG)
+        ]
+
+    def test_client_cached_per_credentials(self):
+        with patch('%s.boto3.session.Session' % pbm) as mock_sess:
+            mock_sess.side_effect = lambda **kwargs: Mock()
+            reg = AwsClientRegistry()
+            with patch.dict(
+                os.environ, {'AWS_ACCESS_KEY_ID': 'AKID1'}, clear=True
+            ):
+                c1 = reg.client('logs', 'r1')
+                os.environ['AWS_ACCESS_KEY_ID'] = 'AKID2'
+                c2 = reg.client('logs', 'r1')
+                os.environ['AWS_ACCESS_KEY_ID'] = 'AKID1'
+                c3 = reg.client('logs', 'r1')
+            with patch.dict(os.environ, {'AWS_PROFILE': 'other'}, clear=True):
+                c4 = reg.client('logs', 'r1')
+        assert c1 is not c2
+        assert c1 is c3
+        assert c4 is not c1
+        assert c4 is not c2
+        assert len(mock_sess.mock_calls) == 3
+
+    def test_resource_and_clear(self):
+        m_conf = Mock()
+        with patch('%s.boto3.session.Session' % pbm) as mock_sess:
+            reg = AwsClientRegistry(config=m_conf)
+            r1 = reg.resource('s3', 'r1')
+            assert reg.resource('s3', 'r1') is r1
+            reg.clear()
+            reg.resource('s3', 'r1')
+        assert mock_sess.mock_calls == [
+            call(region_name='r1'),
+            call().resource('s3', config=m_conf),
+            call(region_name='r1'),
+            call().resource('s3', config=m_conf)
+        ]
+
+    def test_module_functions(self):
+        with patch('%s._registry' % pbm, autospec=True) as mock_reg:
+            aws_client('logs', 'r1')
+            aws_resource('s3', 'r2')
+            clear_aws_clients()
+        assert mock_reg.mock_calls == [
+            call.client('logs', 'r1'),
+            call.resource('s3', 'r2'),
+            call.clear()
+        ]
+
+
+class TestPolicyFingerprint(object):
+
+    def test_substitute_macros(self):
+        obj = {
+            'a%%X%%': ['b%%X%%', {'c': '%%Y%%%%X%%'}, 1, None],
+            'd': True
+        }
+        res = substitute_macros(obj, [['%%X%%', 'x'], ['%%Y%%', 'y']])
+        assert res == {
+            'ax': ['bx', {'c': 'yx'}, 1, None],
+            'd': True
+        }
+        # original is unchanged
+        assert obj['a%%X%%'][1] == {'c': '%%Y%%%%X%%'}
+
+    def test_policy_fingerprint(self):
+        pol = {
+            'name': 'foo',
+            'mode': {'type': 'periodic', 'tags': {'Component': 'foo'}},
+            'filters': [{'tag:Region': '%%AWS_REGION%%'}]
+        }
+        fp = policy_fingerprint(pol, [['%%AWS_REGION%%', 'r1']])
+        assert len(fp) == 64
+        # stable, and independent of key order
+        assert policy_fingerprint({
+            'filters': [{'tag:Region': '%%AWS_REGION%%'}],
+            'mode': {'tags': {'Component': 'foo'}, 'type': 'periodic'},
+            'name': 'foo'
+        }, [['%%AWS_REGION%%', 'r1']]) == fp
+        # ignores an existing fingerprint tag, without modifying the policy
+        pol['mode']['tags']['PolicyFingerprint'] = 'old'
+        assert policy_fingerprint(pol, [['%%AWS_REGION%%', 'r1']]) == fp
+        assert pol['mode']['tags']['PolicyFingerprint'] == 'old'
+        # changes with the substituted values
+        assert policy_fingerprint(pol, [['%%AWS_REGION%%', 'r2']]) != fp
+        # changes with the c7n version
+        with patch('%s.c7n_version' % pbm, '0.0.1'):
+            assert policy_fingerprint(
+                pol, [['%%AWS_REGION%%', 'r1']]
+            ) != fp
+
+    def test_policy_fingerprint_no_mode(self):
+        assert policy_fingerprint({'name': 'foo'}) != policy_fingerprint(
+            {'name': 'bar'}
+        )
+
+
+class TestPolicyResourceType(object):
+
+    def test_policy_resource_type(self):
+        assert policy_resource_type({'resource': 'ec2'}) == 'aws.ec2'
+        assert policy_resource_type({'resource': 'aws.ec2'}) == 'aws.ec2'
+        assert policy_resource_type({'resource': 'gcp.instance'}) == \
+            'gcp.instance'
+        assert policy_resource_type({'name': 'foo'}) == ''
+
+
+class TestLoadResourceTypes(object):
+
+    def test_load(self):
+        with patch('%s.load_resources' % pbm) as m_lr:
+            m_lr.return_value = []
+            assert load_resource_types(
+                ['s3', 'aws.ec2', '', None, 'ec2']
+            ) == []
+        assert m_lr.mock_calls == [call(('aws.ec2', 'aws.s3'))]
+
+    def test_missing(self):
+        with patch('%s.load_resources' % pbm) as m_lr:
+            m_lr.return_value = ['aws.foo']
+            assert load_resource_types(['foo']) == ['aws.foo']
+        assert m_lr.mock_calls == [call(('aws.foo',))]
+
+    def test_empty(self):
+        with patch('%s.load_resources' % pbm) as m_lr:
+            assert load_resource_types([None, '']) == []
+        assert m_lr.mock_calls == []
@@ -0,0 +1,141 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import yaml
+
+from manheim_c7n_tools.validation import policy_hash, PolicyValidator
+
+from mock import patch
+
+pbm = 'manheim_c7n_tools.validation'
+
+GOOD1 = {
+    'name': 'good-ec2',
+    'resource': 'ec2',
+    'filters': [{'State.Name': 'running'}]
+}
+GOOD2 = {
+    'name': 'good-s3',
+    'resource': 's3',
+    'filters': [{'Name': 'foo'}]
+}
+BAD_SCHEMA = {
+    'name': 'bad-schema',
+    'resource': 'ec2',
+    'actions': [{'type': 'not-an-action'}]
+}
+
+
+def write_policies(tmpdir, region, policies):
+    path = tmpdir.join('custodian_%s.yml' % region)
+    path.write(yaml.dump({'policies': policies}))
+    return str(path)
+
+
+class TestPolicyHash(object):
+
+    def test_stable(self):
+        assert policy_hash({'a': 1, 'b': 2}) == policy_hash({'b': 2, 'a': 1})
+        assert policy_hash({'a': 1}) != policy_hash({'a': 2})
+
+    def test_c7n_version(self):
+        orig = policy_hash({'a': 1})
+        with patch('%s.c7n_version' % pbm, '0.0.0'):
+            assert policy_hash({'a': 1}) != orig
+
+
+class TestPolicyValidator(object):
+
+    def test_valid(self, tmpdir):
+        cache = str(tmpdir.join('cache', 'validation.json'))
+        paths = [
+            write_policies(tmpdir, 'r1', [GOOD1, GOOD2]),
+            write_policies(tmpdir, 'r2', [GOOD1])
+        ]
+        res = PolicyValidator(cache).validate_files(paths)
+        assert res == {paths[0]: [], paths[1]: []}
+        with open(cache, 'r') as fh:
+            data = json.loads(fh.read())
+        assert data == {
+            'version': 1,
+            'valid': sorted([policy_hash(GOOD1), policy_hash(GOOD2)])
+        }
+
+    def test_cached(self, tmpdir):
+        cache = str(tmpdir.join('validation.json'))
+        paths = [write_policies(tmpdir, 'r1', [GOOD1, GOOD2])]
+        PolicyValidator(cache).validate_files(paths)
+        with patch('%s.PolicyValidator._validate_policies' % pbm) as m_vp:
+            m_vp.return_value = {}
+            res = PolicyValidator(cache).validate_files(paths)
+        assert res == {paths[0]: []}
+        assert len(m_vp.mock_calls) == 1
+        assert m_vp.mock_calls[0][1] == ({},)
+
+    def test_invalid_schema(self, tmpdir):
+        cache = str(tmpdir.join('validation.json'))
+        paths = [
+            write_policies(tmpdir, 'r1', [GOOD1, BAD_SCHEMA]),
+            write_policies(tmpdir, 'r2', [GOOD1])
+        ]
+        res = PolicyValidator(cache).validate_files(paths)
+        assert len(res[paths[0]]) == 1
+        assert 'bad-schema' in res[paths[0]][0]
+        assert res[paths[1]] == []
+        with open(cache, 'r') as fh:
+            assert json.loads(fh.read())['valid'] == [policy_hash(GOOD1)]
+
+    def test_invalid_schema_no_specific_error(self, tmpdir):
+        paths = [write_policies(tmpdir, 'r1', [BAD_SCHEMA])]
+        with patch('%s.specific_error' % pbm) as m_se:
+            m_se.side_effect = KeyError('foo')
+            res = PolicyValidator().validate_files(paths)
+        assert len(m_se.mock_calls) == 1
+        assert res == {paths[0]: [str(m_se.mock_calls[0][1][0])]}
+        assert 'not-an-action' in res[paths[0]][0]
+
+    def test_invalid_semantic(self, tmpdir):
+        pol = {
+            'name': 'bad-semantic',
+            'resource': 'ec2',
+            'mode': {'type': 'periodic', 'schedule': 'rate(1 day)'}
+        }
+        paths = [write_policies(tmpdir, 'r1', [pol])]
+        with patch('%s.Policy' % pbm) as m_pol:
+            m_pol.return_value.validate.side_effect = RuntimeError('foo')
+            res = PolicyValidator().validate_files(paths)
+        assert res == {paths[0]: ['Policy: bad-semantic is invalid: foo']}
+
+    def test_duplicate_names(self, tmpdir):
+        paths = [write_policies(tmpdir, 'r1', [GOOD1, GOOD1])]
+        res = PolicyValidator().validate_files(paths)
+        assert res == {paths[0]: [
+            'Only one policy with a given name allowed, duplicates: good-ec2'
+        ]}
+
+    def test_invalid_structure(self, tmpdir):
+        paths = [write_policies(tmpdir, 'r1', [{'resource': 'ec2'}])]
+        res = PolicyValidator().validate_files(paths)
+        assert len(res[paths[0]]) == 1
+
+    def test_bad_cache(self, tmpdir):
+        cache = tmpdir.join('validation.json')
+        cache.write('not json')
+        assert PolicyValidator(str(cache))._valid == set()
+        cache.write(json.dumps({'version': 99, 'valid': ['a']}))
+        assert PolicyValidator(str(cache))._valid == set()
+        cache.write(json.dumps({'version': 1, 'valid': ['a']}))
+        assert PolicyValidator(str(cache))._valid == {'a'}
@@ -16,11 +16,42 @@ import logging
 import subprocess
 import re
 import os
+import json
+import hashlib
+import threading
 
 import boto3
+from botocore.config import Config
+from c7n.resources import load_resources
+from c7n.version import version as c7n_version
 
 logger = logging.getLogger(__name__)
 
+#: botocore client configuration shared by every client and resource created
+#: through :py:class:`~.AwsClientRegistry`. Adaptive retries cope with API
+#: throttling (this replaces the per-module ``max_attempts`` overrides), and
+#: the larger connection pool allows clients to be shared between threads.
+BOTOCORE_CONFIG = Config(
+    max_pool_connections=50,
+    connect_timeout=10,
+    read_timeout=60,
+    retries={'max_attempts': 10, 'mode': 'adaptive'}
+)
+
+#: Environment variables that determine the credentials of new boto3 Sessions
+#: and that may change during a run (:py:func:`~.assume_role` sets some of
+#: them); :py:class:`~.AwsClientRegistry` caches by their values.
+CREDENTIAL_ENV_VARS = [
+    'AWS_PROFILE', 'AWS_DEFAULT_PROFILE', 'AWS_ACCESS_KEY_ID',
+    'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN',
+    'AWS_SHARED_CREDENTIALS_FILE', 'AWS_CONFIG_FILE', 'AWS_ROLE_ARN',
+    'AWS_WEB_IDENTITY_TOKEN_FILE'
+]
+
+#: Key of the ``mode.tags`` tag that policygen stamps on Lambda-mode policies,
+#: holding the :py:func:`~.policy_fingerprint` of the policy.
+FINGERPRINT_TAG = 'PolicyFingerprint'
+
 
 def set_log_info(log):
     """
@@ -172,9 +203,263 @@ def assume_role(config):
         'Credentials'
     ]['SecretAccessKey']
     os.environ['AWS_SESSION_TOKEN'] = resp['Credentials']['SessionToken']
+    # sessions cached before this point have the old credentials, and would
+    # not be used again
+    clear_aws_clients()
     logger.info(
         'Exported AssumeRole credentials; AccessKeyId %s expires at %s; '
         'AssumedRoleUser ARN: %s', resp['Credentials']['AccessKeyId'],
         resp['Credentials']['Expiration'],
         resp['AssumedRoleUser']['Arn']
     )
+
+
+class AwsClientRegistry(object):
+    """
+    Run-scoped cache of boto3 Sessions, clients and service resources.
+
+    Sessions are cached per (credentials, region) and clients/resources per
+    (credentials, region, service), so that credential resolution and HTTP
+    connection pools are shared by every step of a run instead of being set up
+    again each time a module needs to talk to AWS. All clients are built with
+    :py:const:`~.BOTOCORE_CONFIG`.
+
+    The credentials part of every key is a hash of the
+    :py:const:`~.CREDENTIAL_ENV_VARS` at the time of the call, so that after
+    the credentials or profile in the environment change (whether by
+    :py:func:`~.assume_role` or otherwise) new sessions are created, instead
+    of reusing ones for the previous account or role. Credentials from other
+    sources, such as an instance profile, are not expected to change within
+    a process.
+
+    boto3 clients are thread-safe once created and may be shared between
+    worker threads; service resources are not, and should only be used from
+    one thread at a time.
+    """
+
+    def __init__(self, config=BOTOCORE_CONFIG):
+        """
+        :param config: botocore client configuration to use for all clients
+        :type config: botocore.config.Config
+        """
+        self._config = config
+        self._lock = threading.RLock()
+        self._sessions = {}
+        self._clients = {}
+        self._resources = {}
+
+    @staticmethod
+    def credentials_key():
+        """
+        Return the credentials part of the cache keys: a hash of the current
+        values of :py:const:`~.CREDENTIAL_ENV_VARS`.
+
+        :rtype: str
+        """
+        h = hashlib.sha256()
+        for name in CREDENTIAL_ENV_VARS:
+            h.update(('%s=%s\n' % (name, os.environ.get(name, ''))).encode(
+                'utf-8'
+            ))
+        return h.hexdigest()
+
+    def session(self, region_name):
+        """
+        Return the cached boto3 Session for the current credentials and the
+        given region, creating it if needed.
+
+        :param region_name: region name for the session
+        :type region_name: str
+        :return: boto3 session
+        :rtype: boto3.session.Session
+        """
+        return self._session(self.credentials_key(), region_name)
+
+    def _session(self, creds, region_name):
+        key = (creds, region_name)
+        with self._lock:
+            if key not in self._sessions:
+                logger.debug('Creating boto3 Session for %s', region_name)
+                self._sessions[key] = boto3.session.Session(
+                    region_name=region_name
+                )
+            return self._sessions[key]
+
+    def client(self, service_name, region_name):
+        """
+        Return the cached boto3 client for the current credentials and the
+        given service and region, creating it if needed.
+
+        :param service_name: AWS service name, i.e. "logs"
+        :type service_name: str
+        :param region_name: region name for the client
+        :type region_name: str
+        :return: boto3 client
+        """
+        creds = self.credentials_key()
+        key = (creds, region_name, service_name)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self._session(
+                    creds, region_name
+                ).client(service_name, config=self._config)
+            return self._clients[key]
+
+    def resource(self, service_name, region_name):
+        """
+        Return the cached boto3 service resource for the current credentials
+        and the given service and region, creating it if needed.
+
+        :param service_name: AWS service name, i.e. "s3"
+        :type service_name: str
+        :param region_name: region name for the resource
+        :type region_name: str
+        :return: boto3 service resource
+        """
+        creds = self.credentials_key()
+        key = (creds, region_name, service_name)
+        with self._lock:
+            if key not in self._resources:
+                self._resources[key] = self._session(
+                    creds, region_name
+                ).resource(service_name, config=self._config)
+            return self._resources[key]
+
+    def clear(self):
+        """
+        Discard all cached sessions, clients and resources, i.e. to release
+        those for credentials that are no longer used.
+        """
+        with self._lock:
+            self._sessions = {}
+            self._clients = {}
+            self._resources = {}
+
+
+#: The :py:class:`~.AwsClientRegistry` shared by everything in this process.
+_registry = AwsClientRegistry()
+
+
+def aws_client(service_name, region_name):
+    """
+    Return a shared boto3 client from the process-wide
+    :py:class:`~.AwsClientRegistry`, for the current credentials.
+
+    :param service_name: AWS service name, i.e. "logs"
+    :type service_name: str
+    :param region_name: region name for the client
+    :type region_name: str
+    :return: boto3 client
+    """
+    return _registry.client(service_name, region_name)
+
+
+def aws_resource(service_name, region_name):
+    """
+    Return a shared boto3 service resource from the process-wide
+    :py:class:`~.AwsClientRegistry`, for the current credentials.
+
+    :param service_name: AWS service name, i.e. "s3"
+    :type service_name: str
+    :param region_name: region name for the resource
+    :type region_name: str
+    :return: boto3 service resource
+    """
+    return _registry.resource(service_name, region_name)
+
+
+def clear_aws_clients():
+    """
+    Discard everything cached in the process-wide
+    :py:class:`~.AwsClientRegistry`.
+    """
+    _registry.clear()
+
+
+def substitute_macros(obj, replacements):
+    """
+    Return a copy of ``obj`` (a policy or any other nested structure of dicts,
+    lists and scalars) with each ``[macro, value]`` pair in ``replacements``
+    substituted in every string, including dict keys.
+
+    :param obj: object to substitute macros in
+    :param replacements: list of ``[macro, value]`` pairs
+    :type replacements: list
+    :return: copy of ``obj`` with macros substituted
+    """
+    if isinstance(obj, type({})):
+        return {
+            substitute_macros(k, replacements): substitute_macros(
+                v, replacements
+            ) for k, v in obj.items()
+        }
+    if isinstance(obj, type([])):
+        return [substitute_macros(x, replacements) for x in obj]
+    if isinstance(obj, type('')):
+        for macro, val in replacements:
+            obj = obj.replace(macro, val)
+    return obj
+
+
+def policy_fingerprint(policy, replacements=[]):
+    """
+    Return a stable fingerprint of a policy, as deployed. This is a SHA256
+    hex digest of the policy after macro substitution, excluding any existing
+    :py:const:`~.FINGERPRINT_TAG` tag, combined with the c7n version (as the
+    c7n code is packaged into each policy's Lambda function).
+
+    :param policy: the policy
+    :type policy: dict
+    :param replacements: list of ``[macro, value]`` pairs to substitute in the
+      policy before fingerprinting it
+    :type replacements: list
+    :return: fingerprint hex digest
+    :rtype: str
+    """
+    data = substitute_macros(policy, replacements)
+    tags = data.get('mode', {}).get('tags', {})
+    tags.pop(FINGERPRINT_TAG, None)
+    h = hashlib.sha256()
+    h.update(('c7n=%s\n' % c7n_version).encode('utf-8'))
+    h.update(json.dumps(data, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def policy_resource_type(policy):
+    """
+    Return the fully-qualified c7n resource type of a policy, e.g. ``aws.ec2``
+    for a policy with ``resource: ec2``, or an empty string if the policy has
+    no resource.
+
+    :param policy: the policy
+    :type policy: dict
+    :rtype: str
+    """
+    rtype = policy.get('resource', '')
+    if rtype and '.' not in rtype:
+        rtype = 'aws.' + rtype
+    return rtype
+
+
+def load_resource_types(resource_types):
+    """
+    Load (register) only the given c7n resource types, rather than the whole
+    c7n resource registry (as ``c7n.resources.load_available()`` does).
+    Resource types without a provider prefix are taken to be AWS types, and
+    empty types are ignored.
+
+    :param resource_types: resource types, e.g. ``ec2`` or ``aws.ec2``
+    :type resource_types: iterable
+    :return: list of the given resource types that c7n does not know about
+    :rtype: list
+    """
+    types = sorted(set(
+        policy_resource_type({'resource': x}) for x in resource_types if x
+    ))
+    if not types:
+        return []
+    logger.debug('Loading c7n resource types: %s', types)
+    missing = load_resources(tuple(types))
+    if missing:
+        logger.warning('Unknown c7n resource types: %s', missing)
+    return missing
@@ -0,0 +1,214 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process bulk validation of generated ``custodian_REGION.yml`` files, used
+by :py:class:`~.runner.ValidateStep`. This performs the same checks as
+``custodian validate``, but validates each distinct policy only once across
+all files, and remembers policies that passed validation in an on-disk cache.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import Counter
+
+import yaml
+
+from c7n.commands import DuplicateKeyCheckLoader
+from c7n.config import Bag, Config
+from c7n.exceptions import PolicyValidationError
+from c7n.policy import Policy
+from c7n.schema import (
+    JsonSchemaValidator, StructureParser, generate, specific_error,
+    policy_error_scope
+)
+from c7n.version import version as c7n_version
+
+from manheim_c7n_tools.utils import load_resource_types
+
+logger = logging.getLogger(__name__)
+
+
+def policy_hash(policy):
+    """
+    Return the validation cache key of a policy: a SHA256 hex digest of its
+    content and the c7n version.
+
+    :param policy: the policy
+    :type policy: dict
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    h.update(('c7n=%s\n' % c7n_version).encode('utf-8'))
+    h.update(json.dumps(policy, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class PolicyValidator(object):
+    """
+    Validates c7n policy files. The c7n JSON schema is only generated (for
+    all resource types used by policies that need validating) and compiled
+    once, each distinct policy is validated once, and the hashes of policies
+    that passed are stored in a cache file so that they are not validated
+    again on later runs.
+    """
+
+    #: Version of the cache file format
+    VERSION = 1
+
+    def __init__(self, cache_path=None):
+        """
+        :param cache_path: path of the validation cache file, or None to not
+          use an on-disk cache
+        :type cache_path: str
+        """
+        self.cache_path = cache_path
+        self._valid = set()
+        if cache_path is not None and os.path.exists(cache_path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r') as fh:
+                data = json.loads(fh.read())
+        except ValueError:
+            logger.warning(
+                'Ignoring unparseable validation cache: %s', self.cache_path
+            )
+            return
+        if data.get('version') != self.VERSION:
+            logger.warning(
+                'Ignoring validation cache %s with unknown version %s',
+                self.cache_path, data.get('version')
+            )
+            return
+        self._valid = set(data['valid'])
+
+    def _save(self, valid):
+        if self.cache_path is None:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        logger.debug('Writing validation cache to: %s', self.cache_path)
+        with open(self.cache_path, 'w') as fh:
+            fh.write(json.dumps(
+                {'version': self.VERSION, 'valid': sorted(valid)}, indent=4
+            ))
+
+    def validate_files(self, paths):
+        """
+        Validate policy files, logging the result for each.
+
+        :param paths: paths of the policy files to validate
+        :type paths: list
+        :return: dict of path to list of error messages (empty if valid)
+        :rtype: dict
+        """
+        results = {}
+        file_policies = {}
+        for path in paths:
+            with open(path, 'r') as fh:
+                data = yaml.load(fh.read(), Loader=DuplicateKeyCheckLoader)
+            try:
+                StructureParser().validate(data)
+            except PolicyValidationError as ex:
+                results[path] = [str(ex)]
+                continue
+            policies = data.get('policies', [])
+            dupes = [
+                k for k, v in Counter(
+                    p.get('name', 'unknown') for p in policies
+                ).items() if v > 1
+            ]
+            if dupes:
+                results[path] = [
+                    'Only one policy with a given name allowed, '
+                    'duplicates: %s' % ', '.join(sorted(dupes))
+                ]
+                continue
+            file_policies[path] = [(policy_hash(p), p) for p in policies]
+        to_check = {}
+        for pols in file_policies.values():
+            for key, pol in pols:
+                if key not in self._valid:
+                    to_check[key] = pol
+        total = len(set(
+            k for pols in file_policies.values() for k, _ in pols
+        ))
+        logger.info(
+            'Validating %d of %d distinct policies (%d unchanged)',
+            len(to_check), total, total - len(to_check)
+        )
+        errors = self._validate_policies(to_check)
+        valid = set()
+        for path, pols in file_policies.items():
+            results[path] = []
+            for key, pol in pols:
+                if key in errors:
+                    results[path].append(errors[key])
+                else:
+                    valid.add(key)
+        for path in paths:
+            if results[path]:
+                logger.error('Configuration invalid: %s', path)
+                for err in results[path]:
+                    logger.error('%s', err)
+            else:
+                logger.info('Configuration valid: %s', path)
+        self._valid = valid
+        self._save(valid)
+        return results
+
+    def _validate_policies(self, policies):
+        """
+        Validate policies against the c7n schema, then semantically.
+
+        :param policies: dict of :py:func:`~.policy_hash` to policy
+        :type policies: dict
+        :return: dict of policy hash to error message, for invalid policies
+        :rtype: dict
+        """
+        if not policies:
+            return {}
+        load_resource_types(p.get('resource') for p in policies.values())
+        validator = JsonSchemaValidator(generate())
+        null_config = Config.empty(dryrun=True, account_id='na', region='na')
+        errors = {}
+        for key, pol in policies.items():
+            data = {'policies': [pol]}
+            schema_errors = list(validator.iter_errors(data))
+            if schema_errors:
+                try:
+                    errors[key] = str(policy_error_scope(
+                        specific_error(schema_errors[0]), data
+                    ))
+                except Exception:
+                    # as ``custodian validate`` does, fall back to the
+                    # original error if c7n can't narrow it down
+                    logger.debug(
+                        'specific_error failed; using schema error',
+                        exc_info=True
+                    )
+                    errors[key] = str(schema_errors[0])
+                continue
+            try:
+                Policy(pol, null_config, Bag()).validate()
+            except Exception as ex:
+                errors[key] = 'Policy: %s is invalid: %s' % (
+                    pol.get('name', 'unknown'), ex
+                )
+        return errors